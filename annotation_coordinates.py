@@ -0,0 +1,65 @@
+"""标注坐标空间的转换
+
+旧版本把图片缩放到视图大小后再标注，框的坐标依赖当时的窗口尺寸（显示坐标）；
+新的默认模式直接使用原图像素坐标（图像坐标），并在每个框上记录
+'coordinates': 'image'。显示坐标的框会记录 display_width / display_height，
+用于一次性迁移到图像坐标：界面在显示图片时逐张迁移并保存。
+"""
+
+IMAGE_SPACE = 'image'
+DISPLAY_SIZE_KEYS = ('display_width', 'display_height')
+
+
+def is_image_space(annotation):
+    """判断标注框是否已经使用原图像素坐标"""
+    return annotation.get('coordinates') == IMAGE_SPACE
+
+
+def legacy_display_size(image_width, image_height, view_width, view_height):
+    """按旧版显示逻辑（保持宽高比缩放到视图大小，同QSize.scaled）推算显示尺寸"""
+    if image_width <= 0 or image_height <= 0:
+        return view_width, view_height
+    scaled_width = view_height * image_width // image_height
+    if scaled_width <= view_width:
+        return scaled_width, view_height
+    return view_width, view_width * image_height // image_width
+
+
+def to_image_space(annotation, image_width, image_height, fallback_display_size):
+    """把显示坐标的标注框转换为原图像素坐标
+
+    优先使用框上记录的显示尺寸；早期没有记录显示尺寸的标注使用
+    fallback_display_size（按当前视图大小推算的旧版显示尺寸）。
+    """
+    if is_image_space(annotation):
+        return annotation
+    display_width = annotation.get('display_width') or fallback_display_size[0]
+    display_height = annotation.get('display_height') or fallback_display_size[1]
+    scale_x = image_width / display_width if display_width else 1.0
+    scale_y = image_height / display_height if display_height else 1.0
+
+    converted = {k: v for k, v in annotation.items() if k not in DISPLAY_SIZE_KEYS}
+    converted['x'] = annotation['x'] * scale_x
+    converted['y'] = annotation['y'] * scale_y
+    converted['width'] = annotation['width'] * scale_x
+    converted['height'] = annotation['height'] * scale_y
+    converted['coordinates'] = IMAGE_SPACE
+    return converted
+
+
+def to_display_space(annotation, image_width, image_height, display_width, display_height):
+    """把原图像素坐标的标注框转换为指定显示尺寸下的坐标（旧版显示模式使用）"""
+    if not is_image_space(annotation):
+        return annotation
+    scale_x = display_width / image_width if image_width else 1.0
+    scale_y = display_height / image_height if image_height else 1.0
+
+    converted = {k: v for k, v in annotation.items() if k != 'coordinates'}
+    converted['x'] = annotation['x'] * scale_x
+    converted['y'] = annotation['y'] * scale_y
+    converted['width'] = annotation['width'] * scale_x
+    converted['height'] = annotation['height'] * scale_y
+    converted['display_width'] = display_width
+    converted['display_height'] = display_height
+    return converted
+
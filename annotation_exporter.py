@@ -0,0 +1,446 @@
+"""把标注导出为 YOLO（.txt）、VOC（.xml）或 COCO（.json）格式
+
+标注通过 AnnotationStorage.iter_annotations() 逐张读取，不在内存中汇总
+整个数据集。图片尺寸只读取文件头（视频帧读取流信息），不解码像素。
+YOLO 和 VOC 每张图片一个文件，读取尺寸和写文件都在进程池中并行进行；
+COCO 的 images 直接流式写入目标文件，annotations 先写到临时文件，
+最后拼接，内存占用与框的总数无关。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from xml.sax.saxutils import escape
+
+from PyQt5.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImageReader
+
+from annotation_coordinates import is_image_space, to_image_space
+from video_frames import FRAME_SEPARATOR, parse_frame_path, video_frame_size
+
+
+EXPORT_FORMATS = ('yolo', 'voc', 'coco')
+
+
+class ExportStats:
+    """一次导出的统计结果"""
+
+    def __init__(self):
+        self.images = 0     # 导出的图片数
+        self.boxes = 0      # 导出的框数
+        self.skipped = 0    # 跳过的框数（待确认、越界或无法换算坐标）
+        self.failed = 0     # 无法读取尺寸的图片数
+        self.seconds = 0.0
+
+    @property
+    def images_per_second(self):
+        return self.images / self.seconds if self.seconds > 0 else 0.0
+
+    def merge(self, other):
+        """累加工作进程返回的统计"""
+        self.images += other.images
+        self.boxes += other.boxes
+        self.skipped += other.skipped
+        self.failed += other.failed
+
+    def __str__(self):
+        return (f"导出 {self.images} 张图片、{self.boxes} 个框，跳过 {self.skipped} 个框，"
+                f"失败 {self.failed} 张，耗时 {self.seconds:.1f} 秒（{self.images_per_second:.1f} 张/秒）")
+
+
+def read_image_size(image_path):
+    """只读取文件头获取图片（或视频帧）的尺寸，无法读取时返回 None"""
+    parsed = parse_frame_path(image_path)
+    if parsed is not None:
+        try:
+            return video_frame_size(parsed[0])
+        except (ImportError, OSError):
+            return None
+    size = QImageReader(image_path).size()
+    return (size.width(), size.height()) if size.isValid() else None
+
+
+def output_stem(rel_path):
+    """导出文件的相对路径（不含扩展名）；视频帧 a.mp4#000012 对应 a_000012"""
+    if parse_frame_path(rel_path) is not None:
+        video_path, _, number = rel_path.rpartition(FRAME_SEPARATOR)
+        return f"{os.path.splitext(video_path)[0]}_{number}"
+    return os.path.splitext(rel_path)[0]
+
+
+def pixel_box(annotation, width, height):
+    """把标注框换算为裁剪到图片范围内的 (x0, y0, x1, y1) 像素坐标，无效时返回 None"""
+    if not is_image_space(annotation):
+        # 旧版显示坐标的框只有记录了显示尺寸时才能换算
+        if not annotation.get('display_width') or not annotation.get('display_height'):
+            return None
+        annotation = to_image_space(annotation, width, height, (0, 0))
+    x0 = max(0.0, annotation['x'])
+    y0 = max(0.0, annotation['y'])
+    x1 = min(float(width), annotation['x'] + annotation['width'])
+    y1 = min(float(height), annotation['y'] + annotation['height'])
+    if x1 - x0 < 1 or y1 - y0 < 1:
+        return None
+    return x0, y0, x1, y1
+
+
+def write_yolo(output_dir, rel_path, width, height, boxes):
+    """写出 YOLO 格式：每行“类别号 中心x 中心y 宽 高”（相对图片尺寸归一化）"""
+    lines = []
+    for class_id, _, (x0, y0, x1, y1) in boxes:
+        lines.append(f"{class_id} {(x0 + x1) / 2 / width:.6f} {(y0 + y1) / 2 / height:.6f} "
+                     f"{(x1 - x0) / width:.6f} {(y1 - y0) / height:.6f}\n")
+    _write_text(os.path.join(output_dir, 'labels', output_stem(rel_path) + '.txt'), ''.join(lines))
+
+
+def write_voc(output_dir, rel_path, width, height, boxes):
+    """写出 Pascal VOC 格式的 XML（与 LabelImg 的字段一致）"""
+    folder, filename = os.path.split(rel_path)
+    objects = ''.join(
+        f"\t<object>\n"
+        f"\t\t<name>{escape(category)}</name>\n"
+        f"\t\t<pose>Unspecified</pose>\n"
+        f"\t\t<truncated>0</truncated>\n"
+        f"\t\t<difficult>0</difficult>\n"
+        f"\t\t<bndbox>\n"
+        f"\t\t\t<xmin>{int(round(x0))}</xmin>\n"
+        f"\t\t\t<ymin>{int(round(y0))}</ymin>\n"
+        f"\t\t\t<xmax>{int(round(x1))}</xmax>\n"
+        f"\t\t\t<ymax>{int(round(y1))}</ymax>\n"
+        f"\t\t</bndbox>\n"
+        f"\t</object>\n"
+        for _, category, (x0, y0, x1, y1) in boxes
+    )
+    xml = (
+        f"<annotation>\n"
+        f"\t<folder>{escape(folder)}</folder>\n"
+        f"\t<filename>{escape(filename)}</filename>\n"
+        f"\t<size>\n"
+        f"\t\t<width>{width}</width>\n"
+        f"\t\t<height>{height}</height>\n"
+        f"\t\t<depth>3</depth>\n"
+        f"\t</size>\n"
+        f"\t<segmented>0</segmented>\n"
+        f"{objects}"
+        f"</annotation>\n"
+    )
+    _write_text(os.path.join(output_dir, 'Annotations', output_stem(rel_path) + '.xml'), xml)
+
+
+# 工作进程中已创建过的输出目录，避免每个文件都调用 makedirs
+_created_dirs = set()
+
+
+def _write_text(path, text):
+    folder = os.path.dirname(path)
+    if folder not in _created_dirs:
+        os.makedirs(folder, exist_ok=True)
+        _created_dirs.add(folder)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+class CocoWriter:
+    """流式写出 COCO 格式的 JSON
+
+    images 直接写入目标文件（先写到 .tmp，完成后改名），annotations 写到
+    临时文件，关闭时再拼接到 images 之后，内存中不保存任何列表。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = path + '.tmp'
+        self.file = open(self.temp_path, 'w', encoding='utf-8')
+        self.spool = tempfile.TemporaryFile('w+', encoding='utf-8', dir=os.path.dirname(path) or None)
+        self.image_id = 0
+        self.annotation_id = 0
+        self.file.write('{"images": [')
+
+    def add_image(self, file_name, width, height, boxes):
+        """写入一张图片及其框（boxes 为 [(类别号, 类别, (x0, y0, x1, y1))]）"""
+        self.image_id += 1
+        self.file.write((',\n' if self.image_id > 1 else '\n') + json.dumps({
+            'id': self.image_id, 'file_name': file_name, 'width': width, 'height': height
+        }, ensure_ascii=False))
+        for class_id, _, (x0, y0, x1, y1) in boxes:
+            self.annotation_id += 1
+            box_width, box_height = x1 - x0, y1 - y0
+            self.spool.write((',\n' if self.annotation_id > 1 else '\n') + json.dumps({
+                'id': self.annotation_id, 'image_id': self.image_id,
+                # COCO 的类别号从1开始
+                'category_id': class_id + 1,
+                'bbox': [round(x0, 2), round(y0, 2), round(box_width, 2), round(box_height, 2)],
+                'area': round(box_width * box_height, 2), 'iscrowd': 0
+            }))
+
+    def close(self, category_names):
+        """拼接 annotations 和 categories，完成后替换目标文件"""
+        self.file.write('\n], "annotations": [')
+        self.spool.seek(0)
+        shutil.copyfileobj(self.spool, self.file, 1024 * 1024)
+        self.spool.close()
+        categories = [{'id': i + 1, 'name': name, 'supercategory': ''}
+                      for i, name in enumerate(category_names)]
+        self.file.write('\n], "categories": ' + json.dumps(categories, ensure_ascii=False) + '}\n')
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        """放弃导出，删除临时文件"""
+        self.spool.close()
+        self.file.close()
+        os.remove(self.temp_path)
+
+
+# 工作进程中的应用对象（QImageReader 的图片格式插件需要）
+_worker_app = None
+
+
+def init_worker():
+    """进程池的初始化函数"""
+    global _worker_app
+    if QCoreApplication.instance() is None:
+        _worker_app = QCoreApplication(sys.argv[:1])
+
+
+def export_chunk(export_format, base_dir, output_dir, items):
+    """在工作进程中处理一批图片
+
+    items 为 [(相对路径, [(类别号, 标注)])]。YOLO / VOC 直接写出文件，
+    COCO 返回 [(相对路径, 宽, 高, 框列表)] 交给主进程写入。
+    返回 (ExportStats, COCO 记录)。
+    """
+    stats = ExportStats()
+    records = []
+    for rel_path, entries in items:
+        size = read_image_size(os.path.join(base_dir, rel_path))
+        if size is None:
+            stats.failed += 1
+            continue
+        width, height = size
+        boxes = []
+        for class_id, annotation in entries:
+            box = pixel_box(annotation, width, height)
+            if box is None:
+                stats.skipped += 1
+                continue
+            boxes.append((class_id, annotation.get('category', ''), box))
+        if export_format == 'yolo':
+            write_yolo(output_dir, rel_path, width, height, boxes)
+        elif export_format == 'voc':
+            write_voc(output_dir, rel_path, width, height, boxes)
+        else:
+            records.append((rel_path, width, height, boxes))
+        stats.images += 1
+        stats.boxes += len(boxes)
+    return stats, records
+
+
+def export_annotations(storage, output_dir, export_format, workers=4, class_names=None,
+                       include_pending=False, chunk_size=256, progress=None, is_cancelled=None):
+    """把标注存储中的全部标注导出到 output_dir
+
+    类别号按 class_names 的顺序分配，其余类别按出现顺序追加在后面；YOLO 导出
+    同时写出 classes.txt。待确认（pending）的框默认不导出。progress(已完成, 总数)
+    在调用线程中回调；is_cancelled() 返回 True 时尽快停止。返回 ExportStats。
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"未知的导出格式: {export_format}")
+    stats = ExportStats()
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    base_dir = storage.base_dir
+    total = len(storage.annotations)
+    category_ids = {name: i for i, name in enumerate(class_names or [])}
+    max_in_flight = max(1, workers) * 2
+
+    def chunks():
+        chunk = []
+        for rel_path, annotations in storage.iter_annotations():
+            entries = []
+            for annotation in annotations:
+                if annotation.get('pending') and not include_pending:
+                    stats.skipped += 1
+                    continue
+                category = annotation.get('category', '')
+                entries.append((category_ids.setdefault(category, len(category_ids)), annotation))
+            chunk.append((rel_path, entries))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    coco = CocoWriter(os.path.join(output_dir, 'annotations.json')) if export_format == 'coco' else None
+    done_images = 0
+    pending = set()
+    pending_chunks = chunks()
+    try:
+        # 导出在后台线程中发起，fork 可能复制其它线程持有的锁而死锁，用 spawn 启动
+        # 工作进程（本模块导入时没有副作用，应用对象在 init_worker 中才创建）
+        with ProcessPoolExecutor(max_workers=max(1, workers), initializer=init_worker,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < max_in_flight:
+                    chunk = None if is_cancelled is not None and is_cancelled() else next(pending_chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    pending.add(executor.submit(export_chunk, export_format, base_dir, output_dir, chunk))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_stats, records = future.result()
+                    stats.merge(chunk_stats)
+                    done_images += chunk_stats.images + chunk_stats.failed
+                    if coco is not None:
+                        for rel_path, width, height, boxes in records:
+                            coco.add_image(rel_path, width, height, boxes)
+                if progress is not None:
+                    progress(done_images, total)
+    except BaseException:
+        if coco is not None:
+            coco.abort()
+        raise
+
+    category_names = sorted(category_ids, key=category_ids.get)
+    if coco is not None:
+        if is_cancelled is not None and is_cancelled():
+            coco.abort()
+        else:
+            coco.close(category_names)
+    elif export_format == 'yolo':
+        with open(os.path.join(output_dir, 'classes.txt'), 'w', encoding='utf-8') as f:
+            f.write(''.join(name + '\n' for name in category_names))
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+class ExportSignals(QObject):
+    """导出任务的信号"""
+    # 参数：批次号、已完成数、总数
+    progress = pyqtSignal(int, int, int)
+    # 参数：批次号、统计结果（出错时为错误信息）
+    finished = pyqtSignal(int, object)
+
+
+class ExportTask(QRunnable):
+    """在后台线程中协调进程池完成导出"""
+
+    def __init__(self, exporter, generation, storage, output_dir, export_format, include_pending):
+        super().__init__()
+        self.exporter = exporter
+        self.generation = generation
+        self.storage = storage
+        self.output_dir = output_dir
+        self.export_format = export_format
+        self.include_pending = include_pending
+
+    def run(self):
+        exporter = self.exporter
+        try:
+            result = export_annotations(
+                self.storage, self.output_dir, self.export_format, exporter.workers,
+                include_pending=self.include_pending,
+                progress=lambda done, total: exporter.signals.progress.emit(self.generation, done, total),
+                is_cancelled=lambda: exporter.generation != self.generation
+            )
+        except Exception as e:
+            result = f"{type(e).__name__}: {e}"
+        exporter.signals.finished.emit(self.generation, result)
+
+
+class AnnotationExporter(QObject):
+    """在后台导出整个数据集的标注，不阻塞界面
+
+    再次调用 start() 或 cancel() 会作废正在进行的导出。
+    """
+
+    # 参数：已完成数、总数
+    progress = pyqtSignal(int, int)
+    # 参数：统计结果（ExportStats，出错时为错误信息字符串）
+    finished = pyqtSignal(object)
+
+    def __init__(self, workers=4, parent=None):
+        super().__init__(parent)
+        self.workers = workers
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.signals = ExportSignals()
+        self.signals.progress.connect(self._on_progress)
+        self.signals.finished.connect(self._on_finished)
+
+    def start(self, storage, output_dir, export_format, include_pending=False):
+        """开始导出"""
+        self.cancel()
+        self.thread_pool.start(ExportTask(
+            self, self.generation, storage, output_dir, export_format, include_pending
+        ))
+
+    def cancel(self):
+        """作废正在进行的导出"""
+        self.generation += 1
+
+    def _on_progress(self, generation, done, total):
+        if generation == self.generation:
+            self.progress.emit(done, total)
+
+    def _on_finished(self, generation, result):
+        if generation == self.generation:
+            self.finished.emit(result)
+
+
+def main(argv=None):
+    """命令行入口：不启动界面，导出整个目录的标注并报告吞吐量"""
+    from annotation_storage import create_annotation_storage
+    from detectors import load_class_names
+
+    parser = argparse.ArgumentParser(description="把目录中的标注导出为 YOLO / VOC / COCO 格式")
+    parser.add_argument('directory', help="图片目录（标注文件所在的目录）")
+    parser.add_argument('--format', required=True, choices=EXPORT_FORMATS, help="导出格式")
+    parser.add_argument('--output', help="输出目录（默认为 <目录>/export_<格式>）")
+    parser.add_argument('--classes', help="类别名称文件，每行一个，决定类别号的顺序")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--storage', default='json', choices=['json', 'sqlite'],
+                        help="标注存储后端")
+    parser.add_argument('--include-pending', action='store_true', help="同时导出待确认的框")
+    args = parser.parse_args(argv)
+
+    # QImageReader 的图片格式插件需要应用对象
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+
+    directory = os.path.abspath(args.directory)
+    output_dir = os.path.abspath(args.output or os.path.join(directory, f"export_{args.format}"))
+    class_names = load_class_names(args.classes) if args.classes else None
+
+    storage = create_annotation_storage(args.storage)
+    storage.set_base_directory(directory)
+    last_report = [0.0]
+
+    def report(done, total):
+        now = time.perf_counter()
+        if now - last_report[0] >= 1.0 or done == total:
+            last_report[0] = now
+            print(f"\r{done}/{total}", end='', flush=True)
+
+    try:
+        stats = export_annotations(storage, output_dir, args.format, args.workers, class_names,
+                                   args.include_pending, progress=report)
+    finally:
+        storage.close()
+    print()
+    print(stats)
+    print(f"已导出到 {output_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
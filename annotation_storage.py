@@ -0,0 +1,327 @@
+import json
+import os
+import threading
+import time
+
+from lazy_annotations import (
+    LazyAnnotationDict, build_offset_index, load_offset_index, replace_snapshot,
+    save_offset_index, write_snapshot_file
+)
+
+
+def create_annotation_storage(backend='json', **kwargs):
+    """按名称创建标注存储后端：'json'（快照+日志）或 'sqlite'"""
+    if backend == 'sqlite':
+        from sqlite_annotation_storage import SQLiteAnnotationStorage
+        return SQLiteAnnotationStorage(**kwargs)
+    if backend == 'json':
+        return AnnotationStorage(**kwargs)
+    raise ValueError(f"未知的标注存储后端: {backend}")
+
+
+class AnnotationStorage:
+    """标注存储：annotations.json 快照 + 追加写入的日志文件
+
+    每次保存只把当前图片的标注作为一行JSON追加到 annotations.journal，
+    开销只与当前图片的框数有关；日志积累到一定规模后再合并回快照。
+    加载时先读快照，再按顺序重放日志，得到同样的 annotations 字典。
+
+    写盘由后台线程完成：save_annotation 只登记“脏”图片，后台线程每隔
+    flush_interval 秒把积累的修改合并为一次写入，GUI线程不等待磁盘I/O。
+
+    懒加载模式下不解析整个快照，只建立每张图片的字节偏移索引
+    （保存在 annotations.json.idx 中），load_annotation 访问时才解析对应片段。
+    """
+
+    # 日志累计条数超过该值时合并到快照
+    COMPACT_ENTRY_THRESHOLD = 2000
+    # 默认的后台写盘间隔（秒）
+    DEFAULT_FLUSH_INTERVAL = 1.0
+    # 自动模式下，快照超过该大小时使用懒加载
+    LAZY_LOAD_THRESHOLD = 32 * 1024 * 1024
+
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL, lazy=None):
+        self.annotations = {}  # 存储所有图片的标注信息
+        self.lazy = lazy  # True/False 强制开关懒加载，None 按文件大小自动选择
+        self.journal_entries = 0  # 日志中尚未合并的记录数
+        self.compact_at = self.COMPACT_ENTRY_THRESHOLD  # 日志记录数达到该值时合并
+        self.journal_torn = False  # 日志末尾是否残留不完整的行
+        self.catalog = None  # 与主窗口共用的 ImageCatalog，用于快速得到相对路径
+
+        # 后台写盘相关状态
+        self.flush_interval = flush_interval
+        self.dirty = {}                        # 待写盘的图片：相对路径 -> 标注列表
+        self.lock = threading.Lock()           # 保护 annotations 和 dirty
+        self.condition = threading.Condition(self.lock)
+        self.io_lock = threading.Lock()        # 串行化所有磁盘写入
+        self.closed = False
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def save_annotation(self, image_path, rect_items, metadata=None):
+        """保存单个图片的标注信息（只登记修改，由后台线程写盘）
+
+        metadata 中的字段会附加到每个标注框上（例如坐标空间信息）。
+        """
+        annotations = []
+        for rect_item in rect_items:
+            rect = rect_item.rect()
+            scene_pos = rect_item.scenePos()
+            annotation = {
+                'category': getattr(rect_item, 'category', ''),
+                'x': rect.x() + scene_pos.x(),
+                'y': rect.y() + scene_pos.y(),
+                'width': rect.width(),
+                'height': rect.height()
+            }
+            if metadata:
+                annotation.update(metadata)
+            annotations.append(annotation)
+
+        self.save_annotation_data(image_path, annotations)
+
+    def save_annotation_data(self, image_path, annotations):
+        """直接保存单个图片的标注字典列表"""
+        self._mark_dirty(self._get_relative_path(image_path), annotations)
+
+    def load_annotation(self, image_path):
+        """加载单个图片的标注信息"""
+        return self.annotations.get(self._get_relative_path(image_path), [])
+
+    def read_annotation(self, image_path):
+        """读取单个图片的标注但不缓存
+
+        供后台批量处理检查已有标注使用：懒加载模式下读取的条目不留在内存中。
+        """
+        rel_path = self._get_relative_path(image_path)
+        annotations = self.annotations
+        if isinstance(annotations, LazyAnnotationDict):
+            return annotations.read(rel_path, [])
+        return annotations.get(rel_path, [])
+
+    def iter_annotations(self):
+        """按相对路径顺序遍历所有图片的标注，产出 (相对路径, 标注列表)
+
+        用于导出等一次性的全量读取：懒加载模式下读取的条目不留在内存中。
+        """
+        with self.lock:
+            annotations = self.annotations
+            keys = sorted(annotations)
+        for rel_path in keys:
+            if isinstance(annotations, LazyAnnotationDict):
+                value = annotations.read(rel_path)
+            else:
+                value = annotations.get(rel_path)
+            if value is not None:
+                yield rel_path, value
+
+    def set_base_directory(self, directory):
+        """设置基础目录，用于生成相对路径"""
+        # 先把旧目录的修改写完，再切换
+        self.flush()
+        with self.io_lock:
+            self.base_dir = directory
+            self._load_from_file()
+
+    def set_catalog(self, catalog):
+        """使用图片目录计算相对路径（目录根与基础目录一致时生效）"""
+        self.catalog = catalog
+
+    def flush(self):
+        """立即把所有待写盘的修改写入磁盘（阻塞直到完成）"""
+        self._write_pending()
+
+    def close(self):
+        """停止后台线程并写完剩余修改（关闭窗口时调用）"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.writer_thread.join()
+        self.flush()
+
+    def compact(self):
+        """将日志合并到快照文件并清空日志"""
+        with self.io_lock:
+            self._compact()
+
+    def _mark_dirty(self, rel_path, annotations):
+        """更新内存中的标注并登记为待写盘"""
+        with self.condition:
+            self.annotations[rel_path] = annotations
+            self.dirty[rel_path] = annotations
+            self.condition.notify_all()
+
+    def _writer_loop(self):
+        """后台写盘线程：有修改时等待一个写盘间隔，把期间的修改合并写入"""
+        while True:
+            with self.condition:
+                while not self.dirty and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                # 攒批：等待写盘间隔（关闭时立即结束等待）
+                self.condition.wait_for(lambda: self.closed, timeout=self.flush_interval)
+            self._write_pending()
+
+    def _write_pending(self):
+        """取出所有待写盘的修改，追加到日志（必要时合并快照）"""
+        with self.io_lock:
+            with self.lock:
+                batch = self.dirty
+                self.dirty = {}
+            if not batch:
+                return
+            try:
+                self._write_batch(batch)
+            except OSError as e:
+                print(f"标注写盘失败，稍后重试: {e}")
+                # 放回未被更新修改覆盖的记录
+                with self.lock:
+                    for rel_path, annotations in batch.items():
+                        self.dirty.setdefault(rel_path, annotations)
+
+    def _write_batch(self, batch):
+        """把一批修改写入磁盘（调用方需持有 io_lock）"""
+        self._append_to_journal(batch)
+        self._compact_if_needed()
+
+    def _compact_if_needed(self):
+        """日志足够长时合并快照（调用方需持有 io_lock）
+
+        修改已经写入日志，合并失败不会丢失数据：不重新登记这批修改，
+        而是等日志再增长一个阈值后重试，避免每次写盘都重写整个快照。
+        """
+        if self.journal_entries < self.compact_at:
+            return
+        try:
+            self._compact()
+        except OSError as e:
+            self.compact_at = self.journal_entries + self.COMPACT_ENTRY_THRESHOLD
+            print(f"标注快照合并失败，稍后重试: {e}")
+
+    def _compact(self):
+        """合并快照并删除日志（调用方需持有 io_lock）"""
+        file_path = self._get_annotation_file_path()
+        if not file_path:
+            return
+        with self.lock:
+            if isinstance(self.annotations, LazyAnnotationDict):
+                entries = self.annotations.snapshot_entries()
+                source_path = self.annotations.file_path
+            else:
+                entries = [(key, value, None) for key, value in self.annotations.items()]
+                source_path = None
+        temp_path, index = write_snapshot_file(file_path, entries, source_path)
+        if isinstance(self.annotations, LazyAnnotationDict):
+            # 懒加载字典仍打开着旧快照，由它关闭文件后再改名
+            written = {key: value for key, value, span in entries if span is None}
+            self.annotations.rebase(file_path, index, written, temp_path)
+        else:
+            replace_snapshot(temp_path, file_path, index)
+
+        journal_path = self._get_journal_file_path()
+        if journal_path and os.path.exists(journal_path):
+            os.remove(journal_path)
+        self.journal_entries = 0
+        self.journal_torn = False
+        self.compact_at = self.COMPACT_ENTRY_THRESHOLD
+
+    def _get_relative_path(self, image_path):
+        """获取相对路径作为键"""
+        if self.catalog is not None and self.catalog.root == self.base_dir:
+            return self.catalog.relative_path(image_path)
+        if image_path.startswith(self.base_dir):
+            return os.path.relpath(image_path, self.base_dir)
+        return image_path
+
+    def _get_annotation_file_path(self):
+        """获取标注文件的路径"""
+        if hasattr(self, 'base_dir'):
+            return os.path.join(self.base_dir, 'annotations.json')
+        return None
+
+    def _get_journal_file_path(self):
+        """获取标注日志文件的路径"""
+        if hasattr(self, 'base_dir'):
+            return os.path.join(self.base_dir, 'annotations.journal')
+        return None
+
+    def _append_to_journal(self, batch):
+        """把一批图片的标注一次性追加到日志文件并fsync"""
+        journal_path = self._get_journal_file_path()
+        if not journal_path:
+            return
+        lines = [
+            json.dumps({'path': rel_path, 'annotations': annotations}, ensure_ascii=False) + '\n'
+            for rel_path, annotations in batch.items()
+        ]
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            # 末尾残留半行时先换行，避免新记录与其拼接在一起
+            if self.journal_torn:
+                f.write('\n')
+                self.journal_torn = False
+            f.write(''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_entries += len(lines)
+
+    def _use_lazy_loading(self, file_path):
+        """判断是否对指定快照使用懒加载"""
+        if self.lazy is not None:
+            return self.lazy
+        return os.path.getsize(file_path) >= self.LAZY_LOAD_THRESHOLD
+
+    def _load_lazily(self, file_path):
+        """读取（或扫描生成）偏移索引，返回懒加载字典"""
+        index = load_offset_index(file_path)
+        if index is None:
+            index = build_offset_index(file_path)
+            try:
+                save_offset_index(file_path, index)
+            except OSError as e:
+                print(f"无法保存标注索引: {e}")
+        return LazyAnnotationDict(file_path, index)
+
+    def _load_from_file(self):
+        """从快照文件加载标注信息，并重放日志"""
+        if isinstance(self.annotations, LazyAnnotationDict):
+            self.annotations.close()
+
+        file_path = self._get_annotation_file_path()
+        annotations = {}
+        if file_path and os.path.exists(file_path):
+            try:
+                if self._use_lazy_loading(file_path):
+                    annotations = self._load_lazily(file_path)
+                else:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        annotations = json.load(f)
+            except (ValueError, UnicodeDecodeError):
+                # 不直接丢弃损坏的文件：改名保留，避免之后的合并覆盖它
+                backup_path = f"{file_path}.corrupt-{time.strftime('%Y%m%d-%H%M%S')}"
+                os.replace(file_path, backup_path)
+                print(f"标注文件损坏，已备份到 {backup_path}，将从日志中恢复")
+        with self.lock:
+            self.annotations = annotations
+        self._replay_journal()
+
+    def _replay_journal(self):
+        """按顺序重放日志，后写入的记录覆盖先前的记录"""
+        self.journal_entries = 0
+        self.journal_torn = False
+        self.compact_at = self.COMPACT_ENTRY_THRESHOLD
+        journal_path = self._get_journal_file_path()
+        if not journal_path or not os.path.exists(journal_path):
+            return
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self.journal_torn = not line.endswith('\n')
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 最后一行可能因中途退出而不完整，跳过即可
+                    print("标注日志中存在不完整的记录，已跳过")
+                    continue
+                self.annotations[entry['path']] = entry['annotations']
+                self.journal_entries += 1
+        self._compact_if_needed()
@@ -0,0 +1,303 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from annotation_coordinates import IMAGE_SPACE
+from box_propagator import merge_proposals
+from detectors import create_detector
+
+
+# 自动标注生成的框带有该来源标记，并在用户确认前标记为待确认（pending）
+AUTO_SOURCE = 'auto'
+
+
+class AutoLabelStats:
+    """一次自动标注的统计结果"""
+
+    def __init__(self):
+        self.images = 0     # 完成推理的图片数
+        self.boxes = 0      # 检测到的框数（与已有框重叠的在写入时跳过）
+        self.skipped = 0    # 已有标注而跳过的图片数
+        self.failed = 0     # 无法读取的图片数
+        self.seconds = 0.0
+
+    @property
+    def images_per_second(self):
+        return self.images / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f"处理 {self.images} 张图片，生成 {self.boxes} 个框，跳过 {self.skipped} 张，"
+                f"失败 {self.failed} 张，耗时 {self.seconds:.1f} 秒（{self.images_per_second:.1f} 张/秒）")
+
+
+def run_detector_batch(detector, image_paths):
+    """在工作线程中预处理并推理一批图片，返回 [(图片路径, 检测框列表或None)]"""
+    inputs = []
+    prepared_paths = []
+    results = []
+    for image_path in image_paths:
+        prepared = detector.prepare(image_path)
+        if prepared is None:
+            results.append((image_path, None))
+        else:
+            inputs.append(prepared)
+            prepared_paths.append(image_path)
+    if inputs:
+        results.extend(zip(prepared_paths, detector.detect(inputs)))
+    return results
+
+
+def apply_detections(storage, image_path, detections, overwrite=False):
+    """把检测结果写入图片的标注，返回实际加入的框列表
+
+    overwrite 为 True 时替换已有标注；否则与写入时存储中的标注合并，跳过
+    与已有框重叠的结果。应在保存标注的线程（界面线程）中调用，用户在推理
+    期间保存的修改不会被覆盖。
+    """
+    if overwrite:
+        storage.save_annotation_data(image_path, detections)
+        return detections
+    annotations, added = merge_proposals(storage.read_annotation(image_path), detections)
+    if added:
+        storage.save_annotation_data(image_path, annotations)
+    return added
+
+
+def auto_label_images(detector, storage, image_paths, workers=4, overwrite=False,
+                      progress=None, is_cancelled=None, apply=None):
+    """用检测器标注一批图片，结果通过标注存储写入
+
+    图片按检测器的批大小分组后交给线程池，在飞的批次数有上限，内存占用
+    与数据集大小无关。已有标注的图片默认跳过，overwrite 为 True 时替换为
+    检测结果。progress(已完成, 总数) 在调用线程中回调；is_cancelled() 返回
+    True 时尽快停止。apply([(图片路径, 检测框)]) 接收每批结果，不指定时直接
+    用 apply_detections 写入 storage。返回 AutoLabelStats。
+    """
+    stats = AutoLabelStats()
+    started = time.perf_counter()
+    total = len(image_paths)
+    batch_size = max(1, detector.batch_size)
+    max_in_flight = max(1, workers) * 2
+
+    def batches():
+        batch = []
+        for image_path in image_paths:
+            # 不缓存读取的标注，懒加载的条目不会因检查而全部留在内存中
+            if not overwrite and storage.read_annotation(image_path):
+                stats.skipped += 1
+                continue
+            batch.append(image_path)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    pending = set()
+    pending_batches = batches()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                if is_cancelled is not None and is_cancelled():
+                    exhausted = True
+                    break
+                batch = next(pending_batches, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(run_detector_batch, detector, batch))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            results = []
+            for future in done:
+                for image_path, detections in future.result():
+                    if detections is None:
+                        stats.failed += 1
+                        continue
+                    stats.images += 1
+                    stats.boxes += len(detections)
+                    for detection in detections:
+                        detection['source'] = AUTO_SOURCE
+                        detection['pending'] = True
+                        detection['coordinates'] = IMAGE_SPACE
+                    if detections:
+                        results.append((image_path, detections))
+            if results:
+                if apply is not None:
+                    apply(results)
+                else:
+                    for image_path, detections in results:
+                        apply_detections(storage, image_path, detections, overwrite)
+            if progress is not None:
+                progress(stats.images + stats.failed + stats.skipped, total)
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+class AutoLabelSignals(QObject):
+    """自动标注任务的信号"""
+    # 参数：批次号、已完成数、总数
+    progress = pyqtSignal(int, int, int)
+    # 参数：批次号、一批检测结果 [(图片路径, 检测框)]
+    results = pyqtSignal(int, object)
+    # 参数：批次号、统计结果（出错时为错误信息）
+    finished = pyqtSignal(int, object)
+
+
+class AutoLabelTask(QRunnable):
+    """在后台线程中对整个数据集运行自动标注"""
+
+    def __init__(self, labeler, generation, detector, storage, image_paths, overwrite):
+        super().__init__()
+        self.labeler = labeler
+        self.generation = generation
+        self.detector = detector
+        self.storage = storage
+        self.image_paths = image_paths
+        self.overwrite = overwrite
+
+    def run(self):
+        labeler = self.labeler
+        try:
+            result = auto_label_images(
+                self.detector, self.storage, self.image_paths, labeler.workers, self.overwrite,
+                progress=lambda done, total: labeler.signals.progress.emit(self.generation, done, total),
+                is_cancelled=lambda: labeler.generation != self.generation,
+                apply=lambda results: labeler.signals.results.emit(self.generation, results)
+            )
+        except Exception as e:
+            result = f"{type(e).__name__}: {e}"
+        labeler.signals.finished.emit(self.generation, result)
+
+
+class AutoLabeler(QObject):
+    """在后台对整个数据集运行检测器，不阻塞界面
+
+    协调任务在单线程的线程池中运行，推理在其内部的工作线程池中进行，
+    结果在界面线程中写入标注存储；再次调用 start() 或 cancel() 会作废
+    正在进行的标注。
+    """
+
+    # 参数：已完成数、总数
+    progress = pyqtSignal(int, int)
+    # 参数：[(图片路径, 实际加入的框)]
+    images_updated = pyqtSignal(list)
+    # 参数：统计结果（AutoLabelStats，出错时为错误信息字符串）
+    finished = pyqtSignal(object)
+
+    def __init__(self, workers=4, parent=None):
+        super().__init__(parent)
+        self.workers = workers
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.storage = None
+        self.overwrite = False
+        self.signals = AutoLabelSignals()
+        self.signals.progress.connect(self._on_progress)
+        self.signals.results.connect(self._on_results)
+        self.signals.finished.connect(self._on_finished)
+
+    def start(self, detector, storage, image_paths, overwrite=False):
+        """开始标注（image_paths 会被复制，之后列表的变化不影响本次标注）"""
+        self.cancel()
+        self.storage = storage
+        self.overwrite = overwrite
+        self.thread_pool.start(AutoLabelTask(
+            self, self.generation, detector, storage, list(image_paths), overwrite
+        ))
+
+    def cancel(self):
+        """作废正在进行的标注"""
+        self.generation += 1
+
+    def is_running(self):
+        return self.thread_pool.activeThreadCount() > 0
+
+    def _on_progress(self, generation, done, total):
+        if generation == self.generation:
+            self.progress.emit(done, total)
+
+    def _on_results(self, generation, results):
+        if generation != self.generation:
+            return
+        updates = []
+        for image_path, detections in results:
+            added = apply_detections(self.storage, image_path, detections, self.overwrite)
+            if added:
+                updates.append((image_path, added))
+        if updates:
+            self.images_updated.emit(updates)
+
+    def _on_finished(self, generation, stats):
+        if generation == self.generation:
+            self.finished.emit(stats)
+
+
+def main(argv=None):
+    """命令行入口：不启动界面，对整个目录运行自动标注并报告吞吐量"""
+    from PyQt5.QtCore import QCoreApplication
+    from annotation_storage import create_annotation_storage
+    from image_indexer import DirectoryWalk, load_directory_index
+
+    parser = argparse.ArgumentParser(description="对目录中的所有图片运行自动标注")
+    parser.add_argument('directory', help="图片目录")
+    parser.add_argument('--backend', default='stub', choices=['stub', 'onnx', 'opencv'],
+                        help="检测器后端")
+    parser.add_argument('--model', help="模型文件（onnx / opencv 后端需要）")
+    parser.add_argument('--classes', help="类别名称文件，每行一个")
+    parser.add_argument('--version', choices=['v5', 'v8'],
+                        help="YOLO 输出格式（未指定时由类别文件推断）")
+    parser.add_argument('--input-size', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.25, help="置信度阈值")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--storage', default='json', choices=['json', 'sqlite'],
+                        help="标注存储后端")
+    parser.add_argument('--overwrite', action='store_true', help="替换已有的标注")
+    args = parser.parse_args(argv)
+
+    # QImageReader 的图片格式插件需要应用对象
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+
+    if args.backend == 'stub':
+        detector = create_detector('stub', batch_size=args.batch_size)
+    else:
+        if not args.model:
+            parser.error(f"{args.backend} 后端需要 --model")
+        detector = create_detector(
+            args.backend, model=args.model, class_names=args.classes, version=args.version,
+            input_size=args.input_size, conf_threshold=args.conf, batch_size=args.batch_size
+        )
+
+    directory = os.path.abspath(args.directory)
+    image_paths = list(DirectoryWalk(directory, load_directory_index(directory), workers=4))
+    print(f"共找到 {len(image_paths)} 张图片")
+
+    storage = create_annotation_storage(args.storage)
+    storage.set_base_directory(directory)
+    last_report = [0.0]
+
+    def report(done, total):
+        now = time.perf_counter()
+        if now - last_report[0] >= 1.0 or done == total:
+            last_report[0] = now
+            print(f"\r{done}/{total}", end='', flush=True)
+
+    try:
+        stats = auto_label_images(detector, storage, image_paths, args.workers, args.overwrite, report)
+    finally:
+        storage.close()
+    print()
+    print(stats)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
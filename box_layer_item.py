@@ -0,0 +1,414 @@
+from array import array
+
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QBrush, QColor, QFont, QFontMetrics, QPainter, QPen, QPixmap
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+from box_spatial_index import BoxSpatialIndex
+
+
+# 由框的几何信息和坐标空间决定的字段，其余字段（如 score、source、pending）原样保留
+GEOMETRY_KEYS = ('category', 'x', 'y', 'width', 'height',
+                 'coordinates', 'display_width', 'display_height')
+
+
+class BoxLayerItem(QGraphicsItem):
+    """在一次 paint 中绘制当前图片所有标注框的图形层
+
+    框的几何信息保存在紧凑的数组中（每个框只占几个浮点数），不为每个框
+    创建图形项。只有被选中或鼠标悬停的框才会“提升”为可交互的
+    ResizableRectItem，此时图形层跳过该框，由提升后的图形项负责绘制和
+    编辑；取消提升时把几何信息写回数组。
+
+    框的编号在删除其它框后保持不变，已删除的编号不再复用。
+
+    绘制时按视图变换决定细节层次：屏幕上过小的框不画控制柄和标签，
+    极小的框画成点（同一屏幕像素内只画一个），标签文字缓存为图片。
+
+    自动标注产生的待确认框（pending）用虚线绘制，接受后与普通框相同。
+    """
+
+    LABEL_OFFSET = 20     # 标签位于框上方的屏幕像素距离
+    LABEL_MARGIN = 4      # 与 QGraphicsTextItem 的文档边距一致
+    HANDLE_SIZE = 8       # 控制柄的屏幕像素大小
+
+    # 细节层次的默认阈值（屏幕像素），缩小视图时跳过看不清的细节
+    HANDLE_MIN_SCREEN = 24
+    LABEL_MIN_SCREEN = 16
+    POINT_MAX_SCREEN = 3
+
+    MAX_CACHED_LABELS = 256  # 缓存的标签文字图片数量
+
+    def __init__(self, bounds, scene_unit=1.0, parent=None):
+        super().__init__(parent)
+        self.bounds = QRectF(bounds)
+        self.scene_unit = scene_unit
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        # 图形层本身不接收鼠标事件，交互由提升后的框处理
+        self.setAcceptedMouseButtons(Qt.NoButton)
+
+        # 框的数据（按编号索引）
+        self.xs = array('d')
+        self.ys = array('d')
+        self.widths = array('d')
+        self.heights = array('d')
+        self.alive = bytearray()
+        self.categories = []
+        self.extras = []      # 编号 -> 几何信息之外的字段（没有时为None）
+        self.pending = set()  # 待确认的框编号
+        self.items = {}       # 编号 -> 提升后的 ResizableRectItem
+        self.selected = []    # 按选中先后排列的已选中编号
+        self.count = 0
+
+        self.index = BoxSpatialIndex(max(32, max(self.bounds.width(), self.bounds.height()) / 64))
+
+        self.box_pen = QPen(QColor(255, 0, 0), 2)
+        self.box_pen.setCosmetic(True)
+        self.handle_pen = QPen(QColor(128, 128, 255), 1)
+        self.handle_pen.setCosmetic(True)
+        self.handle_brush = QBrush(QColor(128, 128, 255))
+        self.point_pen = QPen(QColor(255, 0, 0), 3)
+        self.point_pen.setCosmetic(True)
+        self.pending_pen = QPen(QColor(255, 200, 0), 2, Qt.DashLine)
+        self.pending_pen.setCosmetic(True)
+        self.label_font = QFont()
+        self.label_cache = {}  # (类别, 设备像素比) -> QPixmap
+
+        self.handle_min_screen = self.HANDLE_MIN_SCREEN
+        self.label_min_screen = self.LABEL_MIN_SCREEN
+        self.point_max_screen = self.POINT_MAX_SCREEN
+
+    # ---- 数据存取 ----
+
+    def set_boxes(self, annotations):
+        """批量载入标注（每项包含 x, y, width, height, category）"""
+        self.prepareGeometryChange()
+        for annotation in annotations:
+            extra = {key: value for key, value in annotation.items() if key not in GEOMETRY_KEYS}
+            self._append(annotation['x'], annotation['y'], annotation['width'],
+                         annotation['height'], annotation.get('category'), extra or None)
+        self.update()
+
+    def reset(self, bounds, scene_unit):
+        """换到另一张图片：清空所有框，保留图形层本身和标签缓存（调用前应先取消所有提升）"""
+        self.prepareGeometryChange()
+        self.bounds = QRectF(bounds)
+        self.scene_unit = scene_unit
+        del self.xs[:], self.ys[:], self.widths[:], self.heights[:], self.alive[:]
+        self.categories = []
+        self.extras = []
+        self.pending = set()
+        self.items = {}
+        self.selected = []
+        self.count = 0
+        self.index.clear(max(32, max(self.bounds.width(), self.bounds.height()) / 64))
+        self.update()
+
+    def add_box(self, rect, category=None):
+        """添加一个框，返回其编号"""
+        box_id = self._append(rect.x(), rect.y(), rect.width(), rect.height(), category)
+        self.update(self._dirty_rect(box_id))
+        return box_id
+
+    def remove_box(self, box_id):
+        """删除一个框（调用前应先取消提升）"""
+        if not self.is_alive(box_id):
+            return
+        dirty = self._dirty_rect(box_id)
+        self.alive[box_id] = 0
+        self.categories[box_id] = None
+        self.extras[box_id] = None
+        self.pending.discard(box_id)
+        self.index.remove(box_id)
+        if box_id in self.selected:
+            self.selected.remove(box_id)
+        self.count -= 1
+        self.update(dirty)
+
+    def is_alive(self, box_id):
+        return 0 <= box_id < len(self.alive) and self.alive[box_id]
+
+    def box_ids(self):
+        """按添加顺序返回所有框的编号"""
+        return [i for i, alive in enumerate(self.alive) if alive]
+
+    def box_rect(self, box_id):
+        """框在场景坐标中的矩形"""
+        return QRectF(self.xs[box_id], self.ys[box_id], self.widths[box_id], self.heights[box_id])
+
+    def category(self, box_id):
+        """框的类别（尚未设置时为None）"""
+        return self.categories[box_id]
+
+    def set_category(self, box_id, category):
+        """设置框的类别"""
+        self.categories[box_id] = category
+        if box_id not in self.items:
+            self.update(self._dirty_rect(box_id))
+
+    def is_pending(self, box_id):
+        """框是否为尚未确认的自动标注结果"""
+        return box_id in self.pending
+
+    def pending_ids(self):
+        return sorted(self.pending)
+
+    def accept_box(self, box_id):
+        """接受待确认的框，此后与人工标注的框相同"""
+        if box_id not in self.pending:
+            return
+        self.pending.discard(box_id)
+        extra = self.extras[box_id]
+        extra.pop('pending', None)
+        if not extra:
+            self.extras[box_id] = None
+        if box_id not in self.items:
+            self.update(self._dirty_rect(box_id))
+
+    def annotations(self):
+        """返回用于保存的标注字典列表"""
+        annotations = []
+        for i in self.box_ids():
+            annotation = {
+                'category': self.categories[i] or '',
+                'x': self.xs[i],
+                'y': self.ys[i],
+                'width': self.widths[i],
+                'height': self.heights[i]
+            }
+            if self.extras[i]:
+                annotation.update(self.extras[i])
+            annotations.append(annotation)
+        return annotations
+
+    # ---- 提升为可交互图形项 ----
+
+    def item(self, box_id):
+        """返回提升后的图形项，未提升时返回None"""
+        return self.items.get(box_id)
+
+    def promoted_ids(self):
+        return list(self.items)
+
+    def attach_item(self, box_id, rect_item):
+        """登记提升后的图形项，此后该框由图形项绘制"""
+        rect_item.box_id = box_id
+        rect_item.box_layer = self
+        self.items[box_id] = rect_item
+        if rect_item.isSelected():
+            self.item_selection_changed(rect_item, True)
+        self.update(self._dirty_rect(box_id))
+
+    def detach_item(self, box_id):
+        """取消提升：把图形项的几何信息写回数组，返回该图形项"""
+        rect_item = self.items.pop(box_id, None)
+        if rect_item is None:
+            return None
+        self.item_geometry_changed(rect_item)
+        rect_item.box_layer = None
+        if box_id in self.selected:
+            self.selected.remove(box_id)
+        self.update(self._dirty_rect(box_id))
+        return rect_item
+
+    def item_geometry_changed(self, rect_item):
+        """提升后的图形项移动或调整大小（由 ResizableRectItem 调用）"""
+        box_id = rect_item.box_id
+        if not self.is_alive(box_id):
+            return
+        rect = rect_item.scene_rect()
+        self.xs[box_id] = rect.x()
+        self.ys[box_id] = rect.y()
+        self.widths[box_id] = rect.width()
+        self.heights[box_id] = rect.height()
+        self.index.update(box_id, self.box_rect(box_id))
+
+    def item_selection_changed(self, rect_item, selected):
+        """提升后的图形项选中状态变化（由 ResizableRectItem 调用）"""
+        box_id = rect_item.box_id
+        if selected and box_id not in self.selected:
+            self.selected.append(box_id)
+        elif not selected and box_id in self.selected:
+            self.selected.remove(box_id)
+
+    def selected_items(self):
+        """返回当前选中的图形项"""
+        return [self.items[i] for i in self.selected if i in self.items]
+
+    # ---- 命中检测 ----
+
+    def hit_test(self, pos):
+        """返回 (框编号, 控制柄序号)：优先命中控制柄，其次命中框内部；都未命中时返回 (None, None)"""
+        margin = self._handle_margin(self.scene_unit)
+        nearby = self.index.query(QRectF(pos.x() - margin, pos.y() - margin, 2 * margin, 2 * margin))
+        # 提升后的框在图形层之上，其次后添加的框在上层
+        candidates = sorted(nearby, key=lambda i: (i in self.items, i), reverse=True)
+        for box_id in candidates:
+            handle = self.handle_at(box_id, pos)
+            if handle is not None:
+                return box_id, handle
+        for box_id in candidates:
+            if self.box_rect(box_id).contains(pos):
+                return box_id, None
+        return None, None
+
+    def handle_at(self, box_id, pos):
+        """检查场景坐标是否在框的控制柄上"""
+        rect_item = self.items.get(box_id)
+        if rect_item is not None:
+            return rect_item.handle_at(pos)
+        half = self.HANDLE_SIZE * self.scene_unit / 2
+        for i, corner in enumerate(self._corners(box_id)):
+            if abs(pos.x() - corner.x()) <= half and abs(pos.y() - corner.y()) <= half:
+                return i
+        return None
+
+    # ---- 绘制 ----
+
+    def set_scene_unit(self, unit):
+        """设置一个屏幕像素对应的场景长度（视图缩放后调用）"""
+        self.prepareGeometryChange()
+        self.scene_unit = unit
+        self.update()
+
+    def set_lod_thresholds(self, handle_min=None, label_min=None, point_max=None):
+        """设置细节层次的阈值（屏幕像素）
+
+        handle_min：框的短边小于该值时不绘制控制柄；
+        label_min：框的宽度小于该值时不绘制标签；
+        point_max：框的长边小于该值时画成一个点。
+        """
+        if handle_min is not None:
+            self.handle_min_screen = handle_min
+        if label_min is not None:
+            self.label_min_screen = label_min
+        if point_max is not None:
+            self.point_max_screen = point_max
+        self.update()
+
+    def boundingRect(self):
+        # 为框外的控制柄和框上方的标签留出余量
+        margin = (self.LABEL_OFFSET + self.HANDLE_SIZE) * self.scene_unit
+        return self.bounds.adjusted(-margin, -margin, margin, margin)
+
+    def paint(self, painter, option, widget=None):
+        # 细节层次按实际的视图变换计算（屏幕像素/场景单位）
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if lod <= 0:
+            return
+        unit = 1.0 / lod
+        margin = self._handle_margin(unit)
+        # 框上方的标签可能伸入暴露区域，查询范围向下、向左扩展
+        exposed = option.exposedRect.adjusted(-200 * unit - margin, -margin,
+                                              margin, self.LABEL_OFFSET * unit + margin)
+        visible = [i for i in self.index.query(exposed) if i not in self.items]
+        if not visible:
+            return
+        visible.sort()
+
+        boxes = []
+        pending_boxes = []
+        points = {}      # 屏幕像素 -> 场景坐标点（同一像素内的小框只画一次）
+        handled = []
+        labelled = []
+        for i in visible:
+            screen_width = self.widths[i] * lod
+            screen_height = self.heights[i] * lod
+            if max(screen_width, screen_height) < self.point_max_screen:
+                cx = self.xs[i] + self.widths[i] / 2
+                cy = self.ys[i] + self.heights[i] / 2
+                points.setdefault((int(cx * lod), int(cy * lod)), QPointF(cx, cy))
+                continue
+            (pending_boxes if i in self.pending else boxes).append(self.box_rect(i))
+            if min(screen_width, screen_height) >= self.handle_min_screen:
+                handled.append(i)
+            if screen_width >= self.label_min_screen and self.categories[i]:
+                labelled.append(i)
+
+        # 框
+        painter.setPen(self.box_pen)
+        painter.setBrush(Qt.NoBrush)
+        if boxes:
+            painter.drawRects(boxes)
+        if pending_boxes:
+            painter.setPen(self.pending_pen)
+            painter.drawRects(pending_boxes)
+        if points:
+            painter.setPen(self.point_pen)
+            painter.drawPoints(list(points.values()))
+
+        # 控制柄（只为屏幕上足够大的框绘制）
+        if handled:
+            half = self.HANDLE_SIZE * unit / 2
+            painter.setPen(self.handle_pen)
+            painter.setBrush(self.handle_brush)
+            painter.drawRects([
+                QRectF(corner.x() - half, corner.y() - half, 2 * half, 2 * half)
+                for i in handled for corner in self._corners(i)
+            ])
+
+        # 类别标签（使用缓存的文字图片，按屏幕尺寸绘制）
+        if labelled:
+            ratio = painter.device().devicePixelRatioF()
+            for i in labelled:
+                pixmap = self._label_pixmap(self.categories[i], ratio)
+                painter.save()
+                painter.translate(self.xs[i], self.ys[i] - self.LABEL_OFFSET * unit)
+                painter.scale(unit, unit)
+                painter.drawPixmap(QPointF(self.LABEL_MARGIN, self.LABEL_MARGIN), pixmap)
+                painter.restore()
+
+    def _label_pixmap(self, category, ratio):
+        """返回类别文字的缓存图片，避免每次绘制都重新排版文字"""
+        key = (category, ratio)
+        pixmap = self.label_cache.get(key)
+        if pixmap is not None:
+            return pixmap
+        metrics = QFontMetrics(self.label_font)
+        pixmap = QPixmap(max(1, int((metrics.horizontalAdvance(category) + 2) * ratio)),
+                         max(1, int(metrics.height() * ratio)))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        text_painter = QPainter(pixmap)
+        text_painter.setFont(self.label_font)
+        text_painter.setPen(QColor(Qt.red))
+        text_painter.drawText(QPointF(0, metrics.ascent()), category)
+        text_painter.end()
+        if len(self.label_cache) >= self.MAX_CACHED_LABELS:
+            self.label_cache.clear()
+        self.label_cache[key] = pixmap
+        return pixmap
+
+    # ---- 内部方法 ----
+
+    def _append(self, x, y, width, height, category, extra=None):
+        box_id = len(self.alive)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.widths.append(width)
+        self.heights.append(height)
+        self.alive.append(1)
+        self.categories.append(category)
+        self.extras.append(extra)
+        if extra and extra.get('pending'):
+            self.pending.add(box_id)
+        self.count += 1
+        self.index.insert(box_id, self.box_rect(box_id))
+        return box_id
+
+    def _corners(self, box_id):
+        x, y = self.xs[box_id], self.ys[box_id]
+        right, bottom = x + self.widths[box_id], y + self.heights[box_id]
+        return QPointF(x, y), QPointF(right, y), QPointF(right, bottom), QPointF(x, bottom)
+
+    def _handle_margin(self, unit):
+        """控制柄超出框边缘的场景长度"""
+        return (self.HANDLE_SIZE / 2 + 2) * unit
+
+    def _dirty_rect(self, box_id):
+        """框及其控制柄、标签所占的区域"""
+        margin = self._handle_margin(self.scene_unit)
+        rect = self.box_rect(box_id).adjusted(-margin, -margin, margin, margin)
+        # 标签位于框上方，宽度未知时向右多留一些
+        return rect.united(QRectF(rect.x(), rect.y() - self.LABEL_OFFSET * self.scene_unit,
+                                  rect.width() + 200 * self.scene_unit, self.LABEL_OFFSET * self.scene_unit))
@@ -0,0 +1,238 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from annotation_coordinates import IMAGE_SPACE, is_image_space
+
+
+# 模板匹配生成的框的来源标记
+TEMPLATE_SOURCE = 'template'
+
+
+class PropagationStats:
+    """一次框传播的统计结果"""
+
+    def __init__(self):
+        self.images = 0      # 完成匹配的图片数
+        self.matched = 0     # 找到匹配的图片数
+        self.proposals = 0   # 找到的候选框数（与已有框重叠的在合并时跳过）
+        self.failed = 0      # 无法读取的图片数
+        self.seconds = 0.0
+
+    @property
+    def images_per_second(self):
+        return self.images / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f"匹配 {self.images} 张图片，其中 {self.matched} 张找到目标，找到 {self.proposals} 个候选框，"
+                f"失败 {self.failed} 张，耗时 {self.seconds:.1f} 秒（{self.images_per_second:.1f} 张/秒）")
+
+
+def box_iou(a, b):
+    """两个 (x, y, 宽, 高) 矩形的交并比"""
+    inter_w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    inter_h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / (a[2] * a[3] + b[2] * b[3] - inter)
+
+
+def merge_proposals(annotations, proposals, iou_threshold=0.5):
+    """把待确认框追加到已有标注之后，跳过与同类别已有框重叠的结果
+
+    返回 (合并后的列表, 实际追加的框列表)。
+    """
+    existing = [
+        (a['category'], (a['x'], a['y'], a['width'], a['height']))
+        for a in annotations if is_image_space(a)
+    ]
+    added = []
+    for proposal in proposals:
+        rect = (proposal['x'], proposal['y'], proposal['width'], proposal['height'])
+        if any(category == proposal['category'] and box_iou(rect, other) >= iou_threshold
+               for category, other in existing):
+            continue
+        existing.append((proposal['category'], rect))
+        added.append(proposal)
+    return list(annotations) + added, added
+
+
+def apply_proposals(storage, image_path, proposals):
+    """把待确认框合并到图片当前的标注中并保存，返回实际追加的框列表
+
+    以合并时存储中的标注为准，应在保存标注的线程（界面线程）中调用，
+    用户在匹配期间保存的修改不会被覆盖。
+    """
+    annotations, added = merge_proposals(storage.read_annotation(image_path), proposals)
+    if added:
+        storage.save_annotation_data(image_path, annotations)
+    return added
+
+
+def propagate_box(source_path, rect, category, storage, image_paths, workers=4,
+                  threshold=0.8, max_matches=20, chunk_size=32, progress=None, is_cancelled=None,
+                  apply=None):
+    """以 source_path 中 rect（原图像素坐标）处的图像为模板，在 image_paths 中查找相同目标
+
+    匹配在进程池中并行进行（每个进程只接收一次模板），结果作为待确认框
+    （pending）追加到各图片已有的标注中。apply([(图片路径, 待确认框)]) 接收
+    每批结果，不指定时直接合并写入 storage。返回 PropagationStats。
+    """
+    from template_matcher import TemplateMatcher, init_worker, match_paths, read_template
+
+    stats = PropagationStats()
+    started = time.perf_counter()
+    # 在启动进程池之前创建匹配器，模板过于平坦等错误直接报告给用户
+    matcher = TemplateMatcher(read_template(source_path, rect), threshold, max_matches=max_matches)
+    total = len(image_paths)
+    max_in_flight = max(1, workers) * 2
+    chunks = (image_paths[i:i + chunk_size] for i in range(0, total, chunk_size))
+
+    pending = set()
+    # 协调线程与界面线程并存，fork 可能把其它线程持有的锁复制进子进程而死锁，
+    # 因此用 spawn 启动工作进程（template_matcher 导入时没有副作用）
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=init_worker,
+                             initargs=(matcher,),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                chunk = None if is_cancelled is not None and is_cancelled() else next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(match_paths, chunk))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            results = []
+            for future in done:
+                for image_path, matches in future.result():
+                    if matches is None:
+                        stats.failed += 1
+                        continue
+                    stats.images += 1
+                    if not matches:
+                        continue
+                    stats.matched += 1
+                    stats.proposals += len(matches)
+                    results.append((image_path, [{
+                        'category': category,
+                        'x': x, 'y': y, 'width': width, 'height': height,
+                        'score': score,
+                        'source': TEMPLATE_SOURCE,
+                        'pending': True,
+                        'coordinates': IMAGE_SPACE
+                    } for x, y, width, height, score in matches]))
+            if results:
+                if apply is not None:
+                    apply(results)
+                else:
+                    for image_path, proposals in results:
+                        apply_proposals(storage, image_path, proposals)
+            if progress is not None:
+                progress(stats.images + stats.failed, total)
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+class PropagationSignals(QObject):
+    """框传播任务的信号"""
+    # 参数：批次号、已完成数、总数
+    progress = pyqtSignal(int, int, int)
+    # 参数：批次号、一批匹配结果 [(图片路径, 待确认框)]
+    results = pyqtSignal(int, object)
+    # 参数：批次号、统计结果（出错时为错误信息）
+    finished = pyqtSignal(int, object)
+
+
+class PropagationTask(QRunnable):
+    """在后台线程中协调进程池完成框传播"""
+
+    def __init__(self, propagator, generation, source_path, rect, category, storage, image_paths):
+        super().__init__()
+        self.propagator = propagator
+        self.generation = generation
+        self.source_path = source_path
+        self.rect = rect
+        self.category = category
+        self.storage = storage
+        self.image_paths = image_paths
+
+    def run(self):
+        propagator = self.propagator
+        try:
+            result = propagate_box(
+                self.source_path, self.rect, self.category, self.storage, self.image_paths,
+                propagator.workers, propagator.threshold,
+                progress=lambda done, total: propagator.signals.progress.emit(self.generation, done, total),
+                is_cancelled=lambda: propagator.generation != self.generation,
+                apply=lambda results: propagator.signals.results.emit(self.generation, results)
+            )
+        except Exception as e:
+            result = f"{type(e).__name__}: {e}"
+        propagator.signals.finished.emit(self.generation, result)
+
+
+class BoxPropagator(QObject):
+    """把一个框通过模板匹配传播到整个数据集，不阻塞界面
+
+    匹配在后台进行，结果在界面线程中与各图片当时的标注合并后保存。
+    再次调用 start() 或 cancel() 会作废正在进行的传播。
+    """
+
+    # 参数：已完成数、总数
+    progress = pyqtSignal(int, int)
+    # 参数：[(图片路径, 实际追加的待确认框)]
+    images_updated = pyqtSignal(list)
+    # 参数：统计结果（PropagationStats，出错时为错误信息字符串）
+    finished = pyqtSignal(object)
+
+    DEFAULT_THRESHOLD = 0.8
+
+    def __init__(self, workers=4, threshold=DEFAULT_THRESHOLD, parent=None):
+        super().__init__(parent)
+        self.workers = workers
+        self.threshold = threshold
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.storage = None
+        self.signals = PropagationSignals()
+        self.signals.progress.connect(self._on_progress)
+        self.signals.results.connect(self._on_results)
+        self.signals.finished.connect(self._on_finished)
+
+    def start(self, source_path, rect, category, storage, image_paths):
+        """开始传播；rect 为原图像素坐标 (x, y, 宽, 高)"""
+        self.cancel()
+        self.storage = storage
+        self.thread_pool.start(PropagationTask(
+            self, self.generation, source_path, rect, category, storage, list(image_paths)
+        ))
+
+    def cancel(self):
+        """作废正在进行的传播"""
+        self.generation += 1
+
+    def _on_progress(self, generation, done, total):
+        if generation == self.generation:
+            self.progress.emit(done, total)
+
+    def _on_results(self, generation, results):
+        if generation != self.generation:
+            return
+        updates = []
+        for image_path, proposals in results:
+            added = apply_proposals(self.storage, image_path, proposals)
+            if added:
+                updates.append((image_path, added))
+        if updates:
+            self.images_updated.emit(updates)
+
+    def _on_finished(self, generation, result):
+        if generation == self.generation:
+            self.finished.emit(result)
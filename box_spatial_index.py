@@ -0,0 +1,94 @@
+import math
+
+
+class BoxSpatialIndex:
+    """标注框的均匀网格索引（场景坐标）
+
+    每个框按外接矩形登记到所覆盖的网格单元中，查询某区域内的框时只需
+    检查相关单元中的少量框，与框的总数无关。框移动或调整大小后调用
+    update()，只改动范围发生变化的单元。
+    """
+
+    DEFAULT_CELL_SIZE = 128
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}     # (列, 行) -> 键集合
+        self.spans = {}     # 键 -> 覆盖的单元范围
+
+    def clear(self, cell_size=None):
+        """清空索引，可同时按图片大小调整网格单元尺寸"""
+        self.cells = {}
+        self.spans = {}
+        if cell_size:
+            self.cell_size = cell_size
+
+    def insert(self, key, rect):
+        """登记一个框，rect 为其外接矩形"""
+        if key in self.spans:
+            self.update(key, rect)
+            return
+        span = self._span(rect)
+        self.spans[key] = span
+        for cell in self._cells(span):
+            self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        """移除一个框"""
+        span = self.spans.pop(key, None)
+        if span is None:
+            return
+        for cell in self._cells(span):
+            members = self.cells.get(cell)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self.cells[cell]
+
+    def update(self, key, rect):
+        """框移动或调整大小后更新其所在的单元"""
+        old_span = self.spans.get(key)
+        if old_span is None:
+            return
+        new_span = self._span(rect)
+        if new_span == old_span:
+            return
+        old_cells = set(self._cells(old_span))
+        new_cells = set(self._cells(new_span))
+        for cell in old_cells - new_cells:
+            members = self.cells[cell]
+            members.discard(key)
+            if not members:
+                del self.cells[cell]
+        for cell in new_cells - old_cells:
+            self.cells.setdefault(cell, set()).add(key)
+        self.spans[key] = new_span
+
+    def query(self, rect):
+        """返回外接矩形可能与该区域相交的框"""
+        first_x, first_y, last_x, last_y = self._span(rect)
+        cell_count = (last_x - first_x + 1) * (last_y - first_y + 1)
+        result = set()
+        if cell_count > len(self.cells):
+            # 区域覆盖的单元比已占用的单元还多时，直接遍历已占用的单元
+            for (cx, cy), members in self.cells.items():
+                if first_x <= cx <= last_x and first_y <= cy <= last_y:
+                    result.update(members)
+            return result
+        for cell in self._cells((first_x, first_y, last_x, last_y)):
+            members = self.cells.get(cell)
+            if members:
+                result.update(members)
+        return result
+
+    def _span(self, rect):
+        """矩形覆盖的网格单元范围 (首列, 首行, 末列, 末行)"""
+        size = self.cell_size
+        return (math.floor(rect.left() / size), math.floor(rect.top() / size),
+                math.floor(rect.right() / size), math.floor(rect.bottom() / size))
+
+    def _cells(self, span):
+        first_x, first_y, last_x, last_y = span
+        for cy in range(first_y, last_y + 1):
+            for cx in range(first_x, last_x + 1):
+                yield cx, cy
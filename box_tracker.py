@@ -0,0 +1,83 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+# 跟踪得到的框的来源标记
+TRACKER_SOURCE = 'tracker'
+
+
+class TrackSignals(QObject):
+    """跟踪任务的信号"""
+    # 参数：批次号、目标图片的行号、跟踪到的框（出错时为错误信息）
+    finished = pyqtSignal(int, int, object)
+
+
+class TrackTask(QRunnable):
+    """在后台线程中把框从一帧跟踪到另一帧"""
+
+    def __init__(self, box_tracker, generation, index, source_path, target_path, boxes):
+        super().__init__()
+        self.box_tracker = box_tracker
+        self.generation = generation
+        self.index = index
+        self.source_path = source_path
+        self.target_path = target_path
+        self.boxes = boxes
+
+    def run(self):
+        box_tracker = self.box_tracker
+        if box_tracker.generation != self.generation:
+            return
+        try:
+            result = box_tracker.frame_tracker().track(self.source_path, self.target_path, self.boxes)
+        except Exception as e:
+            # 未捕获的异常会使 PyQt5 终止整个程序，包括 cv2.error 和无法解码的帧
+            if box_tracker.tracker is not None:
+                box_tracker.tracker.reset()
+            result = f"{type(e).__name__}: {e}"
+        box_tracker.signals.finished.emit(self.generation, self.index, result)
+
+
+class BoxTracker(QObject):
+    """跟踪辅助标注：浏览相邻帧时把上一帧的框带到新的一帧
+
+    跟踪在单线程的线程池中进行，跟踪器的状态（上一帧的解码结果和各框
+    的特征点）只在该线程中读写。新的请求会作废尚未开始的旧请求，结果
+    带有目标图片的行号，主窗口只应用仍是当前图片的结果。
+    """
+
+    # 参数：目标图片的行号、跟踪到的框（原图像素坐标；出错时为错误信息）
+    boxes_tracked = pyqtSignal(int, object)
+
+    def __init__(self, reduction=2, parent=None):
+        super().__init__(parent)
+        self.reduction = reduction
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.generation = 0
+        self.tracker = None
+        self.signals = TrackSignals()
+        self.signals.finished.connect(self._on_finished)
+
+    def frame_tracker(self):
+        """跟踪器实例（在工作线程中首次使用时创建，需要 OpenCV）"""
+        if self.tracker is None:
+            from frame_tracker import FrameTracker
+            self.tracker = FrameTracker(self.reduction)
+        return self.tracker
+
+    def track(self, index, source_path, target_path, boxes):
+        """把 source_path 中的框跟踪到第 index 张图片 target_path"""
+        self.generation += 1
+        self.thread_pool.clear()
+        self.thread_pool.start(TrackTask(
+            self, self.generation, index, source_path, target_path, [dict(box) for box in boxes]
+        ))
+
+    def cancel(self):
+        """作废尚未完成的跟踪"""
+        self.generation += 1
+        self.thread_pool.clear()
+
+    def _on_finished(self, generation, index, result):
+        if generation == self.generation:
+            self.boxes_tracked.emit(index, result)
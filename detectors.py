@@ -0,0 +1,87 @@
+import os
+import zlib
+
+from PyQt5.QtGui import QImageReader
+
+from video_frames import parse_frame_path, video_frame_size
+
+
+def create_detector(backend='stub', **kwargs):
+    """按名称创建目标检测器：'onnx'（ONNX Runtime）、'opencv'（OpenCV DNN）或 'stub'"""
+    if backend == 'onnx':
+        from yolo_detectors import OnnxDetector
+        return OnnxDetector(**kwargs)
+    if backend == 'opencv':
+        from yolo_detectors import OpenCVDetector
+        return OpenCVDetector(**kwargs)
+    if backend == 'stub':
+        return StubDetector(**kwargs)
+    raise ValueError(f"未知的检测器后端: {backend}")
+
+
+def load_class_names(path):
+    """读取类别名称文件（每行一个类别）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class Detector:
+    """目标检测器插件的接口
+
+    prepare() 在工作线程中读取并预处理单张图片，detect() 对一批预处理
+    结果推理，返回每张图片的检测框列表；两者都可能被多个线程同时调用。
+    检测框为字典：category, x, y, width, height（原图像素坐标）和 score。
+    """
+
+    # 每次 detect 处理的图片数
+    batch_size = 1
+
+    def prepare(self, image_path):
+        """读取并预处理图片，无法读取时返回 None"""
+        raise NotImplementedError
+
+    def detect(self, inputs):
+        """对一批 prepare() 的结果推理，返回与 inputs 等长的检测框列表"""
+        raise NotImplementedError
+
+
+class StubDetector(Detector):
+    """确定性的桩检测器，用于测试和测量流水线吞吐量
+
+    只读取图片文件头得到尺寸，按文件名的校验值在固定位置生成一个框，
+    同一张图片每次得到的结果完全相同。
+    """
+
+    def __init__(self, category='object', batch_size=8):
+        self.category = category
+        self.batch_size = batch_size
+
+    def prepare(self, image_path):
+        parsed = parse_frame_path(image_path)
+        if parsed is not None:
+            # 视频帧的尺寸取自视频流信息
+            try:
+                width, height = video_frame_size(parsed[0])
+            except (ImportError, OSError):
+                return None
+            return image_path, width, height
+        size = QImageReader(image_path).size()
+        if not size.isValid():
+            return None
+        return image_path, size.width(), size.height()
+
+    def detect(self, inputs):
+        results = []
+        for image_path, width, height in inputs:
+            seed = zlib.crc32(os.path.basename(image_path).encode('utf-8'))
+            box_width = width / 4
+            box_height = height / 4
+            results.append([{
+                'category': self.category,
+                'x': (seed % 1000) / 1000 * (width - box_width),
+                'y': (seed // 1000 % 1000) / 1000 * (height - box_height),
+                'width': box_width,
+                'height': box_height,
+                'score': 1.0
+            }])
+        return results
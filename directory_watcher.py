@@ -0,0 +1,243 @@
+import os
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, pyqtSignal
+
+from image_indexer import scan_directory
+
+
+class WatchSignals(QObject):
+    """重新列举任务的信号"""
+    # 参数：批次号、新增图片、删除的图片、新增目录、删除的目录（均为绝对路径）
+    changes_found = pyqtSignal(int, object, object, object, object)
+
+
+class RescanTask(QRunnable):
+    """在工作线程中重新列举发生变化的目录，与上次的列表比较"""
+
+    def __init__(self, watcher, generation, rels=None):
+        super().__init__()
+        self.watcher = watcher
+        self.generation = generation
+        self.rels = rels  # 收到变化通知的目录；None 表示轮询：检查所有目录
+
+    def run(self):
+        watcher = self.watcher
+        if watcher.generation != self.generation:
+            return
+        rels = watcher.find_changed(self.rels)
+        added, removed, new_dirs, gone_dirs = [], [], [], []
+        for rel in sorted(rels):
+            watcher.rescan(rel, added, removed, new_dirs, gone_dirs)
+        if added or removed or new_dirs or gone_dirs:
+            watcher.signals.changes_found.emit(self.generation, added, removed, new_dirs, gone_dirs)
+
+
+class DirectoryWatcher(QObject):
+    """监视已打开的目录树，增量报告新增和删除的图片
+
+    默认使用 QFileSystemWatcher（Linux 上即 inotify）监视每个目录；目录
+    过多或系统无法监视时（例如网络文件系统）退回为定时检查各目录的
+    修改时间。目录变化的通知会短暂合并后再在工作线程中重新列举，只有
+    发生变化的目录才会被 scandir。
+
+    目录列表的状态只在单线程的线程池中读写。
+    """
+
+    # 参数：新增的图片路径
+    images_added = pyqtSignal(list)
+    # 参数：删除的图片路径
+    images_removed = pyqtSignal(list)
+
+    DEBOUNCE_INTERVAL = 500   # 合并目录变化通知的时间（毫秒）
+    POLL_INTERVAL = 2000      # 轮询模式下检查修改时间的间隔（毫秒）
+    # 修改时间距列举时不足该值的目录不记录修改时间，下次一定重新列举
+    # （文件系统的时间精度可能较粗，同一时刻稍后新增的文件不会改变修改时间）
+    MTIME_SETTLE_NS = 2 * 1000 * 1000 * 1000
+    MAX_WATCHED_DIRECTORIES = 8192
+
+    def __init__(self, mode='auto', parent=None):
+        super().__init__(parent)
+        # auto：优先系统通知，失败时轮询；watch：只用系统通知；poll：只轮询；off：不监视
+        self.mode = mode
+        self.root = None
+        self.entries = {}  # 相对目录 -> (修改时间, 图片文件名列表, 子目录名列表)
+        self.generation = 0
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.signals = WatchSignals()
+        self.signals.changes_found.connect(self._on_changes_found)
+
+        self.fs_watcher = None
+        self.changed_dirs = set()
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(self.DEBOUNCE_INTERVAL)
+        self.debounce_timer.timeout.connect(self._rescan_changed)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(self.POLL_INTERVAL)
+        self.poll_timer.timeout.connect(self._poll)
+
+    def start(self, root, entries):
+        """开始监视目录树；entries 为索引时得到的各目录列表"""
+        self.stop()
+        if self.mode == 'off':
+            return
+        self.root = root
+        self.entries = {rel: tuple(entry) for rel, entry in entries.items()}
+
+        directories = [self._abs_path(rel) for rel in self.entries]
+        if self.mode != 'poll' and len(directories) <= self.MAX_WATCHED_DIRECTORIES:
+            self.fs_watcher = QFileSystemWatcher(self)
+            failed = self.fs_watcher.addPaths(directories)
+            if failed and self.mode == 'auto':
+                # 部分目录无法监视，改为轮询
+                self.fs_watcher.deleteLater()
+                self.fs_watcher = None
+            else:
+                self.fs_watcher.directoryChanged.connect(self._on_directory_changed)
+        if self.fs_watcher is None and self.mode != 'watch':
+            self.poll_timer.start()
+
+    def stop(self):
+        """停止监视并作废未完成的任务"""
+        self.generation += 1
+        self.thread_pool.clear()
+        self.debounce_timer.stop()
+        self.poll_timer.stop()
+        self.changed_dirs.clear()
+        if self.fs_watcher is not None:
+            self.fs_watcher.deleteLater()
+            self.fs_watcher = None
+        self.thread_pool.waitForDone()
+        self.root = None
+        self.entries = {}
+
+    # ---- 工作线程中执行 ----
+
+    def find_changed(self, rels=None):
+        """返回修改时间与记录不一致的目录；rels 为 None 时检查所有目录（轮询模式）
+
+        只有增删或改名目录项才会改变目录的修改时间。本程序在数据集根目录中
+        追加写入的标注日志、SQLite WAL 等文件同样会触发变化通知，这类通知
+        因修改时间未变而被忽略，不再重新列举整个目录。
+        """
+        if rels is None:
+            rels = list(self.entries)
+        changed = []
+        for rel in rels:
+            entry = self.entries.get(rel)
+            if entry is None:
+                continue
+            mtime = entry[0]
+            try:
+                current = os.stat(self._abs_path(rel)).st_mtime_ns
+            except OSError:
+                current = None
+            if current is None or current != mtime:
+                changed.append(rel)
+        return changed
+
+    def rescan(self, rel, added, removed, new_dirs, gone_dirs):
+        """重新列举一个目录，把差异追加到各结果列表中"""
+        entry = self.entries.get(rel)
+        if entry is None:
+            return
+        folder = self._abs_path(rel)
+        try:
+            mtime = self._settled_mtime(folder)
+            files, dirs = scan_directory(folder)
+        except OSError:
+            # 目录已被删除
+            self._remove_tree(rel, removed, gone_dirs)
+            return
+        _, old_files, old_dirs = entry
+        self.entries[rel] = (mtime, files, dirs)
+
+        old_file_set = set(old_files)
+        file_set = set(files)
+        added.extend(os.path.join(folder, name) for name in files if name not in old_file_set)
+        removed.extend(os.path.join(folder, name) for name in old_files if name not in file_set)
+        old_dir_set = set(old_dirs)
+        dir_set = set(dirs)
+        for name in dirs:
+            if name not in old_dir_set:
+                self._add_tree(self._child_rel(rel, name), added, new_dirs)
+        for name in old_dirs:
+            if name not in dir_set:
+                self._remove_tree(self._child_rel(rel, name), removed, gone_dirs)
+
+    def _add_tree(self, rel, added, new_dirs):
+        """登记新出现的目录及其子目录中的图片"""
+        folder = self._abs_path(rel)
+        try:
+            mtime = self._settled_mtime(folder)
+            files, dirs = scan_directory(folder)
+        except OSError:
+            return
+        self.entries[rel] = (mtime, files, dirs)
+        new_dirs.append(folder)
+        added.extend(os.path.join(folder, name) for name in files)
+        for name in dirs:
+            self._add_tree(self._child_rel(rel, name), added, new_dirs)
+
+    def _settled_mtime(self, folder):
+        """列举目录前读取其修改时间；刚刚修改过的目录返回 None，下次检查时一定重新列举"""
+        mtime = os.stat(folder).st_mtime_ns
+        if time.time_ns() - mtime < self.MTIME_SETTLE_NS:
+            return None
+        return mtime
+
+    def _remove_tree(self, rel, removed, gone_dirs):
+        """移除已消失的目录及其子目录中的图片"""
+        entry = self.entries.pop(rel, None)
+        if entry is None:
+            return
+        folder = self._abs_path(rel)
+        gone_dirs.append(folder)
+        _, files, dirs = entry
+        removed.extend(os.path.join(folder, name) for name in files)
+        for name in dirs:
+            self._remove_tree(self._child_rel(rel, name), removed, gone_dirs)
+
+    # ---- GUI线程中执行 ----
+
+    def _on_directory_changed(self, path):
+        """系统通知目录变化：记录下来，稍后合并处理"""
+        self.changed_dirs.add(path)
+        self.debounce_timer.start()
+
+    def _rescan_changed(self):
+        rels = [self._rel_path(path) for path in self.changed_dirs]
+        self.changed_dirs.clear()
+        self.thread_pool.start(RescanTask(self, self.generation, rels))
+
+    def _poll(self):
+        # 上一次轮询还没完成时跳过
+        if self.thread_pool.activeThreadCount() == 0:
+            self.thread_pool.start(RescanTask(self, self.generation))
+
+    def _on_changes_found(self, generation, added, removed, new_dirs, gone_dirs):
+        if generation != self.generation:
+            return
+        if self.fs_watcher is not None:
+            if gone_dirs:
+                self.fs_watcher.removePaths(gone_dirs)
+            if new_dirs:
+                self.fs_watcher.addPaths(new_dirs)
+        if removed:
+            self.images_removed.emit(removed)
+        if added:
+            self.images_added.emit(added)
+
+    def _abs_path(self, rel):
+        return os.path.join(self.root, rel) if rel else self.root
+
+    def _rel_path(self, path):
+        rel = os.path.relpath(path, self.root)
+        return '' if rel == os.curdir else rel
+
+    @staticmethod
+    def _child_rel(rel, name):
+        return os.path.join(rel, name) if rel else name
@@ -0,0 +1,123 @@
+"""用金字塔 Lucas-Kanade 光流把标注框从一帧带到下一帧
+
+只依赖 numpy 和 OpenCV。帧以缩小的灰度图解码（1080p 默认缩小一半；
+与模板匹配共用 read_gray，忽略 EXIF 方向，与界面显示的像素网格一致），
+每个框在框内选取角点，经前向-后向光流校验后取位移中值和尺度变化中值
+得到新框。跟踪器保留每个框上一次跟踪后的特征点以及最近解码的一帧，
+连续向后浏览时不必重新解码上一帧或重新选取角点。
+"""
+import cv2
+import numpy as np
+
+from template_matcher import read_gray
+
+
+def box_key(box):
+    """框的标识：类别和取整后的几何信息"""
+    return (box.get('category'), round(box['x']), round(box['y']),
+            round(box['width']), round(box['height']))
+
+
+class FrameTracker:
+    """逐帧跟踪一组标注框（非线程安全，应只在一个线程中使用）"""
+
+    MAX_POINTS = 40          # 每个框最多跟踪的角点数
+    MIN_POINTS = 4           # 有效点少于该数时认为跟丢
+    MAX_FB_ERROR = 1.0       # 前向-后向误差上限（缩小后的像素）
+    LK_PARAMS = dict(
+        winSize=(21, 21), maxLevel=3,
+        criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+    )
+
+    def __init__(self, reduction=2):
+        self.reduction = reduction
+        self.frame_path = None
+        self.frame = None
+        self.tracks = {}  # 框标识 -> 上一帧中该框的特征点（缩小后的坐标）
+
+    def reset(self):
+        """丢弃所有跟踪状态"""
+        self.frame_path = None
+        self.frame = None
+        self.tracks = {}
+
+    def track(self, source_path, target_path, boxes):
+        """把 source_path 中的框（原图像素坐标）跟踪到 target_path，返回跟踪到的框
+
+        跟丢的框不出现在结果中；结果的 score 为通过校验的特征点比例。
+        """
+        source = self._load(source_path)
+        target = read_gray(target_path, self.reduction)
+        if source is None or target is None or source.shape != target.shape:
+            self.reset()
+            return []
+
+        r = self.reduction
+        height, width = target.shape
+        results = []
+        tracks = {}
+        for box in boxes:
+            points = self.tracks.get(box_key(box))
+            if points is None:
+                points = self._select_points(source, box)
+            if points is None or len(points) < self.MIN_POINTS:
+                continue
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(source, target, points, None, **self.LK_PARAMS)
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(target, source, moved, None, **self.LK_PARAMS)
+            error = np.linalg.norm((points - back).reshape(-1, 2), axis=1)
+            good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < self.MAX_FB_ERROR)
+            if good.sum() < self.MIN_POINTS:
+                continue
+            old = points.reshape(-1, 2)[good]
+            new = moved.reshape(-1, 2)[good]
+
+            dx, dy = np.median(new - old, axis=0)
+            # 尺度变化：各点到中心距离之比的中值
+            old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = old_spread > 1e-3
+            scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+
+            box_width = box['width'] * scale
+            box_height = box['height'] * scale
+            center_x = box['x'] + box['width'] / 2 + dx * r
+            center_y = box['y'] + box['height'] / 2 + dy * r
+            x = max(0.0, center_x - box_width / 2)
+            y = max(0.0, center_y - box_height / 2)
+            box_width = min(box_width, width * r - x)
+            box_height = min(box_height, height * r - y)
+            if box_width <= 1 or box_height <= 1:
+                continue
+            tracked = dict(box, x=float(x), y=float(y), width=float(box_width),
+                           height=float(box_height), score=float(good.mean()))
+            results.append(tracked)
+            # 保留本帧中有效的特征点，下一帧直接从这些点继续跟踪
+            tracks[box_key(tracked)] = new.reshape(-1, 1, 2).astype(np.float32)
+
+        self.frame_path = target_path
+        self.frame = target
+        self.tracks = tracks
+        return results
+
+    def _load(self, image_path):
+        """读取缩小的灰度帧；与上次跟踪的目标帧相同时直接复用"""
+        if image_path == self.frame_path:
+            return self.frame
+        self.tracks = {}
+        return read_gray(image_path, self.reduction)
+
+    def _select_points(self, frame, box):
+        """在框内选取便于跟踪的角点"""
+        r = self.reduction
+        x0 = max(0, int(box['x'] / r))
+        y0 = max(0, int(box['y'] / r))
+        x1 = min(frame.shape[1], int((box['x'] + box['width']) / r) + 1)
+        y1 = min(frame.shape[0], int((box['y'] + box['height']) / r) + 1)
+        if x1 - x0 < 4 or y1 - y0 < 4:
+            return None
+        points = cv2.goodFeaturesToTrack(frame[y0:y1, x0:x1], self.MAX_POINTS, 0.01, 3)
+        if points is None:
+            return None
+        points[:, 0, 0] += x0
+        points[:, 0, 1] += y0
+        return points.astype(np.float32)
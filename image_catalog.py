@@ -0,0 +1,104 @@
+import bisect
+import os
+
+
+class ImageCatalog:
+    """当前目录的图片目录：在行号、绝对路径和相对路径之间互相查找
+
+    图片按全路径排序（与目录索引的产出顺序一致），行号即列表、导航和
+    缩略图使用的索引。路径到行号的查找使用字典，为 O(1)；在中间插入或
+    删除图片后字典失效，下次查找时重新建立。相对路径直接截去根目录
+    前缀得到，不再对每次加载、保存调用 os.path.relpath。
+
+    主窗口、图片列表模型、缩略图加载器和标注存储共用同一个实例。
+    """
+
+    def __init__(self):
+        self.root = None
+        self.paths = []
+        self.rows = {}       # 绝对路径 -> 行号；为 None 时需要重建
+        self.prefix_length = 0
+
+    def reset(self, root):
+        """切换到新目录并清空列表"""
+        self.root = root
+        self.paths = []
+        self.rows = {}
+        # 根目录本身以分隔符结尾时（例如文件系统根目录）不再多截一个字符
+        self.prefix_length = len(root) if root.endswith(os.sep) else len(root) + len(os.sep)
+
+    def extend(self, image_paths):
+        """在末尾追加一批图片（必须排在已有图片之后）"""
+        first = len(self.paths)
+        self.paths.extend(image_paths)
+        if self.rows is not None:
+            self.rows.update((path, first + i) for i, path in enumerate(image_paths))
+
+    def insertion_row(self, image_path):
+        """图片按顺序应插入的行号；已在目录中时返回 -1"""
+        row = bisect.bisect_left(self.paths, image_path)
+        if row < len(self.paths) and self.paths[row] == image_path:
+            return -1
+        return row
+
+    def insert(self, row, image_path):
+        """在指定行插入一张图片（行号由 insertion_row 得到）"""
+        self.paths.insert(row, image_path)
+        if self.rows is not None:
+            if row == len(self.paths) - 1:
+                self.rows[image_path] = row
+            else:
+                self.rows = None
+
+    def remove(self, row):
+        """删除指定行的图片"""
+        image_path = self.paths.pop(row)
+        if self.rows is not None:
+            if row == len(self.paths):
+                self.rows.pop(image_path, None)
+            else:
+                self.rows = None
+
+    def index_of(self, image_path):
+        """图片的行号，不在目录中时返回 -1"""
+        if self.rows is None:
+            self.rows = {path: row for row, path in enumerate(self.paths)}
+        return self.rows.get(image_path, -1)
+
+    def locate(self, image_path):
+        """按排序二分查找图片的行号，不需要重建字典（批量删除时使用）"""
+        row = bisect.bisect_left(self.paths, image_path)
+        if row < len(self.paths) and self.paths[row] == image_path:
+            return row
+        return -1
+
+    def path(self, row):
+        """指定行的绝对路径"""
+        return self.paths[row]
+
+    def relative_path(self, image_path):
+        """图片相对于根目录的路径（目录之外的路径原样返回）"""
+        if self.root is not None and image_path.startswith(self.root) \
+                and image_path[self.prefix_length - 1:self.prefix_length] == os.sep:
+            return image_path[self.prefix_length:]
+        return image_path
+
+    def relative_path_at(self, row):
+        """指定行的相对路径"""
+        return self.relative_path(self.paths[row])
+
+    def absolute_path(self, rel_path):
+        """由相对路径得到绝对路径"""
+        return os.path.join(self.root, rel_path)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, row):
+        return self.paths[row]
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __contains__(self, image_path):
+        return self.index_of(image_path) >= 0
@@ -0,0 +1,274 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from video_frames import frame_paths, open_video
+
+
+# 支持的图片格式
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+INDEX_FILE_NAME = '.image_index.json'
+INDEX_VERSION = 1
+
+
+def scan_directory(path):
+    """用 os.scandir 列出目录中的图片文件和子目录（跳过隐藏目录）
+
+    目录项的类型通常直接来自 readdir 的结果，不需要对每个文件单独 stat。
+    """
+    files = []
+    dirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    # 跳过隐藏目录（其中包括 .tiles 分块缓存）
+                    if not entry.name.startswith('.'):
+                        dirs.append(entry.name)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+    return files, dirs
+
+
+def get_index_file_path(directory):
+    """目录索引文件的路径"""
+    return os.path.join(directory, INDEX_FILE_NAME)
+
+
+def load_directory_index(directory):
+    """读取上次保存的目录索引：{相对目录: [修改时间, 图片文件名列表, 子目录名列表]}"""
+    try:
+        with open(get_index_file_path(directory), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if saved.get('version') != INDEX_VERSION:
+        return {}
+    return saved.get('dirs', {})
+
+
+def save_directory_index(directory, entries):
+    """原子地保存目录索引"""
+    index_path = get_index_file_path(directory)
+    temp_path = index_path + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'dirs': entries}, f, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+    except OSError as e:
+        print(f"保存目录索引失败: {e}")
+
+
+class DirectoryWalk:
+    """按全路径排序的顺序遍历目录树中的图片
+
+    每个目录只 stat 一次：修改时间与索引中记录的一致时直接复用上次的
+    列表，否则重新 scandir。进入目录时即把其子目录的列举任务提交给
+    线程池，多个子目录的读取（在网络文件系统上主要是等待延迟）并行
+    进行，而结果仍按顺序产出。
+    """
+
+    # 修改时间距扫描开始不足该值的目录不写入索引（文件系统时间精度可能只有秒级）
+    RACY_INTERVAL_NS = 2 * 1000 * 1000 * 1000
+
+    def __init__(self, root, previous=None, workers=1):
+        self.root = root
+        self.previous = previous or {}
+        self.workers = max(1, workers)
+        self.entries = {}
+        self.rescanned = 0
+        self.started_ns = time.time_ns()
+        self.cancelled = False
+
+    def __iter__(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            self.executor = executor
+            yield from self._walk('', executor.submit(self._listing, ''))
+
+    def index_entries(self):
+        """遍历完成后用于保存的目录索引（刚修改过的目录不记录修改时间）"""
+        limit = self.started_ns - self.RACY_INTERVAL_NS
+        return {
+            rel: [mtime if mtime is not None and mtime < limit else None, files, dirs]
+            for rel, (mtime, files, dirs) in self.entries.items()
+        }
+
+    def _listing(self, rel):
+        """获取一个目录的图片和子目录列表（在线程池中执行）"""
+        path = os.path.join(self.root, rel) if rel else self.root
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            cached = self.previous.get(rel)
+            if cached is not None and cached[0] == mtime:
+                return mtime, cached[1], cached[2]
+            files, dirs = scan_directory(path)
+        except OSError:
+            return None, [], []
+        self.rescanned += 1
+        return mtime, files, dirs
+
+    def _walk(self, rel, listing):
+        if self.cancelled:
+            return
+        mtime, files, dirs = listing.result()
+        self.entries[rel] = (mtime, files, dirs)
+        folder = os.path.join(self.root, rel) if rel else self.root
+
+        # 预先提交所有子目录的列举任务
+        children = {
+            name: self.executor.submit(self._listing, os.path.join(rel, name) if rel else name)
+            for name in dirs
+        }
+        # 子目录名后加分隔符参与排序，使产出顺序与对全路径排序一致
+        order = sorted([(name, False) for name in files] + [(name + os.sep, True) for name in dirs])
+        try:
+            for key, is_dir in order:
+                if self.cancelled:
+                    return
+                if is_dir:
+                    name = key[:-len(os.sep)]
+                    yield from self._walk(os.path.join(rel, name) if rel else name, children.pop(name))
+                else:
+                    yield os.path.join(folder, key)
+        finally:
+            for future in children.values():
+                future.cancel()
+
+
+class IndexSignals(QObject):
+    """索引任务的信号"""
+    # 参数：批次号、一批图片路径
+    batch_found = pyqtSignal(int, object)
+    # 参数：批次号、图片总数、各目录的列表 {相对目录: (修改时间, 图片文件名列表, 子目录名列表)}
+    finished = pyqtSignal(int, int, object)
+
+
+class IndexTask(QRunnable):
+    """在工作线程中遍历目录并分批发送找到的图片"""
+
+    def __init__(self, indexer, generation, directory):
+        super().__init__()
+        self.indexer = indexer
+        self.generation = generation
+        self.directory = directory
+
+    def run(self):
+        indexer = self.indexer
+        walk = DirectoryWalk(self.directory, load_directory_index(self.directory), indexer.workers)
+        batch = []
+        total = 0
+        last_flush = time.monotonic()
+        for image_path in walk:
+            if indexer.generation != self.generation:
+                walk.cancelled = True
+                continue
+            batch.append(image_path)
+            now = time.monotonic()
+            # 批次攒够或距上次发送已有一段时间时发送，保证第一张图片尽快出现
+            if len(batch) >= indexer.batch_size or now - last_flush >= indexer.flush_interval:
+                total += len(batch)
+                indexer.signals.batch_found.emit(self.generation, batch)
+                batch = []
+                last_flush = now
+        if indexer.generation != self.generation:
+            return
+        if batch:
+            total += len(batch)
+            indexer.signals.batch_found.emit(self.generation, batch)
+        if walk.rescanned:
+            save_directory_index(self.directory, walk.index_entries())
+        indexer.signals.finished.emit(self.generation, total, walk.entries)
+
+
+class ImageIndexer(QObject):
+    """后台流式索引目录中的图片
+
+    按与全路径排序一致的顺序分批通过 images_found 发送结果，界面可以在
+    扫描完成前就显示第一批图片。目录列表连同各目录的修改时间保存在
+    目录下的 .image_index.json 中，再次打开时只重新列举发生变化的目录。
+    """
+
+    # 参数：一批图片路径（按顺序追加）
+    images_found = pyqtSignal(list)
+    # 参数：图片总数
+    finished = pyqtSignal(int)
+
+    DEFAULT_BATCH_SIZE = 2000
+    DEFAULT_FLUSH_INTERVAL = 0.1  # 秒
+
+    def __init__(self, workers=4, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.generation = 0
+        # 最近一次完成的索引中各目录的列表（供目录监视使用）
+        self.directory_entries = {}
+        self.signals = IndexSignals()
+        self.signals.batch_found.connect(self._on_batch_found)
+        self.signals.finished.connect(self._on_finished)
+
+    def start(self, directory):
+        """开始索引新目录（作废上一次未完成的索引）"""
+        self.cancel()
+        self.thread_pool.start(IndexTask(self, self.generation, directory))
+
+    def cancel(self):
+        """作废未完成的索引"""
+        self.generation += 1
+
+    def _on_batch_found(self, generation, batch):
+        if generation == self.generation:
+            self.images_found.emit(batch)
+
+    def _on_finished(self, generation, total, entries):
+        if generation == self.generation:
+            self.directory_entries = entries
+            self.finished.emit(total)
+
+
+class VideoIndexTask(QRunnable):
+    """在工作线程中建立（或读取缓存的）视频帧索引，分批发送各帧的路径"""
+
+    def __init__(self, indexer, generation, video_path):
+        super().__init__()
+        self.indexer = indexer
+        self.generation = generation
+        self.video_path = video_path
+
+    def run(self):
+        indexer = self.indexer
+        try:
+            frame_count = open_video(self.video_path).index.frame_count
+        except (ImportError, OSError) as e:
+            print(f"无法打开视频: {e}")
+            frame_count = 0
+        paths = frame_paths(self.video_path, frame_count)
+        for start in range(0, len(paths), indexer.batch_size):
+            if indexer.generation != self.generation:
+                return
+            indexer.signals.batch_found.emit(self.generation, paths[start:start + indexer.batch_size])
+        if indexer.generation == self.generation:
+            indexer.signals.finished.emit(self.generation, frame_count, {})
+
+
+class VideoIndexer(ImageIndexer):
+    """后台索引视频文件的各帧，接口与 ImageIndexer 相同
+
+    第一次打开视频时解复用整个文件建立关键帧索引（不解码），之后直接
+    读取 .video_index 中的缓存。
+    """
+
+    def start(self, video_path):
+        """开始索引新视频（作废上一次未完成的索引）"""
+        self.cancel()
+        self.thread_pool.start(VideoIndexTask(self, self.generation, video_path))
@@ -0,0 +1,139 @@
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor, QPixmap
+
+
+class ImageListModel(QAbstractListModel):
+    """文件列表与缩略图列表共用的图片模型
+
+    每行对应一张图片，不为每张图片创建列表项；缩略图只在视图绘制到
+    对应行时才向加载器请求，生成后放入有上限的LRU缓存中。
+    """
+
+    # 自定义数据角色
+    FileNameRole = Qt.UserRole + 1   # 文件名（缩略图列表显示）
+    ThumbnailRole = Qt.UserRole + 2  # 缩略图QPixmap
+
+    DEFAULT_PIXMAP_LIMIT = 2000  # 内存中最多保留的缩略图数量
+
+    def __init__(self, thumbnail_loader, thumbnail_size=100,
+                 pixmap_limit=DEFAULT_PIXMAP_LIMIT, parent=None):
+        super().__init__(parent)
+        self.thumbnail_loader = thumbnail_loader
+        self.thumbnail_loader.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.pixmap_limit = pixmap_limit
+
+        self.catalog = None  # 与主窗口共用的 ImageCatalog
+        self.pixmap_cache = OrderedDict()  # 行号 -> QPixmap，按最近使用排序
+        self.failed_rows = set()           # 无法生成缩略图的行，不再重复请求
+
+        # 占位图，在真实缩略图生成前显示
+        self.placeholder = QPixmap(thumbnail_size, thumbnail_size)
+        self.placeholder.fill(QColor(220, 220, 220))
+
+    def set_catalog(self, catalog, cache=None):
+        """切换到新目录的图片目录，并取消旧目录的缩略图任务"""
+        self.beginResetModel()
+        self.catalog = catalog
+        self.pixmap_cache.clear()
+        self.failed_rows.clear()
+        self.thumbnail_loader.start(catalog, cache)
+        self.endResetModel()
+
+    def append_images(self, image_paths):
+        """在末尾追加一批图片，已有的行和缩略图保持不变"""
+        if not image_paths:
+            return
+        first = len(self.catalog)
+        self.beginInsertRows(QModelIndex(), first, first + len(image_paths) - 1)
+        self.catalog.extend(image_paths)
+        self.endInsertRows()
+
+    def insert_image(self, image_path):
+        """按顺序插入一张图片，已生成的缩略图随行号一起移动；返回插入的行号，已存在时返回 -1"""
+        row = self.catalog.insertion_row(image_path)
+        if row < 0:
+            return -1
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.catalog.insert(row, image_path)
+        self.thumbnail_loader.discard_tasks()
+        self._shift_rows(row, 1)
+        self.endInsertRows()
+        return row
+
+    def remove_image(self, image_path):
+        """删除一张图片；返回删除的行号，不在列表中时返回 -1"""
+        row = self.catalog.locate(image_path)
+        if row < 0:
+            return -1
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.catalog.remove(row)
+        self.thumbnail_loader.discard_tasks()
+        self.pixmap_cache.pop(row, None)
+        self.failed_rows.discard(row)
+        self._shift_rows(row + 1, -1)
+        self.endRemoveRows()
+        return row
+
+    def _shift_rows(self, first_row, delta):
+        """把 first_row 及其后各行的缓存行号平移 delta"""
+        self.pixmap_cache = OrderedDict(
+            (row + delta if row >= first_row else row, pixmap)
+            for row, pixmap in self.pixmap_cache.items()
+        )
+        self.failed_rows = {row + delta if row >= first_row else row for row in self.failed_rows}
+
+    def image_path(self, row):
+        """返回指定行的图片路径"""
+        return self.catalog.path(row)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.catalog is None:
+            return 0
+        return len(self.catalog)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        image_path = self.catalog.path(row)
+
+        if role == Qt.DisplayRole:
+            return self.catalog.relative_path(image_path)
+        if role == Qt.ToolTipRole:
+            return image_path
+        if role == Qt.UserRole:
+            return image_path
+        if role == self.FileNameRole:
+            return os.path.basename(image_path)
+        if role == self.ThumbnailRole:
+            return self.thumbnail(row)
+        return None
+
+    def thumbnail(self, row):
+        """返回缩略图，尚未生成时请求加载并返回占位图"""
+        pixmap = self.pixmap_cache.get(row)
+        if pixmap is not None:
+            self.pixmap_cache.move_to_end(row)
+            return pixmap
+        if row not in self.failed_rows:
+            self.thumbnail_loader.request(row)
+        return self.placeholder
+
+    def on_thumbnail_ready(self, row, image):
+        """后台缩略图生成完成（在GUI线程中执行）"""
+        if self.catalog is None or not 0 <= row < len(self.catalog):
+            return
+        if image.isNull():
+            self.failed_rows.add(row)
+            return
+
+        self.pixmap_cache[row] = QPixmap.fromImage(image)
+        self.pixmap_cache.move_to_end(row)
+        while len(self.pixmap_cache) > self.pixmap_limit:
+            self.pixmap_cache.popitem(last=False)
+
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [self.ThumbnailRole])
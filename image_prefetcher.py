@@ -0,0 +1,167 @@
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+from video_frames import parse_frame_path, read_frame
+
+
+def decode_frame(frame_path):
+    """解码视频帧为QImage，失败时返回空QImage"""
+    pixels = read_frame(frame_path)
+    if pixels is None:
+        return QImage()
+    height, width = pixels.shape[:2]
+    return QImage(pixels.data, width, height, 3 * width, QImage.Format_RGB888).copy()
+
+
+def decode_image(image_path, max_pixels=None):
+    """解码整张图片或视频帧为QImage（可在工作线程中调用），失败时返回空QImage
+
+    指定 max_pixels 时，超过该像素数的图片（交给分块显示）不解码。
+    """
+    if parse_frame_path(image_path) is not None:
+        return decode_frame(image_path)
+    reader = QImageReader(image_path)
+    if max_pixels is not None:
+        size = reader.size()
+        if size.width() * size.height() > max_pixels:
+            return QImage()
+    image = reader.read()
+    return image if not image.isNull() else QImage()
+
+
+class PrefetchSignals(QObject):
+    """预取任务的信号"""
+    # 参数：批次号、图片路径、解码结果
+    finished = pyqtSignal(int, str, QImage)
+
+
+class PrefetchTask(QRunnable):
+    """在工作线程中解码一张图片"""
+
+    def __init__(self, prefetcher, generation, image_path):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.generation = generation
+        self.image_path = image_path
+        self.started = False
+        self.image = QImage()           # 解码结果，done 置位后可读
+        self.done = threading.Event()
+
+    def run(self):
+        self.started = True
+        try:
+            if self.prefetcher.generation != self.generation:
+                return
+            self.image = decode_image(self.image_path, self.prefetcher.max_pixels)
+        finally:
+            self.done.set()
+        self.prefetcher.signals.finished.emit(self.generation, self.image_path, self.image)
+
+
+class ImagePrefetcher(QObject):
+    """按浏览方向预先解码前后若干张图片
+
+    沿当前浏览方向预取 ahead 张、反方向预取 behind 张，解码结果保存在
+    按内存预算淘汰的LRU缓存中，切换图片时通常可以直接命中缓存。
+    """
+
+    DEFAULT_AHEAD = 3
+    DEFAULT_BEHIND = 1
+    DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024  # 默认1GB
+
+    def __init__(self, ahead=DEFAULT_AHEAD, behind=DEFAULT_BEHIND,
+                 memory_budget=DEFAULT_MEMORY_BUDGET, max_pixels=None, parent=None):
+        super().__init__(parent)
+        self.ahead = ahead
+        self.behind = behind
+        self.memory_budget = memory_budget
+        self.max_pixels = max_pixels  # 超过该像素数的图片不预取
+
+        self.thread_pool = QThreadPool(self)
+        # 大图解码很占内存带宽，两个线程足以跟上逐张浏览
+        self.thread_pool.setMaxThreadCount(2)
+        self.generation = 0
+        self.signals = PrefetchSignals()
+        self.signals.finished.connect(self._on_task_finished)
+
+        self.cache = OrderedDict()  # 图片路径 -> QImage，按最近使用排序
+        self.cache_bytes = 0
+        self.tasks = {}             # 已提交的任务：图片路径 -> PrefetchTask
+        self.window = []            # 当前预取窗口内的图片路径（不会被淘汰）
+
+    def load(self, image_path):
+        """获取解码后的图片：命中缓存时直接返回，正在后台解码时等待其完成，否则同步解码"""
+        image = self.cache.get(image_path)
+        if image is not None:
+            self.cache.move_to_end(image_path)
+            return image
+        task = self.tasks.pop(image_path, None)
+        image = QImage()
+        if task is not None and not self.thread_pool.tryTake(task):
+            # 已在工作线程中解码，等待结果而不是再解码一遍
+            task.done.wait()
+            image = task.image
+        if image.isNull():
+            # 未开始的任务已从线程池取回；超过 max_pixels 未预取的大图也在这里解码
+            image = decode_image(image_path)
+        if not image.isNull():
+            self._insert(image_path, image)
+        return image
+
+    def prefetch(self, image_paths, current_index, direction=1):
+        """以当前图片为中心，按浏览方向调度预取"""
+        ahead = [current_index + direction * i for i in range(1, self.ahead + 1)]
+        behind = [current_index - direction * i for i in range(1, self.behind + 1)]
+        # 先处理浏览方向上最近的图片
+        order = [i for pair in zip(ahead, behind) for i in pair]
+        order += ahead[len(behind):] + behind[len(ahead):]
+        paths = [image_paths[i] for i in order if 0 <= i < len(image_paths)]
+        current_path = image_paths[current_index] if 0 <= current_index < len(image_paths) else None
+        self.window = paths + ([current_path] if current_path else [])
+
+        # 放弃窗口外尚未开始的任务
+        self.thread_pool.clear()
+        self.tasks = {path: task for path, task in self.tasks.items() if task.started}
+
+        for path in paths:
+            if path in self.cache or path in self.tasks:
+                continue
+            task = PrefetchTask(self, self.generation, path)
+            self.tasks[path] = task
+            self.thread_pool.start(task)
+
+    def clear(self):
+        """清空缓存并作废所有任务（切换目录时调用）"""
+        self.generation += 1
+        self.thread_pool.clear()
+        self.tasks = {}
+        self.window = []
+        self.cache.clear()
+        self.cache_bytes = 0
+
+    def _insert(self, image_path, image):
+        """放入缓存并按内存预算淘汰最久未用、且不在预取窗口中的图片"""
+        old = self.cache.pop(image_path, None)
+        if old is not None:
+            self.cache_bytes -= old.sizeInBytes()
+        self.cache[image_path] = image
+        self.cache_bytes += image.sizeInBytes()
+
+        protected = set(self.window) | {image_path}
+        for path in list(self.cache):
+            if self.cache_bytes <= self.memory_budget:
+                break
+            if path in protected:
+                continue
+            self.cache_bytes -= self.cache.pop(path).sizeInBytes()
+
+    def _on_task_finished(self, generation, image_path, image):
+        """预取完成（在GUI线程中执行）"""
+        if generation != self.generation:
+            return
+        self.tasks.pop(image_path, None)
+        if not image.isNull():
+            self._insert(image_path, image)
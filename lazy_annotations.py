@@ -0,0 +1,264 @@
+import json
+import mmap
+import os
+import re
+import threading
+from collections.abc import MutableMapping
+
+
+# 匹配JSON字符串以及结构性符号，用于在不解析内容的情况下扫描顶层条目
+_TOKEN_RE = re.compile(rb'"(?:[^"\\]+|\\.)*"|[{}\[\],:]')
+
+
+def build_offset_index(file_path):
+    """流式扫描标注文件，返回 {相对路径: (字节偏移, 字节长度)}
+
+    只识别顶层对象的键和值的范围，不构造任何标注对象；
+    文件不是合法的顶层JSON对象时抛出 ValueError。
+    """
+    index = {}
+    if os.path.getsize(file_path) == 0:
+        raise ValueError("标注文件为空")
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        depth = 0
+        key = None
+        value_start = None
+        closed = False
+
+        def finish_entry(end):
+            if key is None or value_start is None:
+                raise ValueError("标注文件格式错误")
+            raw = data[value_start:end]
+            stripped = raw.lstrip()
+            offset = value_start + len(raw) - len(stripped)
+            index[key] = (offset, len(stripped.rstrip()))
+
+        for match in _TOKEN_RE.finditer(data):
+            token = data[match.start()]
+            if token == ord('"'):
+                if depth == 1 and value_start is None:
+                    key = json.loads(match.group().decode('utf-8'))
+            elif token == ord(':'):
+                if depth == 1:
+                    value_start = match.end()
+            elif token == ord(','):
+                if depth == 1:
+                    finish_entry(match.start())
+                    key = None
+                    value_start = None
+            elif token in (ord('{'), ord('[')):
+                if depth == 0 and token != ord('{'):
+                    raise ValueError("标注文件的顶层不是对象")
+                depth += 1
+            else:
+                if depth == 1:
+                    if value_start is not None:
+                        finish_entry(match.start())
+                    closed = True
+                    break
+                depth -= 1
+
+        if not closed:
+            raise ValueError("标注文件不完整")
+    return index
+
+
+def get_index_file_path(file_path):
+    """获取标注文件对应的偏移索引文件路径"""
+    return file_path + '.idx'
+
+
+def load_offset_index(file_path):
+    """读取与标注文件匹配的偏移索引，索引缺失或已过期时返回None"""
+    try:
+        stat = os.stat(file_path)
+        with open(get_index_file_path(file_path), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get('mtime_ns') != stat.st_mtime_ns or saved.get('size') != stat.st_size:
+        return None
+    return {key: tuple(span) for key, span in saved['entries'].items()}
+
+
+def save_offset_index(file_path, index):
+    """保存偏移索引，记录标注文件的修改时间和大小用于校验"""
+    stat = os.stat(file_path)
+    index_path = get_index_file_path(file_path)
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'entries': index
+        }, f, ensure_ascii=False)
+    os.replace(temp_path, index_path)
+
+
+def fsync_directory(file_path):
+    """同步文件所在目录，确保重命名本身也已落盘（Windows不支持打开目录）"""
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def write_snapshot_file(file_path, entries, source_path=None):
+    """把标注快照流式写到 file_path 旁的临时文件，同时生成偏移索引
+
+    entries 中每项为 (相对路径, 标注列表, 原始范围)：原始范围不为None时
+    直接从 source_path 拷贝原始字节，无需解析再序列化。
+    返回 (临时文件路径, 偏移索引)；由 replace_snapshot 改名为 file_path。
+    """
+    index = {}
+    temp_path = file_path + '.tmp'
+    source = open(source_path, 'rb') if source_path else None
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(b'{\n')
+            first = True
+            for key, value, span in entries:
+                if span is not None:
+                    source.seek(span[0])
+                    raw = source.read(span[1])
+                else:
+                    raw = json.dumps(value, ensure_ascii=False).encode('utf-8')
+                prefix = (b'' if first else b',\n') + b'  ' + json.dumps(key, ensure_ascii=False).encode('utf-8') + b': '
+                f.write(prefix)
+                index[key] = (f.tell(), len(raw))
+                f.write(raw)
+                first = False
+            f.write(b'\n}\n')
+            f.flush()
+            os.fsync(f.fileno())
+    finally:
+        if source is not None:
+            source.close()
+    return temp_path, index
+
+
+def replace_snapshot(temp_path, file_path, index):
+    """原子地用临时文件替换快照并保存偏移索引
+
+    Windows 上无法替换仍被打开的文件，调用前需关闭所有读取 file_path 的句柄。
+    """
+    os.replace(temp_path, file_path)
+    finish_snapshot(file_path, index)
+
+
+def finish_snapshot(file_path, index):
+    """快照改名后同步目录并保存偏移索引"""
+    fsync_directory(file_path)
+    try:
+        save_offset_index(file_path, index)
+    except OSError as e:
+        # 索引只是缓存，缺失时下次打开重新扫描
+        print(f"无法保存标注索引: {e}")
+
+
+class LazyAnnotationDict(MutableMapping):
+    """按需加载的标注字典
+
+    只保存每张图片在标注文件中的字节范围，访问某张图片时才读取并解析
+    对应的片段；内存占用只随实际访问过的图片增长。
+    """
+
+    def __init__(self, file_path, index):
+        self.file_path = file_path
+        self.index = index          # 相对路径 -> (字节偏移, 字节长度)
+        self.materialized = {}      # 已加载或修改过的条目
+        self.deleted = set()
+        self.lock = threading.RLock()
+        self.file = open(file_path, 'rb') if index else None
+
+    def __getitem__(self, key):
+        with self.lock:
+            if key in self.materialized:
+                return self.materialized[key]
+            if key in self.deleted or key not in self.index:
+                raise KeyError(key)
+            offset, length = self.index[key]
+            self.file.seek(offset)
+            value = json.loads(self.file.read(length).decode('utf-8'))
+            self.materialized[key] = value
+            return value
+
+    def read(self, key, default=None):
+        """读取条目但不缓存（导出等一次性的全量遍历使用，内存不随之增长）"""
+        with self.lock:
+            if key in self.materialized:
+                return self.materialized[key]
+            if key in self.deleted or key not in self.index:
+                return default
+            offset, length = self.index[key]
+            self.file.seek(offset)
+            return json.loads(self.file.read(length).decode('utf-8'))
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.materialized[key] = value
+            self.deleted.discard(key)
+
+    def __delitem__(self, key):
+        with self.lock:
+            if key not in self.materialized and (key in self.deleted or key not in self.index):
+                raise KeyError(key)
+            self.materialized.pop(key, None)
+            self.deleted.add(key)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.materialized or (key in self.index and key not in self.deleted)
+
+    def __iter__(self):
+        with self.lock:
+            keys = [key for key in self.index if key not in self.deleted and key not in self.materialized]
+            keys.extend(self.materialized)
+        return iter(keys)
+
+    def __len__(self):
+        with self.lock:
+            return sum(1 for _ in iter(self))
+
+    def snapshot_entries(self):
+        """返回写快照用的条目列表：已加载的给出对象，未加载的给出原始范围"""
+        with self.lock:
+            entries = [
+                (key, None, span) for key, span in self.index.items()
+                if key not in self.deleted and key not in self.materialized
+            ]
+            entries.extend((key, value, None) for key, value in self.materialized.items())
+        return entries
+
+    def rebase(self, file_path, index, written, temp_path=None):
+        """快照写完后切换到新文件；写入后未再修改的已加载条目可以释放
+
+        temp_path 不为None时，在持有锁并关闭旧文件之后才把它改名为 file_path
+        （Windows 上无法替换仍被打开的文件）；改名失败时继续读取旧文件并抛出 OSError。
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            if temp_path is not None:
+                try:
+                    replace_snapshot(temp_path, file_path, index)
+                except OSError:
+                    self.file = open(self.file_path, 'rb') if self.index else None
+                    raise
+            self.file_path = file_path
+            self.index = dict(index)
+            for key, value in written.items():
+                if self.materialized.get(key) is value:
+                    del self.materialized[key]
+            self.file = open(file_path, 'rb') if self.index else None
+
+    def close(self):
+        """关闭底层文件"""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
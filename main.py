@@ -6,93 +6,49 @@ from PyQt5.QtCore import Qt, QRectF
 import os
 from resizeableRect import ResizableRectItem
 from category_dialog_implementation import CategoryDialog
+from thumbnail_loader import ThumbnailLoader
+from thumbnail_cache import ThumbnailCache
+from image_list_model import ImageListModel
+from image_indexer import ImageIndexer, VideoIndexer
+from image_catalog import ImageCatalog
+from directory_watcher import DirectoryWatcher
+from region_list_model import RegionListModel, RegionItemDelegate
+from box_layer_item import BoxLayerItem
+from rect_item_pool import RectItemPool
+from region_thumbnailer import RegionThumbnailer, crop_region_image, crop_pyramid_region_image
+from annotation_storage import create_annotation_storage
+from auto_labeler import AutoLabeler
+from annotation_exporter import AnnotationExporter, EXPORT_FORMATS
+from box_propagator import BoxPropagator
+from box_tracker import BoxTracker, TRACKER_SOURCE
+from detectors import create_detector
+from image_prefetcher import ImagePrefetcher
+from video_frames import VIDEO_EXTENSIONS, close_videos
+from tiled_image_item import TiledImageItem, TILED_PIXEL_THRESHOLD, needs_tiling
+from annotation_coordinates import (
+    IMAGE_SPACE, is_image_space, legacy_display_size, to_image_space, to_display_space
+)
 
-from PyQt5.QtCore import QRectF
-import json
-import os
-
-class AnnotationStorage:
-    def __init__(self):
-        self.annotations = {}  # 存储所有图片的标注信息
-        
-    def save_annotation(self, image_path, rect_items):
-        """保存单个图片的标注信息"""
-        annotations = []
-        for rect_item in rect_items:
-            rect = rect_item.rect()
-            scene_pos = rect_item.scenePos()
-            annotation = {
-                'category': getattr(rect_item, 'category', ''),
-                'x': rect.x() + scene_pos.x(),
-                'y': rect.y() + scene_pos.y(),
-                'width': rect.width(),
-                'height': rect.height()
-            }
-            annotations.append(annotation)
-        
-        # 获取相对路径作为键
-        if image_path.startswith(self.base_dir):
-            rel_path = os.path.relpath(image_path, self.base_dir)
-        else:
-            rel_path = image_path
-            
-        self.annotations[rel_path] = annotations
-        self._save_to_file()
-        
-    def load_annotation(self, image_path):
-        """加载单个图片的标注信息"""
-        if image_path.startswith(self.base_dir):
-            rel_path = os.path.relpath(image_path, self.base_dir)
-        else:
-            rel_path = image_path
-            
-        return self.annotations.get(rel_path, [])
-    
-    def set_base_directory(self, directory):
-        """设置基础目录，用于生成相对路径"""
-        self.base_dir = directory
-        self._load_from_file()
-    
-    def _get_annotation_file_path(self):
-        """获取标注文件的路径"""
-        if hasattr(self, 'base_dir'):
-            return os.path.join(self.base_dir, 'annotations.json')
-        return None
-    
-    def _save_to_file(self):
-        """将标注信息保存到文件"""
-        file_path = self._get_annotation_file_path()
-        if file_path:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.annotations, f, ensure_ascii=False, indent=2)
-                
-    def _load_from_file(self):
-        """从文件加载标注信息"""
-        file_path = self._get_annotation_file_path()
-        if file_path and os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    self.annotations = json.load(f)
-            except json.JSONDecodeError:
-                print("标注文件损坏，创建新的标注记录")
-                self.annotations = {}
-        else:
-            self.annotations = {}
 
 # 添加自定义代理类
 class ThumbnailDelegate(QtWidgets.QStyledItemDelegate):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, icon_size=QtCore.QSize(100, 100)):
         super().__init__(parent)
         self.text_height = 20  # 文本区域高度
         self.spacing = 5      # 文本和图标之间的间距
+        # 所有项使用统一尺寸，视图无需逐项测量
+        self.item_size = QtCore.QSize(
+            icon_size.width() + 2 * self.spacing,
+            self.text_height + 2 * self.spacing + icon_size.height()
+        )
     
     def paint(self, painter, option, index):
         # 保存画家状态
         painter.save()
         
-        # 获取项目数据
-        icon = index.data(QtCore.Qt.DecorationRole)
-        text = index.data(QtCore.Qt.DisplayRole)
+        # 获取项目数据（缩略图由模型按需加载）
+        pixmap = index.data(ImageListModel.ThumbnailRole)
+        text = index.data(ImageListModel.FileNameRole)
         
         # 计算绘制区域
         rect = option.rect
@@ -116,24 +72,25 @@ class ThumbnailDelegate(QtWidgets.QStyledItemDelegate):
         ))
         painter.drawText(text_rect, Qt.AlignCenter | Qt.TextWrapAnywhere, text)
         
-        # 如果有图标，绘制在文本下方
-        if icon:
+        # 如果有缩略图，保持宽高比居中绘制在文本下方
+        if pixmap is not None and not pixmap.isNull():
             icon_rect = QtCore.QRect(
                 rect.left() + self.spacing,
                 rect.top() + self.text_height + self.spacing,
                 rect.width() - 2 * self.spacing,
                 rect.height() - self.text_height - 2 * self.spacing
             )
-            icon.paint(painter, icon_rect)
+            target_size = pixmap.size().scaled(icon_rect.size(), Qt.KeepAspectRatio)
+            target_rect = QtCore.QRect(QtCore.QPoint(0, 0), target_size)
+            target_rect.moveCenter(icon_rect.center())
+            painter.drawPixmap(target_rect, pixmap)
         
         # 恢复画家状态
         painter.restore()
     
     def sizeHint(self, option, index):
-        # 返回项目的建议大小
-        icon_size = option.decorationSize
-        total_height = self.text_height + 2 * self.spacing + icon_size.height()
-        return QtCore.QSize(icon_size.width() + 2 * self.spacing, total_height)
+        # 返回统一的项目大小
+        return self.item_size
 
 
 class MainWindow(QtWidgets.QWidget):
@@ -159,11 +116,15 @@ class MainWindow(QtWidgets.QWidget):
         self.ui.pushButtonOpenDir.clicked.connect(self.open_directory)
         self.ui.pushButtonNextImage.clicked.connect(self.next_image)
         self.ui.pushButtonPrevImage.clicked.connect(self.previous_image)
+        # 打开视频文件作为数据集：按需解码各帧，无需预先导出为图片
+        self.pushButtonOpenVideo = QtWidgets.QPushButton("Open Video", self)
+        self.ui.horizontalLayout.insertWidget(1, self.pushButtonOpenVideo)
+        self.pushButtonOpenVideo.clicked.connect(self.open_video)
+        # 导出标注为 YOLO / VOC / COCO 格式
+        self.pushButtonExport = QtWidgets.QPushButton("Export", self)
+        self.ui.horizontalLayout.addWidget(self.pushButtonExport)
+        self.pushButtonExport.clicked.connect(self.export_annotations)
         
-        # 连接文件列表的项目点击信号
-        self.ui.fileListWidget.itemClicked.connect(self.on_file_item_clicked)
-        # 连接缩略图列表的项目点击信号
-        self.ui.thumbnailPreview.itemClicked.connect(self.on_thumbnail_clicked)
         
         # # 设置缩略图列表的其他属性
         # self.ui.thumbnailPreview.setSpacing(10)  # 设置缩略图间距
@@ -173,27 +134,69 @@ class MainWindow(QtWidgets.QWidget):
         self.ui.thumbnailPreview.setViewMode(QtWidgets.QListView.IconMode)
         self.ui.thumbnailPreview.setIconSize(QtCore.QSize(100, 100))
         self.ui.thumbnailPreview.setSpacing(10)
-        self.ui.thumbnailPreview.setResizeMode(QtWidgets.QListWidget.Adjust)
-        self.ui.thumbnailPreview.setMovement(QtWidgets.QListWidget.Static)
+        self.ui.thumbnailPreview.setResizeMode(QtWidgets.QListView.Adjust)
+        self.ui.thumbnailPreview.setMovement(QtWidgets.QListView.Static)
         self.ui.thumbnailPreview.setWordWrap(True)
+        self.ui.thumbnailPreview.setUniformItemSizes(True)
+        self.ui.fileListWidget.setUniformItemSizes(True)
         
         # 创建并设置自定义代理
         self.thumbnail_delegate = ThumbnailDelegate(self.ui.thumbnailPreview)
         self.ui.thumbnailPreview.setItemDelegate(self.thumbnail_delegate)
 
+        # 后台缩略图加载器，只为视图中可见的行生成缩略图
+        self.thumbnail_loader = ThumbnailLoader(QtCore.QSize(100, 100), self)
+        # 当前目录的持久化缩略图缓存
+        self.thumbnail_cache = None
+
+        # 文件列表和缩略图列表共用同一个图片模型和选择模型
+        self.image_model = ImageListModel(self.thumbnail_loader, 100, parent=self)
+        self.ui.fileListWidget.setModel(self.image_model)
+        self.ui.thumbnailPreview.setModel(self.image_model)
+        self.ui.thumbnailPreview.setSelectionModel(self.ui.fileListWidget.selectionModel())
+
+        # 连接文件列表的项目点击信号
+        self.ui.fileListWidget.clicked.connect(self.on_file_item_clicked)
+        # 连接缩略图列表的项目点击信号
+        self.ui.thumbnailPreview.clicked.connect(self.on_thumbnail_clicked)
+
+        # 滚动缩略图列表时丢弃已不可见的等待任务
+        self.ui.thumbnailPreview.horizontalScrollBar().valueChanged.connect(
+            self.update_visible_thumbnails
+        )
+
         # Add after other initializations
         # self.ui.label.setAlignment(Qt.AlignCenter)  # Optional: center the text
 
         # 存储当前选择的目录路径
         self.current_directory = None
         self.current_image_index = -1
+        # 当前目录的图片：行号、绝对路径和相对路径之间的 O(1) 查找，列表模型和标注存储共用
+        self.image_catalog = ImageCatalog()
+
+        # 后台流式索引目录中的图片，分批追加到列表中
+        self.image_indexer = ImageIndexer(workers=4, parent=self)
+        self.image_indexer.images_found.connect(self.on_images_found)
+        self.image_indexer.finished.connect(self.on_indexing_finished)
+        # 索引完成后监视目录树，增量更新图片列表（AUTOLABEL_WATCH_MODE：auto、watch、poll 或 off）
+        self.directory_watcher = DirectoryWatcher(
+            os.environ.get('AUTOLABEL_WATCH_MODE', 'auto'), parent=self
+        )
+        self.directory_watcher.images_added.connect(self.on_images_added)
+        self.directory_watcher.images_removed.connect(self.on_images_removed)
+        # 打开视频时在后台建立关键帧索引，各帧以“视频路径#帧号”加入列表
+        self.video_indexer = VideoIndexer(parent=self)
+        self.video_indexer.images_found.connect(self.on_images_found)
+        self.video_indexer.finished.connect(self.on_video_indexed)
         
         # 添加矩形框绘制相关的属性
         self.drawing = False
         self.start_point = None
         self.current_rect = None
-        self.rect_items = []
         self.selected_rect = None  # 添加选中矩形的引用
+        # 当前图片所有标注框的图形层；只有悬停或选中的框提升为 ResizableRectItem
+        self.box_layer = None
+        self.hovered_box = None  # 鼠标悬停的框编号
         
         # 连接创建矩形框按钮
         self.ui.pushButtonCreateRectBox.clicked.connect(self.toggle_draw_mode)
@@ -206,25 +209,90 @@ class MainWindow(QtWidgets.QWidget):
         # 添加场景选择变化的信号连接
         self.scene.selectionChanged.connect(self.handle_selection_changed)
 
+        # 场景回收：换图时保留图片项、辅助线和框图形层，只替换图片和框的数据；
+        # 提升的框从对象池中复用（设置 AUTOLABEL_SCENE_RECYCLING=0 可退回每次清空场景）
+        self.scene_recycling = os.environ.get('AUTOLABEL_SCENE_RECYCLING', '1') != '0'
+        self.rect_item_pool = RectItemPool(self.scene)
+        self.pixmap_item = None          # 复用的图片项
+        self.recycled_box_layer = None   # 复用的框图形层
+
         # 添加鼠标事件跟踪
         self.ui.graphicsView.setMouseTracking(True)
         self.ui.graphicsView.viewport().installEventFilter(self)
         self.ui.graphicsView.viewport().setMouseTracking(True)
+        # 缩放视图后保持控制柄、线宽和标签的屏幕尺寸，并更新细节层次
+        self.ui.graphicsView.zoom_changed.connect(self.on_zoom_changed)
         
         # 添加图片边界属性
         self.image_bounds = None
+
+        # 坐标模式：默认场景直接使用原图像素坐标，由视图变换负责适应窗口；
+        # 设置 AUTOLABEL_COORDINATES=display 可退回旧的“缩放图片到视图大小”模式
+        self.use_image_coordinates = os.environ.get('AUTOLABEL_COORDINATES', IMAGE_SPACE) != 'display'
+        # 一个屏幕像素对应的场景长度，用于保持控制柄、线宽等的屏幕尺寸
+        self.scene_unit = 1.0
+        # 当前图片在场景中的尺寸（显示坐标模式下即缩放后的尺寸）
+        self.display_size = None
+        # 当前图片的原图尺寸
+        self.image_size = None
+
+        # 后台预解码前后的图片：沿浏览方向预取3张、反方向1张，最多占用1GB内存
+        # （超大图片交给分块显示，不整张预取）
+        self.image_prefetcher = ImagePrefetcher(ahead=3, behind=1,
+                                                memory_budget=1024 * 1024 * 1024,
+                                                max_pixels=TILED_PIXEL_THRESHOLD, parent=self)
+        self.navigation_direction = 1  # 最近一次的浏览方向：1 向后，-1 向前
+
+        # 场景中显示当前图片的图形项（QGraphicsPixmapItem 或超大图的 TiledImageItem）
+        self.image_item = None
         
         # 添加辅助定位线属性
         self.guide_line_h = None  # 水平辅助线
         self.guide_line_v = None  # 垂直辅助线
 
             
+        # 类别列表使用模型和代理绘制，标注框变化时只更新受影响的行
+        self.region_delegate = RegionItemDelegate(self.ui.categoryListWidget)
+        # 区域缩略图按图片和框的几何信息缓存，在后台线程中截取
+        self.region_thumbnailer = RegionThumbnailer(self.region_delegate.thumbnail_size, self)
+        self.region_model = RegionListModel(self.region_thumbnailer, self)
+        self.ui.categoryListWidget.setModel(self.region_model)
+        self.ui.categoryListWidget.setItemDelegate(self.region_delegate)
+
         # 添加类别列表的选择响应
-        self.ui.categoryListWidget.itemClicked.connect(self.on_category_item_clicked)
+        self.ui.categoryListWidget.clicked.connect(self.on_category_item_clicked)
 
         
-        # 创建标注存储对象
-        self.annotation_storage = AnnotationStorage()
+        # 创建标注存储对象（可通过环境变量选择 json 或 sqlite 后端）
+        self.annotation_storage = create_annotation_storage(
+            os.environ.get('AUTOLABEL_ANNOTATION_BACKEND', 'json')
+        )
+        self.annotation_storage.set_catalog(self.image_catalog)
+
+        # 自动标注：在后台对整个数据集运行检测器，结果写入标注存储
+        # （AUTOLABEL_DETECTOR 选择 stub、onnx 或 opencv，模型和类别文件由
+        # AUTOLABEL_DETECTOR_MODEL、AUTOLABEL_DETECTOR_CLASSES 指定）
+        self.detector = None
+        self.auto_labeler = AutoLabeler(workers=os.cpu_count() or 4, parent=self)
+        self.auto_labeler.progress.connect(self.on_auto_label_progress)
+        self.auto_labeler.images_updated.connect(self.on_proposals_added)
+        self.auto_labeler.finished.connect(self.on_auto_label_finished)
+        # 框传播：以新画的框为模板，在其它图片中查找相同的目标，结果为待确认框
+        self.box_propagator = BoxPropagator(workers=os.cpu_count() or 4, parent=self)
+        self.box_propagator.progress.connect(self.on_auto_label_progress)
+        self.box_propagator.images_updated.connect(self.on_proposals_added)
+        self.box_propagator.finished.connect(self.on_auto_label_finished)
+        # 跟踪辅助标注（AUTOLABEL_TRACKING=1）：浏览到相邻的尚未标注的帧时，
+        # 在后台把上一帧的框跟踪过来
+        self.tracking_enabled = os.environ.get('AUTOLABEL_TRACKING') == '1'
+        self.box_tracker = BoxTracker(parent=self)
+        self.box_tracker.boxes_tracked.connect(self.on_boxes_tracked)
+        # 在后台把整个数据集的标注导出为 YOLO / VOC / COCO 格式
+        self.annotation_exporter = AnnotationExporter(workers=os.cpu_count() or 4, parent=self)
+        self.annotation_exporter.progress.connect(self.on_export_progress)
+        self.annotation_exporter.finished.connect(self.on_export_finished)
+        # 自动标注方式：propagate（模板匹配传播当前框，默认）或 detector（检测器）
+        self.auto_label_mode = os.environ.get('AUTOLABEL_AUTO_MODE', 'propagate')
 
 
         # 在这里可以添加其他初始化代码
@@ -238,34 +306,68 @@ class MainWindow(QtWidgets.QWidget):
     def show_category_context_menu(self, position):
         """显示类别列表的右键菜单"""
         # 获取点击位置的项
-        item = self.ui.categoryListWidget.itemAt(position)
+        index = self.ui.categoryListWidget.indexAt(position)
         
-        if item is not None:
+        if index.isValid():
             # 创建菜单
             context_menu = QtWidgets.QMenu(self)
             
+            # 自动标注产生的待确认框可以接受或拒绝
+            box_id = index.data(RegionListModel.BoxRole)
+            accept_action = reject_action = accept_all_action = None
+            if self.box_layer is not None and self.box_layer.is_pending(box_id):
+                accept_action = context_menu.addAction("接受建议")
+                reject_action = context_menu.addAction("拒绝建议")
+            if self.box_layer is not None and self.box_layer.pending_ids():
+                accept_all_action = context_menu.addAction("接受本图全部建议")
+                context_menu.addSeparator()
+
             # 添加删除动作
             delete_action = context_menu.addAction("删除标注框")
             
             # 显示菜单并获取选择的动作
             action = context_menu.exec_(self.ui.categoryListWidget.viewport().mapToGlobal(position))
             
-            if action == delete_action:
-                # 获取关联的矩形项
-                rect_item = item.data(QtCore.Qt.UserRole)
-                if rect_item:
-                    # 从场景中移除矩形
-                    self.scene.removeItem(rect_item)
-                    # 从矩形项列表中移除
-                    if rect_item in self.rect_items:
-                        self.rect_items.remove(rect_item)
-                    # 从类别列表中移除项
-                    row = self.ui.categoryListWidget.row(item)
-                    self.ui.categoryListWidget.takeItem(row)
+            if action is None:
+                return
+            if action in (accept_action, accept_all_action):
+                for pending_id in ([box_id] if action == accept_action else self.box_layer.pending_ids()):
+                    self.box_layer.accept_box(pending_id)
+                self.region_model.sync(self.box_layer)
+                self.save_current_annotations()
+            elif action in (delete_action, reject_action):
+                # 获取关联的框编号
+                box_id = index.data(RegionListModel.BoxRole)
+                if box_id is not None and self.box_layer is not None:
+                    if self.hovered_box == box_id:
+                        self.hovered_box = None
+                    # 移除提升后的矩形（如果有）并从图形层中删除
+                    self.demote_box(box_id)
+                    self.box_layer.remove_box(box_id)
+                    # 从类别列表中移除对应的行
+                    self.region_model.sync(self.box_layer)
                     # 保存更新后的标注
                     self.save_current_annotations()
 
 
+    def on_zoom_changed(self, view_scale):
+        """视图缩放后更新屏幕像素对应的场景长度"""
+        if view_scale <= 0:
+            return
+        self.scene_unit = 1.0 / view_scale
+        if self.box_layer is None:
+            return
+        self.box_layer.set_scene_unit(self.scene_unit)
+        # 提升的框数量很少，逐个更新即可
+        for box_id in self.box_layer.promoted_ids():
+            rect_item = self.box_layer.item(box_id)
+            rect_item.set_scene_unit(self.scene_unit)
+            if hasattr(rect_item, 'category'):
+                self.update_rect_label(rect_item, rect_item.category)
+        if self.current_rect is not None:
+            self.current_rect.set_scene_unit(self.scene_unit)
+
+
     def center_window(self):
         """将窗口移动到屏幕中央"""
         # 获取屏幕几何信息
@@ -279,13 +381,14 @@ class MainWindow(QtWidgets.QWidget):
         self.move(new_left, new_top)
 
 
-    def on_category_item_clicked(self, item):
+    def on_category_item_clicked(self, index):
         """处理类别列表项被点击的事件"""
-        # 获取对应的矩形项
-        rect_item = item.data(QtCore.Qt.UserRole)
-        if rect_item:
+        # 获取对应的矩形项（未提升的框先提升为可交互的矩形）
+        box_id = index.data(RegionListModel.BoxRole)
+        if box_id is not None and self.box_layer is not None:
             # 清除其他项的选择
             self.scene.clearSelection()
+            rect_item = self.promote_box(box_id)
             # 选中对应的矩形
             rect_item.setSelected(True)
             # 确保矩形可见
@@ -301,12 +404,10 @@ class MainWindow(QtWidgets.QWidget):
             self.ui.pushButtonCreateRectBox.setText("Create RectBox")
             self.drawing = False
             self.ui.graphicsView.viewport().setCursor(Qt.ArrowCursor)
-            # 退出绘制模式时移除辅助线
+            # 退出绘制模式时隐藏辅助线（保留图形项供下次使用）
             if self.guide_line_h is not None:
-                self.scene.removeItem(self.guide_line_h)
-                self.scene.removeItem(self.guide_line_v)
-                self.guide_line_h = None
-                self.guide_line_v = None
+                self.guide_line_h.setVisible(False)
+                self.guide_line_v.setVisible(False)
 
     def eventFilter(self, source, event):
         """事件过滤器，处理鼠标事件"""
@@ -317,13 +418,20 @@ class MainWindow(QtWidgets.QWidget):
                 scene_pos = self.ui.graphicsView.mapToScene(view_pos)
                 # Update label with current coordinates
                 self.ui.label.setText(f"X = {int(scene_pos.x())},  Y = {int(scene_pos.y())}")
-                
-                # 检查鼠标是否在控制柄上
-            
-                
-                # Handle drawing mode mouse move
+
+                # 绘制模式下由 handle_mouse_move 更新辅助线和正在绘制的框，
+                # 必须在悬停处理之前返回，否则绘制过程中两者都不再刷新
                 if self.drawing:
                     return self.handle_mouse_move(event)
+
+                # 检查鼠标是否在控制柄上（拖动过程中不更新悬停状态）
+                if event.buttons() == Qt.NoButton:
+                    self.update_hover(scene_pos)
+            elif event.type() == QtCore.QEvent.MouseButtonPress and not self.drawing:
+                # 按下前确保鼠标下的框已提升，使按键由该框处理
+                self.update_hover(self.ui.graphicsView.mapToScene(event.pos()))
+            elif event.type() == QtCore.QEvent.Leave:
+                self.update_hover(None)
                     
             # Handle other existing mouse events
             if self.drawing:
@@ -334,6 +442,61 @@ class MainWindow(QtWidgets.QWidget):
                     
         return super().eventFilter(source, event)
 
+
+    def update_hover(self, scene_pos):
+        """通过空间索引查找鼠标下的框和控制柄，提升该框并更新悬停高亮和光标"""
+        box_id, handle = (None, None)
+        if scene_pos is not None and self.box_layer is not None:
+            box_id, handle = self.box_layer.hit_test(scene_pos)
+        if self.hovered_box is not None and self.hovered_box != box_id:
+            previous = self.box_layer.item(self.hovered_box)
+            if previous is not None:
+                previous.set_hovered_handle(None)
+                self.demote_box(self.hovered_box, only_if_idle=True)
+        self.hovered_box = box_id
+        if box_id is not None:
+            self.promote_box(box_id).set_hovered_handle(handle)
+        viewport = self.ui.graphicsView.viewport()
+        if handle is not None:
+            viewport.setCursor(self.box_layer.item(box_id).getCursorForHandle(handle))
+        elif viewport.cursor().shape() in (Qt.SizeFDiagCursor, Qt.SizeBDiagCursor):
+            viewport.setCursor(Qt.ArrowCursor)
+
+    def promote_box(self, box_id):
+        """把图形层中的框提升为可交互的 ResizableRectItem，返回该图形项"""
+        rect_item = self.box_layer.item(box_id)
+        if rect_item is not None:
+            return rect_item
+        rect_item = self.rect_item_pool.acquire(self.box_layer.box_rect(box_id))
+        category = self.box_layer.category(box_id)
+        if category is not None:
+            rect_item.category = category
+        rect_item.set_scene_unit(self.scene_unit)
+        rect_item.setFlag(QtWidgets.QGraphicsItem.ItemIsSelectable, True)
+        rect_item.setFlag(QtWidgets.QGraphicsItem.ItemIsMovable, True)
+        rect_item.main_window = self
+        if category is not None:
+            self.update_rect_label(rect_item, category)
+        self.box_layer.attach_item(box_id, rect_item)
+        return rect_item
+
+    def demote_box(self, box_id, only_if_idle=False):
+        """把提升的框交还给图形层绘制，图形项归还对象池
+
+        only_if_idle 为 True 时，选中、悬停或正在拖动的框保持提升状态。
+        """
+        rect_item = self.box_layer.item(box_id)
+        if rect_item is None:
+            return
+        if only_if_idle and (
+            rect_item.isSelected() or rect_item.is_resizing or box_id == self.hovered_box
+            or self.scene.mouseGrabberItem() is rect_item
+        ):
+            return
+        self.box_layer.detach_item(box_id)
+        if rect_item is self.selected_rect:
+            self.selected_rect = None
+        self.rect_item_pool.release(rect_item)
     
     def handle_mouse_move(self, event):
         """处理鼠标移动事件（添加边界限制和辅助定位线）"""
@@ -350,6 +513,7 @@ class MainWindow(QtWidgets.QWidget):
                 # 如果辅助线不存在或已被删除，重新创建它们
                 if self.guide_line_h is None or self.guide_line_v is None:
                     pen = QPen(Qt.green, 1, Qt.DashLine)  # 创建虚线画笔
+                    pen.setCosmetic(True)  # 线宽不随缩放变化
                     
                     # 移除旧的辅助线（如果存在）
                     if self.guide_line_h:
@@ -360,6 +524,8 @@ class MainWindow(QtWidgets.QWidget):
                     # 创建新的辅助线
                     self.guide_line_h = self.scene.addLine(0, 0, 0, 0, pen)
                     self.guide_line_v = self.scene.addLine(0, 0, 0, 0, pen)
+                self.guide_line_h.setVisible(True)
+                self.guide_line_v.setVisible(True)
                 
                 # 更新辅助线位置
                 # 使用scene.addLine返回的QGraphicsLineItem对象的setLine方法
@@ -396,7 +562,7 @@ class MainWindow(QtWidgets.QWidget):
 
     def handle_mouse_press(self, event):
         """处理鼠标按下事件（添加边界检查）"""
-        if not self.drawing:
+        if not self.drawing or self.box_layer is None:
             return False
         
         view_pos = event.pos()
@@ -407,13 +573,15 @@ class MainWindow(QtWidgets.QWidget):
             return False
         
         self.start_point = scene_pos
-        self.current_rect = ResizableRectItem(QRectF(scene_pos, scene_pos))
-        self.scene.addItem(self.current_rect)
+        self.current_rect = self.rect_item_pool.acquire(QRectF(scene_pos, scene_pos))
+        self.current_rect.set_scene_unit(self.scene_unit)
         return True
 
     def handle_selection_changed(self):
         """处理场景中的选择变化"""
-        selected_items = self.scene.selectedItems()
+        if self.box_layer is None:
+            return
+        selected_items = self.box_layer.selected_items()
         if selected_items:
             selected_rect = selected_items[0]
             if isinstance(selected_rect, ResizableRectItem):
@@ -421,6 +589,9 @@ class MainWindow(QtWidgets.QWidget):
                 self.show_category_dialog()
         else:
             self.selected_rect = None
+        # 取消选中且不在鼠标下的框交还给图形层
+        for box_id in self.box_layer.promoted_ids():
+            self.demote_box(box_id, only_if_idle=True)
 
 
     def show_category_dialog(self):
@@ -435,8 +606,10 @@ class MainWindow(QtWidgets.QWidget):
             category = dialog.get_selected_category()
             auto_label = dialog.autoLabelCheckBox.isChecked()
             
-            # 保存类别到矩形对象
+            # 保存类别到矩形对象（为待确认框设置类别即视为接受）
             self.selected_rect.category = category
+            self.box_layer.set_category(self.selected_rect.box_id, category)
+            self.box_layer.accept_box(self.selected_rect.box_id)
             
             # 在矩形上显示类别标签
             self.update_rect_label(self.selected_rect, category)
@@ -449,23 +622,104 @@ class MainWindow(QtWidgets.QWidget):
             
             print(f"Category set to: {category}")
             print(f"Auto label: {auto_label}")
+            if auto_label:
+                if self.auto_label_mode == 'detector':
+                    self.start_auto_label()
+                else:
+                    self.propagate_box(self.selected_rect.box_id)
+
+    def propagate_box(self, box_id):
+        """以框内的图像为模板，在目录中的其它图片里查找相同目标"""
+        if not 0 <= self.current_image_index < len(self.image_catalog):
+            return
+        rect = self.box_layer.box_rect(box_id)
+        x, y, width, height = rect.x(), rect.y(), rect.width(), rect.height()
+        if not self.use_image_coordinates:
+            # 显示坐标换算为原图像素坐标
+            scale_x = self.image_size[0] / self.display_size[0]
+            scale_y = self.image_size[1] / self.display_size[1]
+            x, y, width, height = x * scale_x, y * scale_y, width * scale_x, height * scale_y
+        current_image = self.image_catalog[self.current_image_index]
+        self.save_current_annotations()
+        targets = [path for path in self.image_catalog if path != current_image]
+        self.box_propagator.start(
+            current_image, (x, y, width, height), self.box_layer.category(box_id),
+            self.annotation_storage, targets
+        )
+
+    def start_auto_label(self):
+        """对当前目录中尚未标注的图片运行自动标注"""
+        if not self.image_catalog:
+            return
+        if self.detector is None:
+            backend = os.environ.get('AUTOLABEL_DETECTOR', 'stub')
+            options = {}
+            if backend != 'stub':
+                options['model'] = os.environ.get('AUTOLABEL_DETECTOR_MODEL')
+                options['class_names'] = os.environ.get('AUTOLABEL_DETECTOR_CLASSES')
+                # YOLO 输出格式（v5 或 v8）；未设置时由类别文件推断
+                options['version'] = os.environ.get('AUTOLABEL_DETECTOR_VERSION')
+            try:
+                self.detector = create_detector(backend, **options)
+            except Exception as e:
+                print(f"无法创建检测器 {backend}: {e}")
+                return
+        # 先写入当前图片的修改，自动标注会跳过已有标注的图片
+        self.save_current_annotations()
+        self.auto_labeler.start(self.detector, self.annotation_storage, self.image_catalog.paths)
+
+    def on_auto_label_progress(self, done, total):
+        """自动标注进度"""
+        self.ui.label.setText(f"自动标注 {done}/{total}")
+
+    def on_proposals_added(self, updates):
+        """后台结果已合并保存；涉及当前图片时把新增的待确认框加到图形层"""
+        if self.box_layer is None or not 0 <= self.current_image_index < len(self.image_catalog):
+            return
+        current_image = self.image_catalog[self.current_image_index]
+        for image_path, added in updates:
+            if image_path != current_image:
+                continue
+            view_size = self.ui.graphicsView.size()
+            annotations, _ = self.convert_annotations(
+                added, self.image_size, (view_size.width(), view_size.height())
+            )
+            # 图形层与存储中合并前的标注一致，只追加新增的框
+            self.box_layer.set_boxes(annotations)
+            self.update_category_list()
+
+    def on_auto_label_finished(self, stats):
+        """自动标注或框传播完成（出错时 stats 为错误信息）"""
+        print(f"自动标注完成: {stats}")
+
+    def export_annotations(self):
+        """选择导出格式和输出目录，在后台导出当前数据集的全部标注"""
+        if not self.current_directory:
+            return
+        export_format, ok = QtWidgets.QInputDialog.getItem(
+            self, "导出标注", "导出格式:", list(EXPORT_FORMATS), 0, False
+        )
+        if not ok:
+            return
+        output_dir = QtWidgets.QFileDialog.getExistingDirectory(
+            self, "选择导出目录", self.current_directory
+        )
+        if not output_dir:
+            return
+        self.save_current_annotations()
+        self.annotation_exporter.start(self.annotation_storage, output_dir, export_format)
+
+    def on_export_progress(self, done, total):
+        """导出进度"""
+        self.ui.label.setText(f"导出 {done}/{total}")
+
+    def on_export_finished(self, stats):
+        """导出完成（出错时 stats 为错误信息）"""
+        print(f"导出完成: {stats}")
 
     def update_rect_label(self, rect_item, category):
-        """更新矩形框上的类别标签"""
-        # 删除现有的标签（如果有）
-        for child in rect_item.childItems():
-            if isinstance(child, QtWidgets.QGraphicsTextItem):
-                rect_item.scene().removeItem(child)
-                break
-        
-        # 创建新的标签
-        text_item = self.scene.addText(category)
-        text_item.setDefaultTextColor(Qt.red)
-        text_item.setParentItem(rect_item)
-        
-        # 设置标签位置（在矩形框的左上角）
-        rect = rect_item.rect()
-        text_item.setPos(rect.left(), rect.top() - 20)  # 将标签放在矩形上方
+        """更新矩形框上的类别标签（复用框已有的标签项）"""
+        rect_item.set_label(category)
 
 
     def handle_mouse_release(self, event):
@@ -487,15 +741,18 @@ class MainWindow(QtWidgets.QWidget):
         if self.image_bounds:
             rect = rect.intersected(self.image_bounds)
         
-        # 如果矩形太小，则删除
-        if rect.width() < 5 or rect.height() < 5:
-            self.scene.removeItem(self.current_rect)
+        # 如果矩形太小（小于5个屏幕像素），则删除
+        min_size = 5 * self.scene_unit
+        if rect.width() < min_size or rect.height() < min_size:
+            self.rect_item_pool.release(self.current_rect)
         else:
             self.current_rect.setRect(rect)
             self.current_rect.updateHandles()
             # 设置主窗口引用
             self.current_rect.main_window = self
-            self.rect_items.append(self.current_rect)
+            # 登记到图形层，新建的框保持提升状态直到设置完类别
+            box_id = self.box_layer.add_box(rect)
+            self.box_layer.attach_item(box_id, self.current_rect)
             # 设置矩形可选择和移动
             self.current_rect.setFlag(QtWidgets.QGraphicsItem.ItemIsSelectable, True)
             self.current_rect.setFlag(QtWidgets.QGraphicsItem.ItemIsMovable, True)
@@ -504,6 +761,8 @@ class MainWindow(QtWidgets.QWidget):
             self.show_category_dialog()
             # 保存标注
             self.save_current_annotations()
+            # 设置完类别后交还给图形层绘制
+            self.demote_box(box_id, only_if_idle=True)
         
         self.start_point = None
         self.current_rect = None
@@ -522,307 +781,445 @@ class MainWindow(QtWidgets.QWidget):
         if directory:
             self.current_directory = directory
             print(f"选择的文件夹路径: {directory}")
-            # 设置标注存储的基础目录
-            self.annotation_storage.set_base_directory(directory)
-            
-            # 定义支持的图片格式
-            image_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
-            
-            # 递归获取目录下所有图片文件
-            def find_images(folder):
-                image_files = []
-                for item in os.listdir(folder):
-                    item_path = os.path.join(folder, item)
-                    if os.path.isfile(item_path):
-                        if item.lower().endswith(image_extensions):
-                            image_files.append(item_path)
-                    elif os.path.isdir(item_path):
-                        image_files.extend(find_images(item_path))
-                return sorted(image_files)
-            
-            # 获取所有图片
-            self.image_files = find_images(directory)
-                    
-            if self.image_files:
-                # 清空文件列表和缩略图列表
-                self.ui.fileListWidget.clear()
-                self.ui.thumbnailPreview.clear()
-                
-                # 添加所有图片到列表和缩略图
-                for image_path in self.image_files:
-                    # 获取相对路径
-                    rel_path = os.path.relpath(image_path, directory)
-                    
-                    # 添加到文件列表
-                    file_item = QtWidgets.QListWidgetItem(rel_path)
-                    file_item.setData(QtCore.Qt.UserRole, image_path)
-                    self.ui.fileListWidget.addItem(file_item)
-                    
+            self.reset_dataset(directory)
+            # 在后台索引图片，找到的图片分批追加到列表中
+            self.image_indexer.start(directory)
 
-                    # 创建并添加缩略图的部分修改为：
-                    thumbnail_item = QtWidgets.QListWidgetItem()
-                    thumbnail_item.setData(QtCore.Qt.UserRole, image_path)
-                    # 创建缩略图
-                    thumbnail_icon = self.create_thumbnail(image_path)
-                    if thumbnail_icon:
-                        thumbnail_item.setIcon(thumbnail_icon)
-                        thumbnail_item.setText(os.path.basename(image_path))
-                        # 设置项目大小提示
-                        size = self.thumbnail_delegate.sizeHint(
-                            self.ui.thumbnailPreview.viewOptions(),
-                            self.ui.thumbnailPreview.model().createIndex(0, 0)
-                        )
-                        thumbnail_item.setSizeHint(size)
-                        self.ui.thumbnailPreview.addItem(thumbnail_item)
-                
-                # 设置当前索引为0并显示第一张图片
-                self.current_image_index = 0
+    def open_video(self):
+        """打开视频文件选择对话框，把视频的各帧作为图片列表"""
+        start_dir = self.current_directory if self.current_directory else "./"
+        patterns = ' '.join('*' + ext for ext in VIDEO_EXTENSIONS)
+        video_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "选择视频", start_dir, f"视频文件 ({patterns})"
+        )
+
+        if video_path:
+            # 标注和缓存保存在视频所在的目录中，标注以“视频文件名#帧号”为键
+            directory = os.path.dirname(video_path)
+            self.current_directory = directory
+            print(f"选择的视频: {video_path}")
+            self.reset_dataset(directory)
+            # 在后台建立（或读取缓存的）关键帧索引，各帧分批追加到列表中
+            self.video_indexer.start(video_path)
+
+    def reset_dataset(self, directory):
+        """切换数据集：停止上一个数据集的后台任务，以 directory 为基础目录清空列表"""
+        # 停止上一个目录的自动标注，再设置标注存储的基础目录
+        self.auto_labeler.cancel()
+        self.auto_labeler.thread_pool.waitForDone()
+        self.box_propagator.cancel()
+        self.box_propagator.thread_pool.waitForDone()
+        self.box_tracker.cancel()
+        self.annotation_exporter.cancel()
+        self.annotation_exporter.thread_pool.waitForDone()
+        self.annotation_storage.set_base_directory(directory)
+
+        # 停止上一次的索引和目录监视，丢弃预取结果，关闭已打开的视频
+        self.image_indexer.cancel()
+        self.video_indexer.cancel()
+        self.directory_watcher.stop()
+        self.image_prefetcher.clear()
+        close_videos()
+        # 清空列表，切换缩略图缓存（会取消上一个目录未完成的缩略图任务）
+        self.image_catalog.reset(directory)
+        self.current_image_index = -1
+        self.open_thumbnail_cache(directory)
+        self.image_model.set_catalog(self.image_catalog, self.thumbnail_cache)
+        self.update_navigation_buttons()
+
+    def on_images_found(self, image_paths):
+        """索引找到一批图片：追加到列表，第一批到达时显示第一张图片"""
+        # 缩略图在视图绘制时按需生成
+        self.image_model.append_images(image_paths)
+        if self.current_image_index < 0:
+            # 设置当前索引为0并显示第一张图片
+            self.current_image_index = 0
+            self.display_current_image()
+            # 选中第一个列表项
+            self.ui.fileListWidget.setCurrentIndex(self.image_model.index(0))
+        # 更新按钮状态
+        self.update_navigation_buttons()
+
+    def on_indexing_finished(self, count):
+        """目录索引完成"""
+        if count == 0:
+            print("未在选择的目录中找到图片文件")
+        else:
+            print(f"共找到 {count} 张图片")
+        # 开始监视目录变化（复用索引得到的目录列表，无需重新扫描）
+        self.directory_watcher.start(self.current_directory, self.image_indexer.directory_entries)
+
+    def on_video_indexed(self, count):
+        """视频帧索引完成（视频的帧数不会变化，不监视目录）"""
+        if count == 0:
+            print("无法读取视频中的帧")
+        else:
+            print(f"视频共 {count} 帧")
+
+    def on_images_added(self, image_paths):
+        """目录中出现新图片：按顺序插入列表"""
+        for image_path in image_paths:
+            row = self.image_model.insert_image(image_path)
+            if 0 <= row <= self.current_image_index:
+                self.current_image_index += 1
+        if self.current_image_index < 0 and self.image_catalog:
+            self.current_image_index = 0
+            self.display_current_image()
+            self.ui.fileListWidget.setCurrentIndex(self.image_model.index(0))
+        self.update_navigation_buttons()
+
+    def on_images_removed(self, image_paths):
+        """目录中的图片被删除：从列表中移除，当前图片被删除时显示相邻的图片"""
+        current_removed = False
+        for image_path in image_paths:
+            row = self.image_model.remove_image(image_path)
+            if row < 0:
+                continue
+            if row < self.current_image_index:
+                self.current_image_index -= 1
+            elif row == self.current_image_index:
+                current_removed = True
+        if current_removed:
+            if self.image_catalog:
+                self.current_image_index = min(self.current_image_index, len(self.image_catalog) - 1)
                 self.display_current_image()
-                # 选中第一个列表项
-                self.ui.fileListWidget.setCurrentRow(0)
-                self.ui.thumbnailPreview.setCurrentRow(0)
-                # 更新按钮状态
-                self.update_navigation_buttons()
+                self.ui.fileListWidget.setCurrentIndex(
+                    self.image_model.index(self.current_image_index)
+                )
             else:
-                print("未在选择的目录中找到图片文件")
-
-    def create_thumbnail(self, image_path):
-        """创建图片缩略图"""
-        # 加载图片
-        image = QtGui.QImage(image_path)
-        if image.isNull():
-            return None
-            
-        # 创建缩略图（保持宽高比）
-        thumbnail_size = QtCore.QSize(100, 100)
-        scaled_image = image.scaled(thumbnail_size, 
-                                  QtCore.Qt.KeepAspectRatio, 
-                                  QtCore.Qt.SmoothTransformation)
-        
-        return QtGui.QIcon(QtGui.QPixmap.fromImage(scaled_image))
-    def on_file_item_clicked(self, item):
+                self.current_image_index = -1
+                self.clear_scene()
+        self.update_navigation_buttons()
+
+    def open_thumbnail_cache(self, directory):
+        """切换到指定目录的缩略图缓存"""
+        self.thumbnail_loader.cancel()
+        if self.thumbnail_cache is not None:
+            self.thumbnail_cache.close()
+        self.thumbnail_cache = ThumbnailCache.open_for_directory(directory)
+
+    def update_visible_thumbnails(self):
+        """将缩略图列表当前可见的行范围告知加载器，丢弃已滚出视野的任务"""
+        view = self.ui.thumbnailPreview
+        count = self.image_model.rowCount()
+        if count == 0:
+            return
+        # 所有项尺寸统一，可直接由滚动位置计算可见范围
+        item_width = self.thumbnail_delegate.item_size.width() + view.spacing()
+        first_row = view.horizontalScrollBar().value() // item_width
+        visible_count = view.viewport().width() // item_width + 1
+        # 两侧各保留一屏的余量
+        self.thumbnail_loader.set_visible_rows(
+            max(0, first_row - visible_count),
+            min(count - 1, first_row + 2 * visible_count)
+        )
+
+    def on_file_item_clicked(self, index):
         """处理文件列表项被点击的事件"""
-        # 获取被点击项目的完整路径
-        clicked_path = item.data(QtCore.Qt.UserRole)
-        # 找到该路径在图片列表中的索引
-        try:
-            self.current_image_index = self.image_files.index(clicked_path)
-            self.display_current_image()
-            self.update_navigation_buttons()
-        except ValueError:
-            print("无法找到选中的图片")
+        # 两个列表共用模型，行号即图片索引
+        self.current_image_index = index.row()
+        self.display_current_image()
+        self.update_navigation_buttons()
 
-    def on_thumbnail_clicked(self, item):
+    def on_thumbnail_clicked(self, index):
         """处理缩略图被点击的事件"""
-        # 获取被点击项目的完整路径
-        clicked_path = item.data(QtCore.Qt.UserRole)
-        try:
-            self.current_image_index = self.image_files.index(clicked_path)
-            self.display_current_image()
-            # 同步选中文件列表
-            self.ui.fileListWidget.setCurrentRow(self.current_image_index)
-            self.update_navigation_buttons()
-        except ValueError:
-            print("无法找到选中的图片")
-            
+        # 文件列表与缩略图共用选择模型，选中状态自动同步
+        self.current_image_index = index.row()
+        self.display_current_image()
+        self.ui.fileListWidget.scrollTo(index)
+        self.update_navigation_buttons()
 
-    
+    def clear_scene(self):
+        """清除当前图片的场景内容
+
+        回收模式下不清空场景：提升的框归还对象池，图片项隐藏，框图形层
+        和辅助线留在场景中等待下一张图片复用；否则清空整个场景。
+        """
+        if isinstance(self.image_item, TiledImageItem):
+            self.image_item.release()
+        # 先断开图形层，移除选中的框时触发的选择变化不再处理
+        box_layer = self.box_layer
+        self.box_layer = None
+        self.hovered_box = None
+        self.selected_rect = None
+        self.region_model.clear()
+
+        if not self.scene_recycling:
+            self.scene.clear()
+            self.rect_item_pool.clear()
+            self.pixmap_item = None
+            self.recycled_box_layer = None
+            self.guide_line_h = None
+            self.guide_line_v = None
+            self.current_rect = None
+            self.start_point = None
+            self.image_item = None
+            self.ui.graphicsView.set_image_item(None)
+            return
+
+        if box_layer is not None:
+            for box_id in box_layer.promoted_ids():
+                self.rect_item_pool.release(box_layer.detach_item(box_id))
+        if self.current_rect is not None:
+            # 正在绘制、尚未登记到图形层的框
+            if self.current_rect.scene() is not None and self.current_rect.isVisible():
+                self.rect_item_pool.release(self.current_rect)
+            self.current_rect = None
+            self.start_point = None
+        if isinstance(self.image_item, TiledImageItem):
+            self.scene.removeItem(self.image_item)
+        if self.pixmap_item is not None:
+            self.pixmap_item.setVisible(False)
+        self.image_item = None
+        self.ui.graphicsView.set_image_item(None)
 
     # 修改 display_current_image 方法：
     def display_current_image(self):
         """显示当前索引对应的图片并加载其标注"""
-        if 0 <= self.current_image_index < len(self.image_files):
-            current_image = self.image_files[self.current_image_index]
+        if 0 <= self.current_image_index < len(self.image_catalog):
+            current_image = self.image_catalog[self.current_image_index]
             
-            # 清除现有的场景内容
-            self.scene.clear()
-            self.rect_items.clear()
-            self.ui.categoryListWidget.clear()
+            # 清除现有的场景内容（回收模式下保留可复用的图形项）
+            self.clear_scene()
             
-            # 加载图片
-            pixmap = QPixmap(current_image)
             view_size = self.ui.graphicsView.size()
-            scaled_pixmap = pixmap.scaled(
-                view_size,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
+            tiled_item = None
+            if self.use_image_coordinates and needs_tiling(current_image):
+                # 超大图片使用分块金字塔显示，只解码视口内需要的分块
+                try:
+                    tiled_item = TiledImageItem(
+                        current_image, os.path.join(self.current_directory, '.tiles')
+                    )
+                except OSError as e:
+                    # 图片已不可访问等情况下按普通图片处理
+                    print(f"无法分块显示图片 {current_image}: {e}")
+            if tiled_item is not None:
+                self.image_item = tiled_item
+                self.image_item.setZValue(-1)
+                self.scene.addItem(self.image_item)
+                if self.pixmap_item is not None:
+                    # 释放复用图片项中上一张图片的像素
+                    self.pixmap_item.setPixmap(QPixmap())
+                image_size = self.image_item.image_size()
+                self.display_size = image_size
+                pyramid = self.image_item.pyramid
+                region_source = lambda rect, size: crop_pyramid_region_image(pyramid, rect, size)
+            else:
+                # 加载图片（通常已被后台预取解码）
+                image = self.image_prefetcher.load(current_image)
+                image_size = (image.width(), image.height())
+                if self.use_image_coordinates:
+                    # 场景使用原图尺寸，适应窗口交给视图变换，无需逐张缩放图片
+                    scene_image = image
+                else:
+                    scene_image = image.scaled(
+                        view_size,
+                        Qt.KeepAspectRatio,
+                        Qt.SmoothTransformation
+                    )
+                self.display_size = (scene_image.width(), scene_image.height())
+                # 将图片添加到场景中（回收模式下只替换已有图片项的内容）
+                pixmap = QPixmap.fromImage(scene_image)
+                if self.pixmap_item is None:
+                    self.pixmap_item = self.scene.addPixmap(pixmap)
+                    self.pixmap_item.setZValue(-1)
+                else:
+                    self.pixmap_item.setPixmap(pixmap)
+                    self.pixmap_item.setVisible(True)
+                self.image_item = self.pixmap_item
+                region_source = lambda rect, size: crop_region_image(scene_image, rect, size)
+            self.image_size = image_size
+            # 区域缩略图从当前图片截取（缓存键区分图片及其显示尺寸）
+            self.region_thumbnailer.set_source((current_image, self.display_size), region_source)
+            self.ui.graphicsView.set_image_item(self.image_item)
+            # 预取浏览方向上的后续图片
+            self.image_prefetcher.prefetch(
+                self.image_catalog, self.current_image_index, self.navigation_direction
             )
-            
-            # 将图片添加到场景中
-            pixmap_item = self.scene.addPixmap(scaled_pixmap)
-            self.scene.setSceneRect(0, 0, scaled_pixmap.width(), scaled_pixmap.height())
+            self.scene.setSceneRect(0, 0, *self.display_size)
             self.image_bounds = self.scene.sceneRect()
             
-            # 加载已有的标注
-            annotations = self.annotation_storage.load_annotation(current_image)
-            for annotation in annotations:
-                rect_item = ResizableRectItem(QRectF(
-                    annotation['x'],
-                    annotation['y'],
-                    annotation['width'],
-                    annotation['height']
-                ))
-                rect_item.category = annotation['category']
-                rect_item.setFlag(QtWidgets.QGraphicsItem.ItemIsSelectable, True)
-                rect_item.setFlag(QtWidgets.QGraphicsItem.ItemIsMovable, True)
-                rect_item.main_window = self
-                self.scene.addItem(rect_item)
-                self.rect_items.append(rect_item)
-                # 更新矩形框上的标签
-                self.update_rect_label(rect_item, rect_item.category)
-            
-            # 更新类别列表显示
-            self.update_category_list()
-            
             # 设置场景到GraphicsView
             self.ui.graphicsView.setScene(self.scene)
             self.ui.graphicsView.fitInView(
                 self.scene.sceneRect(),
                 Qt.KeepAspectRatio
             )
+            # 根据适应窗口后的缩放比例计算屏幕像素对应的场景长度
+            view_scale = self.ui.graphicsView.transform().m11()
+            self.scene_unit = 1.0 / view_scale if view_scale > 0 else 1.0
+            
+            # 加载已有的标注，并转换到当前的坐标模式
+            annotations, converted = self.convert_annotations(
+                self.annotation_storage.load_annotation(current_image),
+                image_size,
+                (view_size.width(), view_size.height())
+            )
+            # 所有框由一个图形层批量绘制，不为每个框创建图形项
+            if self.recycled_box_layer is None:
+                self.recycled_box_layer = BoxLayerItem(self.scene.sceneRect(), self.scene_unit)
+                self.scene.addItem(self.recycled_box_layer)
+            else:
+                self.recycled_box_layer.reset(self.scene.sceneRect(), self.scene_unit)
+            self.box_layer = self.recycled_box_layer
+            self.box_layer.set_boxes(annotations)
+            
+            # 旧格式的标注迁移后立即按新坐标保存（每张图片只迁移一次）
+            if converted:
+                self.save_current_annotations()
+            
+            # 更新类别列表显示
+            self.update_category_list()
+
+    def convert_annotations(self, annotations, image_size, view_size):
+        """把已保存的标注转换到当前坐标模式，返回 (标注列表, 是否发生了转换)"""
+        image_width, image_height = image_size
+        if image_width <= 0 or image_height <= 0:
+            return annotations, False
+
+        if self.use_image_coordinates:
+            if all(is_image_space(a) for a in annotations):
+                return annotations, False
+            # 早期标注没有记录显示尺寸，按当前视图大小推算旧版的显示尺寸
+            fallback = legacy_display_size(image_width, image_height, *view_size)
+            return [
+                to_image_space(a, image_width, image_height, fallback) for a in annotations
+            ], True
+
+        if not any(is_image_space(a) for a in annotations):
+            return annotations, False
+        return [
+            to_display_space(a, image_width, image_height, *self.display_size) for a in annotations
+        ], True
 
     def next_image(self):
         """切换到下一张图片"""
-        if self.current_image_index < len(self.image_files) - 1:
+        if self.current_image_index < len(self.image_catalog) - 1:
+            source, boxes = self.tracking_source()
             self.current_image_index += 1
+            self.navigation_direction = 1
             self.display_current_image()
+            self.track_into_current(source, boxes)
             self.update_navigation_buttons()
 
     def previous_image(self):
         """切换到上一张图片"""
         if self.current_image_index > 0:
+            source, boxes = self.tracking_source()
             self.current_image_index -= 1
+            self.navigation_direction = -1
             self.display_current_image()
+            self.track_into_current(source, boxes)
             self.update_navigation_buttons()
 
+    def tracking_source(self):
+        """离开当前图片前记录其路径和框（原图像素坐标），供跟踪辅助标注使用"""
+        if not self.tracking_enabled or self.box_layer is None or self.box_layer.count == 0:
+            return None, []
+        annotations = self.box_layer.annotations()
+        if not self.use_image_coordinates:
+            annotations = [
+                to_image_space(a, self.image_size[0], self.image_size[1], self.display_size)
+                for a in annotations
+            ]
+        return self.image_catalog[self.current_image_index], annotations
+
+    def track_into_current(self, source, boxes):
+        """当前图片还没有标注时，在后台把上一帧的框跟踪过来"""
+        if not boxes or self.box_layer is None or self.box_layer.count > 0:
+            return
+        self.box_tracker.track(
+            self.current_image_index, source, self.image_catalog[self.current_image_index], boxes
+        )
+
+    def on_boxes_tracked(self, index, boxes):
+        """跟踪完成：结果仍属于当前图片且用户尚未画框时载入并保存"""
+        if isinstance(boxes, str):
+            print(f"跟踪失败: {boxes}")
+            return
+        if index != self.current_image_index or self.box_layer is None or self.box_layer.count > 0:
+            return
+        if not boxes:
+            return
+        annotations = []
+        for box in boxes:
+            box = {key: value for key, value in box.items()
+                   if key not in ('pending', 'display_width', 'display_height')}
+            box['source'] = TRACKER_SOURCE
+            box['coordinates'] = IMAGE_SPACE
+            annotations.append(box)
+        view_size = self.ui.graphicsView.size()
+        annotations, _ = self.convert_annotations(
+            annotations, self.image_size, (view_size.width(), view_size.height())
+        )
+        self.box_layer.set_boxes(annotations)
+        self.update_category_list()
+        self.save_current_annotations()
+
     def update_navigation_buttons(self):
         """更新导航按钮的启用状态"""
         # 当没有上一张图片时禁用上一张按钮
         self.ui.pushButtonPrevImage.setEnabled(self.current_image_index > 0)
         # 当没有下一张图片时禁用下一张按钮
         self.ui.pushButtonNextImage.setEnabled(
-            self.current_image_index < len(self.image_files) - 1
+            self.current_image_index < len(self.image_catalog) - 1
         )
 
 
 
     def update_category_list(self):
-        """更新类别列表显示，包含区域缩略图"""
-        # 防止频繁更新导致的闪烁
-        self.ui.categoryListWidget.setUpdatesEnabled(False)
-        
-        try:
-            self.ui.categoryListWidget.clear()
-            
-            # 获取当前场景中的图片项
-            pixmap_items = [item for item in self.scene.items() if isinstance(item, QtWidgets.QGraphicsPixmapItem)]
-            if not pixmap_items:
-                return
-            
-            # 获取原始图片
-            original_pixmap = pixmap_items[0].pixmap()
-            
-            for rect_item in self.rect_items:
-                if hasattr(rect_item, 'category'):
-                    # 创建列表项
-                    item = QtWidgets.QListWidgetItem()
-                    item.setSizeHint(QtCore.QSize(200, 120))
-                    
-                    # 获取矩形框的坐标信息
-                    rect = rect_item.rect()
-                    scene_pos = rect_item.scenePos()
-                    actual_rect = QRectF(
-                        rect.x() + scene_pos.x(),
-                        rect.y() + scene_pos.y(),
-                        rect.width(),
-                        rect.height()
-                    )
-                    
-                    # 创建缩略图
-                    region_pixmap = self.create_region_thumbnail(original_pixmap, actual_rect)
-                    
-                    # 创建自定义widget来显示信息和缩略图
-                    widget = QtWidgets.QWidget()
-                    layout = QtWidgets.QHBoxLayout()
-                    
-                    # 添加缩略图标签
-                    thumbnail_label = QtWidgets.QLabel()
-                    thumbnail_label.setFixedSize(100, 100)
-                    thumbnail_label.setPixmap(region_pixmap.scaled(
-                        100, 100,
-                        Qt.KeepAspectRatio,
-                        Qt.SmoothTransformation
-                    ))
-                    thumbnail_label.setStyleSheet("border: 1px solid #cccccc;")
-                    layout.addWidget(thumbnail_label)
-                    
-                    # 添加文本信息
-                    text_widget = QtWidgets.QWidget()
-                    text_layout = QtWidgets.QVBoxLayout()
-                    
-                    category_label = QtWidgets.QLabel(f"类别: {rect_item.category}")
-                    position_label = QtWidgets.QLabel(
-                        f"位置: ({int(actual_rect.x())}, {int(actual_rect.y())})"
-                    )
-                    size_label = QtWidgets.QLabel(
-                        f"大小: {int(actual_rect.width())}×{int(actual_rect.height())}"
-                    )
-                    
-                    # 设置字体
-                    font = QtGui.QFont()
-                    font.setPointSize(9)
-                    category_label.setFont(font)
-                    position_label.setFont(font)
-                    size_label.setFont(font)
-                    
-                    text_layout.addWidget(category_label)
-                    text_layout.addWidget(position_label)
-                    text_layout.addWidget(size_label)
-                    text_layout.addStretch()
-                    
-                    text_widget.setLayout(text_layout)
-                    layout.addWidget(text_widget)
-                    
-                    # 设置布局
-                    widget.setLayout(layout)
-                    
-                    # 存储对应的矩形项引用
-                    item.setData(QtCore.Qt.UserRole, rect_item)
-                    
-                    # 将自定义widget设置为列表项的widget
-                    self.ui.categoryListWidget.addItem(item)
-                    self.ui.categoryListWidget.setItemWidget(item, widget)
-                    
-        finally:
-            # 重新启用更新
-            self.ui.categoryListWidget.setUpdatesEnabled(True)
+        """更新类别列表显示：只增删或刷新发生变化的标注框对应的行"""
+        self.region_model.sync(self.box_layer)
 
 
-    def create_region_thumbnail(self, original_pixmap, rect):
-        """从原始图片中截取矩形区域创建缩略图"""
-        # 确保矩形区域在有效范围内
-        rect = rect.toRect()
-        rect = rect.intersected(original_pixmap.rect())
-        
-        # 从原始图片中截取区域
-        cropped_pixmap = original_pixmap.copy(rect)
-        
-        # 添加边框
-        painter = QtGui.QPainter(cropped_pixmap)
-        pen = QtGui.QPen(Qt.red, 2)
-        painter.setPen(pen)
-        painter.drawRect(cropped_pixmap.rect().adjusted(0, 0, -1, -1))
-        painter.end()
-        
-        return cropped_pixmap
-
+    def closeEvent(self, event):
+        """关闭窗口时写完标注、停止后台任务并关闭缓存"""
+        # 先停止仍在写入标注的自动标注
+        self.auto_labeler.cancel()
+        self.auto_labeler.thread_pool.waitForDone()
+        self.box_propagator.cancel()
+        self.box_propagator.thread_pool.waitForDone()
+        self.box_tracker.cancel()
+        self.box_tracker.thread_pool.waitForDone()
+        self.annotation_exporter.cancel()
+        self.annotation_exporter.thread_pool.waitForDone()
+        self.annotation_storage.close()
+        self.image_indexer.cancel()
+        self.image_indexer.thread_pool.waitForDone()
+        self.video_indexer.cancel()
+        self.video_indexer.thread_pool.waitForDone()
+        self.directory_watcher.stop()
+        self.thumbnail_loader.cancel()
+        self.thumbnail_loader.thread_pool.waitForDone()
+        self.image_prefetcher.clear()
+        self.image_prefetcher.thread_pool.waitForDone()
+        self.region_thumbnailer.clear()
+        self.region_thumbnailer.thread_pool.waitForDone()
+        close_videos()
+        if self.thumbnail_cache is not None:
+            self.thumbnail_cache.close()
+            self.thumbnail_cache = None
+        super().closeEvent(event)
 
     # 添加保存标注的方法：
     def save_current_annotations(self):
         """保存当前图片的标注信息"""
-        if 0 <= self.current_image_index < len(self.image_files):
-            current_image = self.image_files[self.current_image_index]
-            self.annotation_storage.save_annotation(current_image, self.rect_items)
+        if 0 <= self.current_image_index < len(self.image_catalog):
+            current_image = self.image_catalog[self.current_image_index]
+            # 记录坐标空间：原图坐标，或旧模式下的显示尺寸（供日后迁移）
+            if self.use_image_coordinates:
+                metadata = {'coordinates': IMAGE_SPACE}
+            else:
+                metadata = {
+                    'display_width': self.display_size[0],
+                    'display_height': self.display_size[1]
+                }
+            if self.box_layer is None:
+                return
+            annotations = self.box_layer.annotations()
+            for annotation in annotations:
+                annotation.update(metadata)
+            self.annotation_storage.save_annotation_data(current_image, annotations)
 
 
 if __name__ == "__main__":
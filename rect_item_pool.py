@@ -0,0 +1,43 @@
+from PyQt5.QtCore import QRectF
+
+from resizeableRect import ResizableRectItem
+
+
+class RectItemPool:
+    """ResizableRectItem（连同其控制柄和标签子项）的对象池
+
+    归还的图形项留在场景中隐藏起来，再次取用时只重设矩形和状态，
+    避免快速翻页时反复创建、销毁 Python/Qt 对象。空闲的图形项超过
+    上限时才真正从场景中移除。
+    """
+
+    MAX_POOLED = 64
+
+    def __init__(self, scene, max_pooled=MAX_POOLED):
+        self.scene = scene
+        self.max_pooled = max_pooled
+        self.free = []
+
+    def acquire(self, rect):
+        """取出一个显示指定矩形的图形项（已在场景中）"""
+        if self.free:
+            rect_item = self.free.pop()
+            rect_item.reset(rect)
+            rect_item.setVisible(True)
+        else:
+            rect_item = ResizableRectItem(rect)
+            self.scene.addItem(rect_item)
+        return rect_item
+
+    def release(self, rect_item):
+        """归还图形项（调用前应已从框图形层取消关联）"""
+        rect_item.reset(QRectF())
+        if len(self.free) >= self.max_pooled:
+            self.scene.removeItem(rect_item)
+            return
+        rect_item.setVisible(False)
+        self.free.append(rect_item)
+
+    def clear(self):
+        """场景被清空后丢弃池中的图形项"""
+        self.free = []
@@ -0,0 +1,185 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt
+from PyQt5.QtGui import QColor, QFont, QPen
+from PyQt5.QtWidgets import QStyle, QStyledItemDelegate
+
+
+class RegionListModel(QAbstractListModel):
+    """类别列表的数据模型：每行对应框图形层中一个已设置类别的框
+
+    sync() 按标注框比对新旧状态，只对新增、删除以及类别或位置发生变化的
+    行发出通知。区域缩略图由 RegionThumbnailer 按几何信息缓存并在后台
+    生成；拖动过程中沿用旧的缩略图，松开鼠标后才请求新的截图。
+    """
+
+    # 自定义数据角色
+    BoxRole = Qt.UserRole               # 对应的框编号
+    PositionRole = Qt.UserRole + 1      # 位置文本
+    SizeRole = Qt.UserRole + 2          # 大小文本
+
+    def __init__(self, thumbnailer, parent=None):
+        super().__init__(parent)
+        self.thumbnailer = thumbnailer
+        self.thumbnailer.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.rows = []  # 每行：{'box', 'category', 'geometry', 'key', 'pixmap'}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        x, y, width, height = row['geometry']
+        if role == Qt.DisplayRole:
+            return f"类别: {row['category']}"
+        if role == Qt.DecorationRole:
+            pixmap = self.thumbnailer.get(row['key'])
+            if pixmap is not None:
+                row['pixmap'] = pixmap
+            # 新的缩略图生成前继续显示上一次的缩略图
+            return row['pixmap']
+        if role == self.BoxRole:
+            return row['box']
+        if role == self.PositionRole:
+            return f"位置: ({x}, {y})"
+        if role == self.SizeRole:
+            return f"大小: {width}×{height}"
+        return None
+
+    def clear(self):
+        """清空所有行"""
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+
+    def sync(self, box_layer):
+        """与框图形层同步，只更新发生变化的行"""
+        wanted = [] if box_layer is None else [
+            box_id for box_id in box_layer.box_ids() if box_layer.category(box_id) is not None
+        ]
+        wanted_ids = set(wanted)
+
+        # 删除已不存在的行（从后往前，避免行号错位）
+        for i in range(len(self.rows) - 1, -1, -1):
+            if self.rows[i]['box'] not in wanted_ids:
+                self.beginRemoveRows(QModelIndex(), i, i)
+                del self.rows[i]
+                self.endRemoveRows()
+
+        # 更新已有的行
+        existing = {row['box']: i for i, row in enumerate(self.rows)}
+        for box_id in wanted:
+            i = existing.get(box_id)
+            if i is None:
+                continue
+            row = self.rows[i]
+            category, geometry = self._snapshot(box_layer, box_id)
+            dragging = self._is_dragging(box_layer.item(box_id))
+            if category == row['category'] and geometry == row['geometry']:
+                # 拖动结束后补发被推迟的截图请求
+                if not dragging:
+                    self.thumbnailer.request(row['key'])
+                continue
+            if geometry != row['geometry']:
+                row['key'] = self.thumbnailer.key_for(geometry)
+                if not dragging:
+                    self.thumbnailer.request(row['key'])
+            row['category'] = category
+            row['geometry'] = geometry
+            index = self.index(i)
+            self.dataChanged.emit(index, index)
+
+        # 追加新的行
+        new_ids = [box_id for box_id in wanted if box_id not in existing]
+        if new_ids:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_ids) - 1)
+            for box_id in new_ids:
+                category, geometry = self._snapshot(box_layer, box_id)
+                key = self.thumbnailer.key_for(geometry)
+                self.rows.append({
+                    'box': box_id,
+                    'category': category,
+                    'geometry': geometry,
+                    'key': key,
+                    'pixmap': None
+                })
+                self.thumbnailer.request(key)
+            self.endInsertRows()
+
+    def on_thumbnail_ready(self, key):
+        """区域缩略图生成完成，刷新使用该缩略图的行"""
+        for i, row in enumerate(self.rows):
+            if row['key'] == key:
+                index = self.index(i)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def _snapshot(self, box_layer, box_id):
+        """记录框的类别和取整后的几何信息，用于判断是否变化"""
+        rect = box_layer.box_rect(box_id)
+        category = box_layer.category(box_id)
+        if box_layer.is_pending(box_id):
+            category = f"{category}（待确认）"
+        return category, (int(rect.x()), int(rect.y()), int(rect.width()), int(rect.height()))
+
+    def _is_dragging(self, rect_item):
+        """框是否正在被拖动或调整大小（只有提升后的图形项可以被拖动）"""
+        if rect_item is None:
+            return False
+        if rect_item.is_resizing:
+            return True
+        scene = rect_item.scene()
+        return scene is not None and scene.mouseGrabberItem() is rect_item
+
+
+class RegionItemDelegate(QStyledItemDelegate):
+    """直接绘制类别列表行：左侧区域缩略图，右侧类别、位置和大小"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.item_size = QSize(200, 120)
+        self.thumbnail_size = QSize(100, 100)
+        self.margin = 10
+        self.font = QFont()
+        self.font.setPointSize(9)
+        self.border_pen = QPen(QColor('#cccccc'), 1)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect
+
+        # 绘制选中状态背景
+        selected = option.state & QStyle.State_Selected
+        if selected:
+            painter.fillRect(rect, option.palette.highlight())
+
+        # 左侧缩略图（保持宽高比居中）
+        thumb_rect = QRect(rect.left() + self.margin, rect.top() + (rect.height() - self.thumbnail_size.height()) // 2,
+                           self.thumbnail_size.width(), self.thumbnail_size.height())
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap is not None and not pixmap.isNull():
+            target_size = pixmap.size().scaled(thumb_rect.size(), Qt.KeepAspectRatio)
+            target = QRect(0, 0, target_size.width(), target_size.height())
+            target.moveCenter(thumb_rect.center())
+            painter.drawPixmap(target, pixmap)
+        painter.setPen(self.border_pen)
+        painter.drawRect(thumb_rect.adjusted(0, 0, -1, -1))
+
+        # 右侧三行文本
+        painter.setFont(self.font)
+        painter.setPen(option.palette.color(
+            option.palette.HighlightedText if selected else option.palette.Text
+        ))
+        line_height = painter.fontMetrics().height() + 4
+        text_left = thumb_rect.right() + self.margin
+        text_rect = QRect(text_left, thumb_rect.top(), rect.right() - text_left, line_height)
+        for role in (Qt.DisplayRole, RegionListModel.PositionRole, RegionListModel.SizeRole):
+            painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter, index.data(role))
+            text_rect.translate(0, line_height)
+
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return self.item_size
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QRect, QRectF, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QPen, QPixmap
+
+
+def draw_region_border(image):
+    """在区域缩略图上添加红色边框"""
+    if image.isNull():
+        return image
+    painter = QPainter(image)
+    painter.setPen(QPen(Qt.red, 2))
+    painter.drawRect(image.rect().adjusted(0, 0, -1, -1))
+    painter.end()
+    return image
+
+
+def crop_region_image(image, rect, thumbnail_size):
+    """从整张图片中截取区域并缩放到缩略图尺寸（可在工作线程中调用）"""
+    region = image.copy(rect.intersected(image.rect()))
+    if region.isNull():
+        return QImage()
+    region = draw_region_border(region.convertToFormat(QImage.Format_ARGB32_Premultiplied))
+    return region.scaled(thumbnail_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def crop_pyramid_region_image(pyramid, rect, thumbnail_size):
+    """从超大图片的分块金字塔中读取区域缩略图（可在工作线程中调用）"""
+    region = pyramid.region_image(QRectF(rect), thumbnail_size)
+    return crop_region_image(region, region.rect(), thumbnail_size)
+
+
+class RegionThumbnailSignals(QObject):
+    """区域缩略图任务的信号"""
+    # 参数：批次号、缓存键、缩略图
+    finished = pyqtSignal(int, object, QImage)
+
+
+class RegionThumbnailTask(QRunnable):
+    """在工作线程中截取一个标注框区域"""
+
+    def __init__(self, thumbnailer, generation, key, source, rect):
+        super().__init__()
+        self.thumbnailer = thumbnailer
+        self.generation = generation
+        self.key = key
+        self.source = source
+        self.rect = rect
+
+    def run(self):
+        if self.thumbnailer.generation != self.generation:
+            return
+        image = self.source(self.rect, self.thumbnailer.thumbnail_size)
+        self.thumbnailer.signals.finished.emit(self.generation, self.key, image)
+
+
+class RegionThumbnailer(QObject):
+    """标注框区域缩略图的缓存与后台生成
+
+    缓存键为 (图片键, 取整后的 x, y, 宽, 高, 缩略图宽, 缩略图高)，
+    位置和大小不变的框不会被重复截取；缺失的缩略图交给工作线程生成，
+    完成后通过 thumbnail_ready 通知。
+    """
+
+    # 参数：缓存键
+    thumbnail_ready = pyqtSignal(object)
+
+    MAX_CACHED = 1024  # 内存中最多保留的区域缩略图数量
+
+    def __init__(self, thumbnail_size, parent=None):
+        super().__init__(parent)
+        self.thumbnail_size = thumbnail_size
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(2)
+        self.generation = 0
+        self.signals = RegionThumbnailSignals()
+        self.signals.finished.connect(self._on_task_finished)
+
+        self.image_key = None
+        self.source = None      # source(QRect, QSize) -> QImage，需线程安全
+        self.cache = OrderedDict()  # 缓存键 -> QPixmap
+        self.pending = set()
+
+    def set_source(self, image_key, source):
+        """切换当前图片；之前图片的缓存保留，回到该图片时可以直接命中"""
+        self.generation += 1
+        self.thread_pool.clear()
+        self.pending.clear()
+        self.image_key = image_key
+        self.source = source
+
+    def key_for(self, geometry):
+        """根据取整后的 (x, y, 宽, 高) 生成当前图片的缓存键"""
+        return (self.image_key,) + tuple(geometry) + (
+            self.thumbnail_size.width(), self.thumbnail_size.height()
+        )
+
+    def get(self, key):
+        """返回已缓存的缩略图，没有时返回None"""
+        pixmap = self.cache.get(key)
+        if pixmap is not None:
+            self.cache.move_to_end(key)
+        return pixmap
+
+    def request(self, key):
+        """请求生成缩略图（已缓存或已在生成中的忽略）"""
+        if self.source is None or key in self.cache or key in self.pending:
+            return
+        if key[0] != self.image_key:
+            return
+        x, y, width, height = key[1:5]
+        self.pending.add(key)
+        self.thread_pool.start(RegionThumbnailTask(
+            self, self.generation, key, self.source, QRect(x, y, width, height)
+        ))
+
+    def clear(self):
+        """作废未完成的任务并清空缓存"""
+        self.set_source(None, None)
+        self.cache.clear()
+
+    def _on_task_finished(self, generation, key, image):
+        """缩略图生成完成（在GUI线程中执行）"""
+        if generation != self.generation:
+            return
+        self.pending.discard(key)
+        self.cache[key] = QPixmap.fromImage(image)
+        while len(self.cache) > self.MAX_CACHED:
+            self.cache.popitem(last=False)
+        self.thumbnail_ready.emit(key)
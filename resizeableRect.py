@@ -1,5 +1,5 @@
 from PyQt5.QtGui import QPen, QColor, QBrush
-from PyQt5.QtWidgets import QGraphicsItem, QGraphicsRectItem
+from PyQt5.QtWidgets import QGraphicsItem, QGraphicsRectItem, QGraphicsTextItem
 from PyQt5.QtCore import Qt, QRectF, QTimer  # 添加QTimer的导入
 
 class ResizableRectItem(QGraphicsRectItem):
@@ -21,6 +21,8 @@ class ResizableRectItem(QGraphicsRectItem):
         # 创建四个角点控制柄
         self.handles = []
         self.handle_size = 8
+        # 一个屏幕像素对应的场景长度（原图坐标模式下随图片缩放比例变化）
+        self.scene_unit = 1.0
         
         # 控制柄状态相关
         self.current_handle = None  # 当前拖动的控制柄
@@ -55,11 +57,18 @@ class ResizableRectItem(QGraphicsRectItem):
             'brush': QBrush(QColor(0, 0, 255, 50))  # 半透明蓝色，alpha=50
         }
         
-        # 设置接受悬停事件
-        self.setAcceptHoverEvents(True)
+        # 悬停由主窗口通过空间索引统一检测，框本身不处理悬停事件
+        self.setAcceptHoverEvents(False)
+        # 位置变化时需要通知框图形层
+        self.setFlag(QGraphicsItem.ItemSendsGeometryChanges, True)
+        # 所属的框图形层和在其中的编号（由 BoxLayerItem.attach_item 设置）
+        self.box_layer = None
+        self.box_id = None
         
         # 添加最小尺寸限制
         self.min_size = 10
+        # 类别标签（首次设置类别时创建，之后复用）
+        self.label_item = None
         
         # 初始化控制柄  
         self.updateHandles()
@@ -98,6 +107,52 @@ class ResizableRectItem(QGraphicsRectItem):
             ))
         
         self.updateHandleColors()
+        if self.box_layer is not None:
+            self.box_layer.item_geometry_changed(self)
+
+    def reset(self, rect):
+        """恢复为只显示指定矩形的初始状态，供对象池复用"""
+        self.update_timer.stop()
+        self.box_layer = None
+        self.box_id = None
+        self.main_window = None
+        self.setSelected(False)
+        self.setPos(0, 0)
+        self.current_handle = None
+        self.hovered_handle = None
+        self.original_rect = None
+        self.start_pos = None
+        self.is_resizing = False
+        if hasattr(self, 'category'):
+            del self.category
+        if self.label_item is not None:
+            self.label_item.setVisible(False)
+        self.setRect(rect)
+        self.updateHandles()
+
+    def set_label(self, text):
+        """在矩形上方显示类别标签，保持屏幕上的字号不变"""
+        if self.label_item is None:
+            self.label_item = QGraphicsTextItem(self)
+            self.label_item.setDefaultTextColor(Qt.red)
+        self.label_item.setPlainText(text)
+        self.label_item.setScale(self.scene_unit)
+        rect = self.rect()
+        self.label_item.setPos(rect.left(), rect.top() - 20 * self.scene_unit)
+        self.label_item.setVisible(True)
+
+    def scene_rect(self):
+        """矩形在场景坐标中的范围（框没有父项和变换，只需加上位置）"""
+        return self.rect().translated(self.pos())
+
+    def set_scene_unit(self, unit):
+        """设置一个屏幕像素对应的场景长度，使控制柄、线宽和最小尺寸在不同缩放比例下保持一致"""
+        self.scene_unit = unit
+        self.handle_size = 8 * unit
+        self.min_size = 10 * unit
+        self.setPen(QPen(QColor(255, 0, 0), 2 * unit))
+        self.selected_style['pen'] = QPen(Qt.blue, 2 * unit, Qt.DashLine)
+        self.updateHandles()
 
     def updateHandleColors(self):
         """更新控制柄的颜色状态"""
@@ -119,12 +174,12 @@ class ResizableRectItem(QGraphicsRectItem):
                 colors = self.handle_colors['normal']
                 pen_width = 1
             
-            handle.setPen(QPen(colors['pen'], pen_width))
+            handle.setPen(QPen(colors['pen'], pen_width * self.scene_unit))
             handle.setBrush(QBrush(colors['brush']))
             
             # 根据状态调整控制柄大小
             center = handle.rect().center()
-            size = self.handle_size + (2 if i in (self.current_handle, self.hovered_handle) else 0)
+            size = self.handle_size + (2 * self.scene_unit if i in (self.current_handle, self.hovered_handle) else 0)
             handle.setRect(QRectF(
                 center.x() - size/2,
                 center.y() - size/2,
@@ -132,34 +187,21 @@ class ResizableRectItem(QGraphicsRectItem):
                 size
             ))
 
-    def hoverMoveEvent(self, event):
-        """处理鼠标悬停移动事件"""
-        if not self.is_resizing:  # 只在非调整大小状态下检测悬停
-            old_hover = self.hovered_handle
-            self.hovered_handle = None
-            
-            for i, handle in enumerate(self.handles):
-                if handle.contains(handle.mapFromScene(event.scenePos())):
-                    self.hovered_handle = i
-                    self.setCursor(self.getCursorForHandle(i))
-                    break
-            
-            if self.hovered_handle is None:
-                self.setCursor(Qt.ArrowCursor)
-            
-            # 只在状态改变时更新颜色
-            if old_hover != self.hovered_handle:
-                self.updateHandleColors()
-        
-        super().hoverMoveEvent(event)
+    def set_hovered_handle(self, handle_index):
+        """设置鼠标悬停的控制柄（None表示没有），由主窗口的悬停检测调用"""
+        if self.is_resizing or handle_index == self.hovered_handle:
+            return
+        self.hovered_handle = handle_index
+        self.updateHandleColors()
 
-    def hoverLeaveEvent(self, event):
-        """处理鼠标离开事件"""
-        if not self.is_resizing:  # 只在非调整大小状态下重置悬停状态
-            self.hovered_handle = None
-            self.setCursor(Qt.ArrowCursor)
-            self.updateHandleColors()
-        super().hoverLeaveEvent(event)
+    def itemChange(self, change, value):
+        """位置或选中状态变化时同步到框图形层"""
+        if self.box_layer is not None:
+            if change == QGraphicsItem.ItemPositionHasChanged:
+                self.box_layer.item_geometry_changed(self)
+            elif change == QGraphicsItem.ItemSelectedHasChanged:
+                self.box_layer.item_selection_changed(self, bool(value))
+        return super().itemChange(change, value)
     
     def mousePressEvent(self, event):
         """处理鼠标按下事件"""
@@ -190,6 +232,8 @@ class ResizableRectItem(QGraphicsRectItem):
             event.accept()
         else:
             super().mouseReleaseEvent(event)
+            # 拖动结束后更新类别列表（包括区域缩略图）
+            self.trigger_update()
     
     def getCursorForHandle(self, handle_index):
         """根据控制柄位置返回对应的光标形状"""
@@ -200,10 +244,11 @@ class ResizableRectItem(QGraphicsRectItem):
         return Qt.ArrowCursor
     
     def handle_at(self, pos):
-        """检查给定位置是否在控制柄上"""
+        """检查给定的场景坐标是否在控制柄上"""
+        # 控制柄是没有变换的子项，直接比较平移后的矩形，无需逐个坐标映射
+        offset = self.pos()
         for i, handle in enumerate(self.handles):
-            handle_pos = handle.mapFromScene(pos)
-            if handle.contains(handle_pos):
+            if handle.rect().translated(offset).contains(pos):
                 return i
         return None
 
@@ -0,0 +1,277 @@
+import json
+import os
+import sqlite3
+from collections.abc import Mapping
+from itertools import groupby
+
+from annotation_storage import AnnotationStorage
+from lazy_annotations import LazyAnnotationDict
+
+
+# 标注框中单独建列的字段，其余字段以JSON形式存入extra列
+BOX_COLUMNS = ('category', 'x', 'y', 'width', 'height')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS boxes (
+    id INTEGER PRIMARY KEY,
+    image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+    category_id INTEGER NOT NULL REFERENCES categories(id),
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    width REAL NOT NULL,
+    height REAL NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_boxes_image ON boxes(image_id);
+CREATE INDEX IF NOT EXISTS idx_boxes_category ON boxes(category_id, image_id);
+'''
+
+
+class SQLiteAnnotationMapping(Mapping):
+    """以只读字典的形式访问SQLite中的标注（相对路径 -> 标注列表）"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __getitem__(self, rel_path):
+        annotations = self.storage.get_annotations(rel_path)
+        if annotations is None:
+            raise KeyError(rel_path)
+        return annotations
+
+    def __iter__(self):
+        return iter(self.storage.image_paths())
+
+    def __len__(self):
+        return len(self.storage.image_paths())
+
+
+class SQLiteAnnotationStorage(AnnotationStorage):
+    """基于标准库sqlite3的标注存储后端
+
+    标注按 images / boxes / categories 三张表存放，并在图片路径和类别上建立
+    索引，可直接回答“哪些图片包含某类别”“每个类别有多少框”之类的查询。
+    打开项目时无需解析整个JSON，load_annotation 只查询当前图片的框。
+    写盘仍沿用父类的后台批量写入机制。
+    """
+
+    DB_FILE_NAME = 'annotations.db'
+
+    def __init__(self, flush_interval=AnnotationStorage.DEFAULT_FLUSH_INTERVAL, lazy=None):
+        self.read_conn = None   # GUI线程使用的只读连接
+        self.write_conn = None  # 写盘线程使用的连接
+        self.category_ids = {}  # 类别名称 -> id 的缓存
+        # lazy 只影响导入旧JSON时的读取方式
+        super().__init__(flush_interval, lazy)
+        self.annotations = SQLiteAnnotationMapping(self)
+
+    def load_annotation(self, image_path):
+        """加载单个图片的标注信息"""
+        return self.get_annotations(self._get_relative_path(image_path)) or []
+
+    def get_annotations(self, rel_path):
+        """查询单个图片的标注，尚未标注过的图片返回None"""
+        with self.lock:
+            pending = self.dirty.get(rel_path)
+        if pending is not None:
+            return pending
+        if self.read_conn is None:
+            return None
+
+        image_row = self.read_conn.execute(
+            'SELECT id FROM images WHERE path = ?', (rel_path,)
+        ).fetchone()
+        if image_row is None:
+            return None
+        rows = self.read_conn.execute(
+            'SELECT c.name, b.x, b.y, b.width, b.height, b.extra'
+            ' FROM boxes b JOIN categories c ON c.id = b.category_id'
+            ' WHERE b.image_id = ? ORDER BY b.id',
+            (image_row[0],)
+        ).fetchall()
+        annotations = []
+        for name, x, y, width, height, extra in rows:
+            annotation = {'category': name, 'x': x, 'y': y, 'width': width, 'height': height}
+            if extra:
+                annotation.update(json.loads(extra))
+            annotations.append(annotation)
+        return annotations
+
+    def image_paths(self):
+        """返回所有已标注图片的相对路径（包含尚未写盘的修改）"""
+        paths = []
+        if self.read_conn is not None:
+            paths = [row[0] for row in self.read_conn.execute('SELECT path FROM images ORDER BY path')]
+        known = set(paths)
+        with self.lock:
+            pending = [path for path in self.dirty if path not in known]
+        return paths + pending
+
+    def images_with_category(self, category):
+        """查询包含指定类别的所有图片（相对路径）"""
+        self.flush()
+        rows = self.read_conn.execute(
+            'SELECT DISTINCT i.path FROM boxes b'
+            ' JOIN categories c ON c.id = b.category_id'
+            ' JOIN images i ON i.id = b.image_id'
+            ' WHERE c.name = ? ORDER BY i.path',
+            (category,)
+        )
+        return [row[0] for row in rows]
+
+    def iter_annotations(self):
+        """按相对路径顺序遍历所有图片的标注，产出 (相对路径, 标注列表)
+
+        使用单独的连接和一次按图片排序的查询，可以在GUI线程之外调用，
+        结果逐行读取，不需要一次性载入内存。
+        """
+        self.flush()
+        conn = sqlite3.connect(self._get_db_file_path())
+        try:
+            rows = conn.execute(
+                'SELECT i.path, c.name, b.x, b.y, b.width, b.height, b.extra FROM images i'
+                ' LEFT JOIN boxes b ON b.image_id = i.id'
+                ' LEFT JOIN categories c ON c.id = b.category_id'
+                ' ORDER BY i.path, b.id'
+            )
+            for rel_path, group in groupby(rows, key=lambda row: row[0]):
+                annotations = []
+                for _, name, x, y, width, height, extra in group:
+                    if x is None:
+                        continue
+                    annotation = {'category': name, 'x': x, 'y': y, 'width': width, 'height': height}
+                    if extra:
+                        annotation.update(json.loads(extra))
+                    annotations.append(annotation)
+                yield rel_path, annotations
+        finally:
+            conn.close()
+
+    def count_boxes_per_category(self):
+        """统计每个类别的标注框数量"""
+        self.flush()
+        rows = self.read_conn.execute(
+            'SELECT c.name, COUNT(b.id) FROM categories c'
+            ' LEFT JOIN boxes b ON b.category_id = c.id GROUP BY c.id ORDER BY c.name'
+        )
+        return dict(rows.fetchall())
+
+    def close(self):
+        """写完剩余修改并关闭数据库"""
+        super().close()
+        with self.io_lock:
+            self._close_connections()
+
+    def _mark_dirty(self, rel_path, annotations):
+        """登记为待写盘，查询时优先返回待写盘的数据"""
+        with self.condition:
+            self.dirty[rel_path] = annotations
+            self.condition.notify_all()
+
+    def _write_batch(self, batch):
+        """在一个事务中写入一批图片的标注（调用方需持有 io_lock）"""
+        if self.write_conn is None:
+            return
+        try:
+            with self.write_conn:
+                for rel_path, annotations in batch.items():
+                    self._write_image(rel_path, annotations)
+        except sqlite3.Error as e:
+            # 事务已回滚（新建的类别id随之失效），交给父类按写盘失败处理
+            self.category_ids = {}
+            raise OSError(str(e)) from e
+
+    def _write_image(self, rel_path, annotations):
+        """替换单个图片的全部标注框"""
+        conn = self.write_conn
+        conn.execute('INSERT OR IGNORE INTO images (path) VALUES (?)', (rel_path,))
+        image_id = conn.execute('SELECT id FROM images WHERE path = ?', (rel_path,)).fetchone()[0]
+        conn.execute('DELETE FROM boxes WHERE image_id = ?', (image_id,))
+        rows = []
+        for annotation in annotations:
+            extra = {k: v for k, v in annotation.items() if k not in BOX_COLUMNS}
+            rows.append((
+                image_id,
+                self._category_id(annotation.get('category', '')),
+                annotation['x'], annotation['y'], annotation['width'], annotation['height'],
+                json.dumps(extra, ensure_ascii=False) if extra else None
+            ))
+        conn.executemany(
+            'INSERT INTO boxes (image_id, category_id, x, y, width, height, extra)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+
+    def _category_id(self, name):
+        """获取类别id，不存在时创建"""
+        category_id = self.category_ids.get(name)
+        if category_id is None:
+            self.write_conn.execute('INSERT OR IGNORE INTO categories (name) VALUES (?)', (name,))
+            category_id = self.write_conn.execute(
+                'SELECT id FROM categories WHERE name = ?', (name,)
+            ).fetchone()[0]
+            self.category_ids[name] = category_id
+        return category_id
+
+    def _compact(self):
+        """SQLite无需合并快照，只截断WAL文件（调用方需持有 io_lock）"""
+        if self.write_conn is not None:
+            self.write_conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def _get_db_file_path(self):
+        """获取数据库文件的路径"""
+        if hasattr(self, 'base_dir'):
+            return os.path.join(self.base_dir, self.DB_FILE_NAME)
+        return None
+
+    def _close_connections(self):
+        """关闭数据库连接"""
+        for conn in (self.read_conn, self.write_conn):
+            if conn is not None:
+                conn.close()
+        self.read_conn = None
+        self.write_conn = None
+        self.category_ids = {}
+
+    def _load_from_file(self):
+        """打开数据库；首次打开时从 annotations.json 和日志导入旧数据"""
+        self._close_connections()
+        db_path = self._get_db_file_path()
+        is_new = not os.path.exists(db_path)
+
+        # 两个连接都会跨线程使用（写连接在写盘线程，set_base_directory在GUI线程）
+        self.write_conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.write_conn.execute('PRAGMA journal_mode=WAL')
+        self.write_conn.execute('PRAGMA synchronous=NORMAL')
+        self.write_conn.execute('PRAGMA foreign_keys=ON')
+        self.write_conn.executescript(SCHEMA)
+        self.read_conn = sqlite3.connect(db_path, check_same_thread=False)
+
+        if is_new:
+            self._import_legacy_annotations()
+
+    def _import_legacy_annotations(self):
+        """把旧的JSON标注（快照+日志）一次性导入数据库"""
+        json_path = self._get_annotation_file_path()
+        journal_path = self._get_journal_file_path()
+        if not os.path.exists(json_path) and not os.path.exists(journal_path):
+            return
+
+        # 复用父类的JSON加载逻辑，把旧数据读到临时字典中
+        AnnotationStorage._load_from_file(self)
+        legacy = self.annotations
+        self.annotations = SQLiteAnnotationMapping(self)
+        with self.write_conn:
+            for rel_path, annotations in legacy.items():
+                self._write_image(rel_path, annotations)
+        print(f"已从 annotations.json 导入 {len(legacy)} 张图片的标注")
+        if isinstance(legacy, LazyAnnotationDict):
+            legacy.close()
@@ -0,0 +1,143 @@
+"""用模板匹配在其它图片中查找与给定框相同的目标
+
+只依赖 numpy 和 OpenCV，不导入 Qt，导入时没有副作用，可以在以 spawn
+方式启动的工作进程中使用。
+
+每张图片先以缩小 2/4/8 倍的分辨率直接解码（JPEG 在 DCT 阶段缩放，无需
+先解码全图），在缩小的图上做一次归一化相关匹配；最高分低于粗匹配阈值
+的图片立即放弃。只有通过粗匹配的图片才解码原分辨率，并在每个候选位置
+附近的小窗口内精确定位。
+"""
+import cv2
+import numpy as np
+
+from video_frames import parse_frame_path, read_frame
+
+
+# 缩小倍数对应的解码标志。界面用 QImageReader 显示图片且不按 EXIF 方向旋转，
+# 标注框也在未旋转的像素网格上，因此这里同样忽略 EXIF 方向
+REDUCED_GRAYSCALE = {
+    1: cv2.IMREAD_GRAYSCALE | cv2.IMREAD_IGNORE_ORIENTATION,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2 | cv2.IMREAD_IGNORE_ORIENTATION,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4 | cv2.IMREAD_IGNORE_ORIENTATION,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8 | cv2.IMREAD_IGNORE_ORIENTATION,
+}
+
+MIN_COARSE_TEMPLATE = 12  # 粗匹配时模板短边至少保留的像素数
+MIN_TEMPLATE_STDDEV = 2.0  # 模板灰度的最小标准差，过于平坦的模板无法可靠匹配
+
+
+def read_gray(image_path, reduction=1):
+    """读取缩小 reduction 倍的灰度图（视频帧解码后缩小），失败时返回 None"""
+    if parse_frame_path(image_path) is not None:
+        return read_frame(image_path, 'gray', reduction)
+    return cv2.imread(image_path, REDUCED_GRAYSCALE[reduction])
+
+
+def read_template(image_path, rect):
+    """从原图中截取模板（灰度），rect 为原图像素坐标 (x, y, 宽, 高)"""
+    image = read_gray(image_path)
+    if image is None:
+        raise ValueError(f"无法读取图片: {image_path}")
+    x, y, width, height = (int(round(v)) for v in rect)
+    x = max(0, x)
+    y = max(0, y)
+    template = image[y:y + height, x:x + width]
+    if template.size == 0:
+        raise ValueError("模板区域为空")
+    return np.ascontiguousarray(template)
+
+
+def choose_reduction(width, height):
+    """选择粗匹配的缩小倍数：在模板短边不少于 MIN_COARSE_TEMPLATE 的前提下尽量缩小"""
+    reduction = 8
+    while reduction > 1 and min(width, height) / reduction < MIN_COARSE_TEMPLATE:
+        reduction //= 2
+    return reduction
+
+
+class TemplateMatcher:
+    """在图片中查找模板出现的位置（同尺度）"""
+
+    def __init__(self, template, threshold=0.8, coarse_margin=0.15, max_matches=20):
+        if float(template.std()) < MIN_TEMPLATE_STDDEV:
+            raise ValueError("模板区域过于平坦，无法匹配")
+        self.template = template
+        self.threshold = threshold
+        self.coarse_threshold = threshold - coarse_margin
+        self.max_matches = max_matches
+
+        height, width = template.shape
+        self.reduction = choose_reduction(width, height)
+        if self.reduction > 1:
+            self.coarse_template = cv2.resize(
+                template, (max(1, width // self.reduction), max(1, height // self.reduction)),
+                interpolation=cv2.INTER_AREA
+            )
+        else:
+            self.coarse_template = template
+
+    def match(self, image_path):
+        """返回 [(x, y, 宽, 高, 得分)]（原图像素坐标）；无法读取图片时返回 None"""
+        coarse = read_gray(image_path, self.reduction)
+        if coarse is None:
+            return None
+        coarse_height, coarse_width = self.coarse_template.shape
+        if coarse.shape[0] < coarse_height or coarse.shape[1] < coarse_width:
+            return []
+        scores = cv2.matchTemplate(coarse, self.coarse_template, cv2.TM_CCOEFF_NORMED)
+        # 早期拒绝：缩小图上都不够相似的图片不再解码原图
+        if cv2.minMaxLoc(scores)[1] < self.coarse_threshold:
+            return []
+        peaks = self._peaks(scores, coarse_width, coarse_height)
+
+        full = coarse if self.reduction == 1 else read_gray(image_path)
+        if full is None:
+            return None
+        height, width = self.template.shape
+        margin = 2 * self.reduction
+        matches = []
+        for px, py in peaks:
+            # 在原分辨率的邻域窗口内精确定位
+            x0 = max(0, px * self.reduction - margin)
+            y0 = max(0, py * self.reduction - margin)
+            x1 = min(full.shape[1], px * self.reduction + margin + width)
+            y1 = min(full.shape[0], py * self.reduction + margin + height)
+            if x1 - x0 < width or y1 - y0 < height:
+                continue
+            local = cv2.matchTemplate(full[y0:y1, x0:x1], self.template, cv2.TM_CCOEFF_NORMED)
+            _, best, _, (lx, ly) = cv2.minMaxLoc(local)
+            if best >= self.threshold:
+                matches.append((x0 + lx, y0 + ly, width, height, float(best)))
+        return matches
+
+    def _peaks(self, scores, template_width, template_height):
+        """依次取最高分位置并抑制其邻域，得到不重叠的候选位置"""
+        scores = scores.copy()
+        radius_x = max(1, template_width // 2)
+        radius_y = max(1, template_height // 2)
+        peaks = []
+        for _ in range(self.max_matches):
+            _, best, _, (x, y) = cv2.minMaxLoc(scores)
+            if best < self.coarse_threshold:
+                break
+            peaks.append((x, y))
+            scores[max(0, y - radius_y):y + radius_y + 1, max(0, x - radius_x):x + radius_x + 1] = -1
+        return peaks
+
+
+# 工作进程中的匹配器（由进程池的 initializer 接收，避免每个任务重复传递模板）
+_worker_matcher = None
+
+
+def init_worker(matcher):
+    """进程池的初始化函数；matcher 在主进程中创建，模板无法匹配的错误在那里报告"""
+    global _worker_matcher
+    # 并行由进程池负责，每个进程内的 OpenCV 只用一个线程
+    cv2.setNumThreads(1)
+    _worker_matcher = matcher
+
+
+def match_paths(image_paths):
+    """在工作进程中匹配一组图片，返回 [(图片路径, 匹配结果或None)]"""
+    return [(image_path, _worker_matcher.match(image_path)) for image_path in image_paths]
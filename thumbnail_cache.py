@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class ThumbnailCache:
+    """基于SQLite的持久化缩略图缓存
+
+    每条记录以相对路径为键，同时记录源文件的修改时间和大小，
+    二者任一变化即视为过期，仅重新生成该条缩略图。
+    缓存总大小超过上限时按最近访问时间（LRU）淘汰旧记录。
+    """
+
+    CACHE_FILE_NAME = '.thumbnails.db'
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 默认上限512MB
+    TOUCH_FLUSH_COUNT = 512                 # 积累多少次访问后批量写回访问时间
+
+    def __init__(self, db_path, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.pending_touches = {}  # 相对路径 -> 最近访问时间，批量写回
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS thumbnails ('
+            ' path TEXT PRIMARY KEY,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' file_size INTEGER NOT NULL,'
+            ' data BLOB NOT NULL,'
+            ' last_access REAL NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_thumbnails_access ON thumbnails(last_access)'
+        )
+        self.conn.commit()
+        row = self.conn.execute('SELECT COALESCE(SUM(LENGTH(data)), 0) FROM thumbnails').fetchone()
+        self.total_bytes = row[0]
+
+    @classmethod
+    def open_for_directory(cls, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """在数据集目录下打开缓存（与annotations.json同级），失败时返回None"""
+        try:
+            return cls(os.path.join(directory, cls.CACHE_FILE_NAME), max_bytes)
+        except sqlite3.Error as e:
+            print(f"无法打开缩略图缓存: {e}")
+            return None
+
+    def get(self, rel_path, mtime_ns, file_size):
+        """读取缩略图数据，不存在或已过期时返回None"""
+        with self.lock:
+            try:
+                row = self.conn.execute(
+                    'SELECT mtime_ns, file_size, data FROM thumbnails WHERE path = ?',
+                    (rel_path,)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None or row[0] != mtime_ns or row[1] != file_size:
+                return None
+
+            self.pending_touches[rel_path] = time.time()
+            if len(self.pending_touches) >= self.TOUCH_FLUSH_COUNT:
+                self._flush_touches()
+            return row[2]
+
+    def put(self, rel_path, mtime_ns, file_size, data):
+        """写入（或替换过期的）缩略图数据"""
+        data = bytes(data)
+        with self.lock:
+            try:
+                old = self.conn.execute(
+                    'SELECT LENGTH(data) FROM thumbnails WHERE path = ?', (rel_path,)
+                ).fetchone()
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO thumbnails'
+                    ' (path, mtime_ns, file_size, data, last_access) VALUES (?, ?, ?, ?, ?)',
+                    (rel_path, mtime_ns, file_size, sqlite3.Binary(data), time.time())
+                )
+                self.conn.commit()
+            except sqlite3.Error:
+                return
+            self.pending_touches.pop(rel_path, None)
+            self.total_bytes += len(data) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _flush_touches(self):
+        """批量写回访问时间（调用方需持有锁）"""
+        if not self.pending_touches:
+            return
+        try:
+            self.conn.executemany(
+                'UPDATE thumbnails SET last_access = ? WHERE path = ?',
+                [(t, path) for path, t in self.pending_touches.items()]
+            )
+            self.conn.commit()
+        except sqlite3.Error:
+            pass
+        self.pending_touches = {}
+
+    def _evict(self):
+        """按LRU淘汰记录，直到总大小降到上限的90%（调用方需持有锁）"""
+        self._flush_touches()
+        target = int(self.max_bytes * 0.9)
+        try:
+            cursor = self.conn.execute(
+                'SELECT path, LENGTH(data) FROM thumbnails ORDER BY last_access'
+            )
+            victims = []
+            freed = 0
+            for path, length in cursor:
+                if self.total_bytes - freed <= target:
+                    break
+                victims.append((path,))
+                freed += length
+            cursor.close()
+            self.conn.executemany('DELETE FROM thumbnails WHERE path = ?', victims)
+            self.conn.commit()
+        except sqlite3.Error:
+            return
+        self.total_bytes -= freed
+
+    def close(self):
+        """写回访问时间并关闭数据库"""
+        with self.lock:
+            self._flush_touches()
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
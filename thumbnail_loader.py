@@ -0,0 +1,184 @@
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, QBuffer, QByteArray, QIODevice, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+from image_prefetcher import decode_frame
+from video_frames import parse_frame_path, source_file
+
+
+def load_thumbnail_image(image_path, thumbnail_size):
+    """在工作线程中解码并缩放图片，返回QImage（失败时返回空QImage）"""
+    if parse_frame_path(image_path) is not None:
+        # 视频帧没有可缩放解码的文件头，解码整帧后再缩小
+        image = decode_frame(image_path)
+        if image.isNull():
+            return image
+        return image.scaled(thumbnail_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    # 不按 EXIF 方向旋转，与主视图和标注框使用同一个像素网格
+    reader = QImageReader(image_path)
+
+    # 让解码器直接输出缩小后的尺寸（JPEG可在DCT阶段缩放，避免解码全分辨率）
+    original_size = reader.size()
+    if original_size.isValid() and (
+        original_size.width() > thumbnail_size.width()
+        or original_size.height() > thumbnail_size.height()
+    ):
+        reader.setScaledSize(original_size.scaled(thumbnail_size, Qt.KeepAspectRatio))
+
+    image = reader.read()
+    if image.isNull():
+        return QImage()
+
+    # 部分格式不支持scaledSize，此时再做一次平滑缩放
+    if image.width() > thumbnail_size.width() or image.height() > thumbnail_size.height():
+        image = image.scaled(thumbnail_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+
+def encode_thumbnail(image):
+    """将缩略图编码为字节串以便写入缓存（带透明通道的使用PNG）"""
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if image.hasAlphaChannel():
+        image.save(buffer, 'PNG')
+    else:
+        image.save(buffer, 'JPG', 90)
+    buffer.close()
+    return bytes(data)
+
+
+class ThumbnailSignals(QObject):
+    """缩略图任务的信号（QRunnable本身不能发射信号）"""
+    # 参数：批次号、行号、缩略图
+    finished = pyqtSignal(int, int, QImage)
+
+
+class ThumbnailTask(QRunnable):
+    """单张图片的缩略图生成任务"""
+
+    def __init__(self, loader, generation, row, image_path, thumbnail_size,
+                 cache=None, rel_path=None):
+        super().__init__()
+        self.loader = loader
+        self.generation = generation
+        self.row = row
+        self.image_path = image_path
+        self.thumbnail_size = thumbnail_size
+        self.cache = cache
+        self.rel_path = rel_path  # 缓存键
+
+    def run(self):
+        # 目录已切换，直接丢弃过期任务
+        if self.loader.generation != self.generation:
+            return
+        self.loader.signals.finished.emit(self.generation, self.row, self.load())
+
+    def load(self):
+        """优先从缓存读取缩略图，缓存缺失或过期时重新生成并写回"""
+        if self.cache is None:
+            return load_thumbnail_image(self.image_path, self.thumbnail_size)
+
+        try:
+            # 视频帧以所在视频的修改时间和大小判断缓存是否过期
+            stat = os.stat(source_file(self.image_path))
+        except OSError:
+            return QImage()
+
+        data = self.cache.get(self.rel_path, stat.st_mtime_ns, stat.st_size)
+        if data is not None:
+            image = QImage.fromData(data)
+            if not image.isNull():
+                return image
+
+        image = load_thumbnail_image(self.image_path, self.thumbnail_size)
+        if not image.isNull():
+            self.cache.put(self.rel_path, stat.st_mtime_ns, stat.st_size, encode_thumbnail(image))
+        return image
+
+
+class ThumbnailLoader(QObject):
+    """基于线程池的缩略图流水线
+
+    视图绘制到某行时通过 request() 请求缩略图，最近请求的行最先处理；
+    滚动后不再可见的行会从队列中移除。调用 start() 打开新目录时会作废
+    上一批尚未完成的任务。
+    """
+
+    # 参数：行号、缩略图（生成失败时为空QImage；只会发射当前批次的结果）
+    thumbnail_ready = pyqtSignal(int, QImage)
+
+    def __init__(self, thumbnail_size=QSize(100, 100), parent=None):
+        super().__init__(parent)
+        self.thumbnail_size = thumbnail_size
+        self.thread_pool = QThreadPool(self)
+        self.generation = 0
+
+        self.cache = None  # 可选的持久化缩略图缓存
+
+        self.signals = ThumbnailSignals()
+        self.signals.finished.connect(self._on_task_finished)
+
+        self.catalog = None  # 与图片列表模型共用的 ImageCatalog
+        self.pending_rows = OrderedDict()  # 等待投递的行，越靠后越优先
+        self.in_flight_rows = set()        # 已投递但未完成的行
+
+        # 同时在飞的任务数，保持较小的队列以便随时调整优先级
+        self.max_in_flight = self.thread_pool.maxThreadCount() * 2
+
+    def start(self, catalog, cache=None):
+        """切换到新目录的图片目录，并取消旧的任务"""
+        self.discard_tasks()
+        self.cache = cache
+        self.catalog = catalog
+
+    def discard_tasks(self):
+        """目录中插入或删除图片后，作废按旧行号投递的任务，可见的行会在重绘时重新请求"""
+        self.generation += 1
+        self.thread_pool.clear()
+        self.pending_rows.clear()
+        self.in_flight_rows.clear()
+
+    def cancel(self):
+        """取消所有尚未完成的任务并停止使用缓存（调用方随后可能关闭它）
+
+        图片目录保持不变，由 start() 切换。
+        """
+        self.discard_tasks()
+        self.cache = None
+
+    def request(self, row):
+        """请求生成指定行的缩略图"""
+        if row in self.in_flight_rows or self.catalog is None or not 0 <= row < len(self.catalog):
+            return
+        self.pending_rows[row] = None
+        self.pending_rows.move_to_end(row)
+        self._schedule()
+
+    def set_visible_rows(self, first_row, last_row):
+        """丢弃可见范围之外的等待任务"""
+        for row in [r for r in self.pending_rows if not first_row <= r <= last_row]:
+            del self.pending_rows[row]
+
+    def _schedule(self):
+        """向线程池补充任务，直到达到在飞上限"""
+        while self.pending_rows and len(self.in_flight_rows) < self.max_in_flight:
+            row, _ = self.pending_rows.popitem(last=True)
+            image_path = self.catalog.path(row)
+            task = ThumbnailTask(
+                self, self.generation, row, image_path, self.thumbnail_size,
+                self.cache, self.catalog.relative_path(image_path)
+            )
+            self.in_flight_rows.add(row)
+            self.thread_pool.start(task)
+
+    def _on_task_finished(self, generation, row, image):
+        """任务完成（在GUI线程中执行）"""
+        if generation != self.generation:
+            return
+        self.in_flight_rows.discard(row)
+        self.thumbnail_ready.emit(row, image)
+        self._schedule()
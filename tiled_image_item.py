@@ -0,0 +1,319 @@
+import hashlib
+import math
+import os
+import shutil
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QRect, QRectF, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QImageReader, QPixmap
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+
+# 超过该像素数的图片使用分块金字塔显示
+TILED_PIXEL_THRESHOLD = 64 * 1024 * 1024
+
+# 分块磁盘缓存的上限，超出时按最近使用时间淘汰整张图片的分块
+MAX_TILE_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+# 解码失败的分块：(图片版本标识, 层, 列, 行)，只在GUI线程中访问。版本标识由
+# 图片路径、修改时间和大小决定，图片变化后键随之变化，旧的失败记录自然失效
+_failed_tiles = OrderedDict()
+MAX_FAILED_TILES = 4096
+
+
+def read_image_size(image_path):
+    """只读取文件头获取图片尺寸，不解码像素"""
+    size = QImageReader(image_path).size()
+    return (size.width(), size.height()) if size.isValid() else (0, 0)
+
+
+def needs_tiling(image_path):
+    """判断图片是否大到需要分块显示
+
+    只有解码器支持区域裁剪（如JPEG）时分块才能只解码所需的部分；PNG 和多数
+    TIFF 不支持，分块仍要解码整层，反而更占内存，这类图片仍按整张显示。
+    """
+    reader = QImageReader(image_path)
+    size = reader.size()
+    if not size.isValid() or size.width() * size.height() <= TILED_PIXEL_THRESHOLD:
+        return False
+    return reader.supportsOption(QImageReader.ClipRect)
+
+
+def prune_tile_cache(cache_root, max_bytes=MAX_TILE_CACHE_BYTES, keep=None):
+    """按最近使用时间淘汰整张图片的分块目录，直到总大小降到上限的90%
+
+    每张图片的分块目录的修改时间即最近使用时间；keep 为正在使用的目录，不淘汰。
+    """
+    try:
+        names = os.listdir(cache_root)
+    except OSError:
+        return
+    directories = []
+    total = 0
+    for name in names:
+        path = os.path.join(cache_root, name)
+        size = 0
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        size += entry.stat().st_size
+            last_used = os.stat(path).st_mtime
+        except OSError:
+            continue
+        directories.append((last_used, path, size))
+        total += size
+    if total <= max_bytes:
+        return
+    target = int(max_bytes * 0.9)
+    for _, path, size in sorted(directories):
+        if total <= target:
+            break
+        if path == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+class TilePyramid:
+    """单张大图的多分辨率分块金字塔
+
+    第 k 层是原图缩小 2^k 倍后按 tile_size 切成的小块。每个分块借助解码器的
+    区域裁剪单独解码，内存占用与分块大小有关、与原图尺寸无关，因此只用于
+    支持裁剪的格式（见 needs_tiling）。分块按需生成，并缓存在磁盘目录中
+    （以路径、修改时间和大小区分不同版本的图片）；缓存目录不可写时不缓存。
+    """
+
+    def __init__(self, image_path, cache_root, tile_size=512):
+        self.image_path = image_path
+        self.tile_size = tile_size
+        self.width, self.height = read_image_size(image_path)
+
+        # 顶层缩小到一个分块以内
+        longest = max(self.width, self.height, 1)
+        self.level_count = max(1, math.ceil(math.log2(longest / tile_size)) + 1)
+
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        # 图片版本的标识，图片变化后随之变化
+        self.key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        self.cache_dir = None
+        if cache_root is not None:
+            cache_dir = os.path.join(cache_root, self.key)
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                # 更新目录的修改时间作为最近使用时间，供 prune_tile_cache 按LRU淘汰
+                os.utime(cache_dir)
+                self.cache_dir = cache_dir
+            except OSError as e:
+                print(f"无法使用分块缓存目录，分块将不写入磁盘: {e}")
+
+    def level_size(self, level):
+        """第 level 层的图片尺寸"""
+        scale = 2 ** level
+        return max(1, math.ceil(self.width / scale)), max(1, math.ceil(self.height / scale))
+
+    def tile_grid(self, level):
+        """第 level 层的分块行列数"""
+        width, height = self.level_size(level)
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+    def tile_path(self, level, tx, ty):
+        """分块在磁盘缓存中的路径（不使用磁盘缓存时为None）"""
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"{level}_{tx}_{ty}.png")
+
+    def tile_rect(self, level, tx, ty):
+        """分块在该层图片中的像素范围"""
+        width, height = self.level_size(level)
+        x = tx * self.tile_size
+        y = ty * self.tile_size
+        return QRect(x, y, min(self.tile_size, width - x), min(self.tile_size, height - y))
+
+    def load_tile(self, level, tx, ty):
+        """读取分块（优先磁盘缓存），可在工作线程中调用"""
+        path = self.tile_path(level, tx, ty)
+        if path is not None and os.path.exists(path):
+            image = QImage(path)
+            if not image.isNull():
+                return image
+        image = self._decode_tile(level, tx, ty)
+        if path is not None and not image.isNull():
+            image.save(path, 'PNG')
+        return image
+
+    def _decode_tile(self, level, tx, ty):
+        """借助解码器的区域裁剪只解码一个分块"""
+        reader = QImageReader(self.image_path)
+        scale = 2 ** level
+        rect = self.tile_rect(level, tx, ty)
+        source = QRect(rect.x() * scale, rect.y() * scale, rect.width() * scale, rect.height() * scale)
+        # 裁剪先于缩放执行
+        reader.setClipRect(source.intersected(QRect(0, 0, self.width, self.height)))
+        reader.setScaledSize(rect.size())
+        return reader.read()
+
+    def region_image(self, rect, max_size):
+        """以不超过 max_size 的分辨率读取原图中的某个区域（用于区域缩略图）"""
+        source = rect.toAlignedRect().intersected(QRect(0, 0, self.width, self.height))
+        if source.isEmpty():
+            return QImage()
+        reader = QImageReader(self.image_path)
+        target = source.size()
+        if target.width() > max_size.width() or target.height() > max_size.height():
+            target = target.scaled(max_size, Qt.KeepAspectRatio)
+        reader.setClipRect(source)
+        reader.setScaledSize(target)
+        return reader.read()
+
+
+class TileSignals(QObject):
+    """分块任务的信号"""
+    # 参数：批次号、层号、列、行、分块图像
+    finished = pyqtSignal(int, int, int, int, QImage)
+
+
+class TileTask(QRunnable):
+    """在工作线程中读取或生成一个分块"""
+
+    def __init__(self, item, generation, level, tx, ty):
+        super().__init__()
+        self.item = item
+        self.generation = generation
+        self.level = level
+        self.tx = tx
+        self.ty = ty
+
+    def run(self):
+        if self.item.generation != self.generation:
+            return
+        image = self.item.pyramid.load_tile(self.level, self.tx, self.ty)
+        self.item.signals.finished.emit(self.generation, self.level, self.tx, self.ty, image)
+
+
+class TileCachePruneTask(QRunnable):
+    """在工作线程中把分块磁盘缓存控制在上限以内"""
+
+    def __init__(self, cache_root, keep):
+        super().__init__()
+        self.cache_root = cache_root
+        self.keep = keep
+
+    def run(self):
+        prune_tile_cache(self.cache_root, keep=self.keep)
+
+
+class TiledImageItem(QGraphicsItem):
+    """分块显示超大图片的图形项
+
+    场景坐标即原图像素坐标。绘制时根据当前缩放比例选择金字塔层级，
+    只绘制暴露区域内的分块；缺失的分块交给线程池生成，期间用更粗的
+    层级代替。内存和重绘开销只与视口大小有关，与图片尺寸无关。
+    """
+
+    MAX_CACHED_TILES = 256  # 内存中最多保留的分块数（512x512约1MB/块）
+
+    thread_pool = None
+
+    def __init__(self, image_path, cache_root, parent=None):
+        super().__init__(parent)
+        self.pyramid = TilePyramid(image_path, cache_root)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self.setZValue(-1)  # 位于所有标注框之下
+
+        self.tiles = OrderedDict()  # (层, 列, 行) -> QPixmap
+        self.requested = set()
+        self.generation = 0
+        self.signals = TileSignals()
+        self.signals.finished.connect(self._on_tile_finished)
+        if TiledImageItem.thread_pool is None:
+            TiledImageItem.thread_pool = QThreadPool()
+        if self.pyramid.cache_dir is not None:
+            self.thread_pool.start(TileCachePruneTask(cache_root, self.pyramid.cache_dir))
+
+    def image_size(self):
+        """原图尺寸"""
+        return self.pyramid.width, self.pyramid.height
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.pyramid.width, self.pyramid.height)
+
+    def release(self):
+        """作废未完成的任务（图片切换时调用）"""
+        self.generation += 1
+        self.requested.clear()
+        self.tiles.clear()
+
+    def _level_for_scale(self, scale):
+        """根据屏幕像素/原图像素的比例选择金字塔层级"""
+        if scale <= 0:
+            return self.pyramid.level_count - 1
+        level = int(math.floor(math.log2(1.0 / scale))) if scale < 1 else 0
+        return max(0, min(self.pyramid.level_count - 1, level))
+
+    def _tile(self, level, tx, ty):
+        """获取内存中的分块，没有时请求生成（解码失败过的分块不再请求）"""
+        key = (level, tx, ty)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+        if (self.pyramid.key,) + key in _failed_tiles:
+            return None
+        if key not in self.requested:
+            self.requested.add(key)
+            self.thread_pool.start(TileTask(self, self.generation, level, tx, ty))
+        return None
+
+    def paint(self, painter, option, widget=None):
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = self._level_for_scale(scale)
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        self._paint_level(painter, exposed, level)
+
+    def _paint_level(self, painter, exposed, level):
+        """绘制指定层级在暴露区域内的分块，缺失的分块用更粗的层级代替"""
+        factor = 2 ** level
+        span = self.pyramid.tile_size * factor  # 一个分块覆盖的原图像素
+        columns, rows = self.pyramid.tile_grid(level)
+        first_tx = max(0, int(exposed.left() // span))
+        last_tx = min(columns - 1, int(exposed.right() // span))
+        first_ty = max(0, int(exposed.top() // span))
+        last_ty = min(rows - 1, int(exposed.bottom() // span))
+
+        for ty in range(first_ty, last_ty + 1):
+            for tx in range(first_tx, last_tx + 1):
+                tile_rect = self.pyramid.tile_rect(level, tx, ty)
+                target = QRectF(tile_rect.x() * factor, tile_rect.y() * factor,
+                                tile_rect.width() * factor, tile_rect.height() * factor)
+                pixmap = self._tile(level, tx, ty)
+                if pixmap is not None:
+                    painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+                elif level + 1 < self.pyramid.level_count:
+                    self._paint_level(painter, target.intersected(exposed), level + 1)
+                else:
+                    painter.fillRect(target, QColor(200, 200, 200))
+
+    def _on_tile_finished(self, generation, level, tx, ty, image):
+        """分块生成完成（在GUI线程中执行）"""
+        if generation != self.generation:
+            return
+        key = (level, tx, ty)
+        self.requested.discard(key)
+        if image.isNull():
+            # 记录失败，之后绘制时用更粗的层级代替，不再反复解码
+            _failed_tiles[(self.pyramid.key,) + key] = True
+            while len(_failed_tiles) > MAX_FAILED_TILES:
+                _failed_tiles.popitem(last=False)
+            return
+        self.tiles[key] = QPixmap.fromImage(image)
+        while len(self.tiles) > self.MAX_CACHED_TILES:
+            self.tiles.popitem(last=False)
+        factor = 2 ** level
+        rect = self.pyramid.tile_rect(level, tx, ty)
+        self.update(QRectF(rect.x() * factor, rect.y() * factor,
+                           rect.width() * factor, rect.height() * factor))
@@ -34,10 +34,11 @@ class Ui_autoLabel(object):
         self.gridLayout.addLayout(self.horizontalLayout, 0, 0, 1, 1)
         self.horizontalLayout_2 = QtWidgets.QHBoxLayout()
         self.horizontalLayout_2.setObjectName("horizontalLayout_2")
-        self.fileListWidget = QtWidgets.QListWidget(autoLabel)
+        self.fileListWidget = QtWidgets.QListView(autoLabel)
         self.fileListWidget.setMaximumSize(QtCore.QSize(256, 16777215))
         self.fileListWidget.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
         self.fileListWidget.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.fileListWidget.setUniformItemSizes(True)
         self.fileListWidget.setObjectName("fileListWidget")
         self.horizontalLayout_2.addWidget(self.fileListWidget)
         self.graphicsView = ZoomableGraphicsView(autoLabel)
@@ -45,14 +46,15 @@ class Ui_autoLabel(object):
         self.graphicsView.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
         self.graphicsView.setObjectName("graphicsView")
         self.horizontalLayout_2.addWidget(self.graphicsView)
-        self.categoryListWidget = QtWidgets.QListWidget(autoLabel)
+        self.categoryListWidget = QtWidgets.QListView(autoLabel)
         self.categoryListWidget.setMaximumSize(QtCore.QSize(256, 16777215))
         self.categoryListWidget.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
         self.categoryListWidget.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.categoryListWidget.setUniformItemSizes(True)
         self.categoryListWidget.setObjectName("categoryListWidget")
         self.horizontalLayout_2.addWidget(self.categoryListWidget)
         self.gridLayout.addLayout(self.horizontalLayout_2, 1, 0, 1, 1)
-        self.thumbnailPreview = QtWidgets.QListWidget(autoLabel)
+        self.thumbnailPreview = QtWidgets.QListView(autoLabel)
         self.thumbnailPreview.setMaximumSize(QtCore.QSize(16777215, 150))
         self.thumbnailPreview.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
         self.thumbnailPreview.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
@@ -62,6 +64,7 @@ class Ui_autoLabel(object):
         self.thumbnailPreview.setMovement(QtWidgets.QListView.Static)
         self.thumbnailPreview.setProperty("isWrapping", False)
         self.thumbnailPreview.setViewMode(QtWidgets.QListView.IconMode)
+        self.thumbnailPreview.setUniformItemSizes(True)
         self.thumbnailPreview.setObjectName("thumbnailPreview")
         self.gridLayout.addWidget(self.thumbnailPreview, 2, 0, 1, 1)
         self.label = QtWidgets.QLabel(autoLabel)
@@ -82,7 +85,5 @@ class Ui_autoLabel(object):
         self.pushButtonNextImage.setShortcut(_translate("autoLabel", "D"))
         self.pushButtonCreateRectBox.setText(_translate("autoLabel", "Create RectBox"))
         self.pushButtonCreateRectBox.setShortcut(_translate("autoLabel", "W"))
-        self.fileListWidget.setSortingEnabled(True)
-        self.categoryListWidget.setSortingEnabled(True)
         self.label.setText(_translate("autoLabel", "X = 0, Y = 0"))
 from zoomable_graphics_view import ZoomableGraphicsView
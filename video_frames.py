@@ -0,0 +1,375 @@
+"""把视频文件作为数据集：帧路径、关键帧索引和按需解码
+
+视频中的每一帧用“视频路径#帧号”表示（帧号按总帧数补零，按路径排序
+即按帧顺序），图片列表、标注存储和缩略图缓存都以它为键，标注因此按
+“视频+帧号”保存，无需预先把帧导出为图片。
+
+打开视频时只解复用一遍数据包（不解码）建立索引：每帧的显示时间戳和
+关键帧的位置，索引缓存在视频所在目录的 .video_index 中。读取某一帧时
+跳转到它之前最近的关键帧再向后解码；连续向后读取时接着上次的位置解码，
+不再跳转。解码依赖 PyAV（av），只在第一次用到时导入；本模块不导入 Qt，
+可以在工作进程中使用。
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+# 支持的视频格式
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v', '.mpg', '.mpeg', '.ts')
+
+FRAME_SEPARATOR = '#'
+MIN_FRAME_DIGITS = 6
+
+INDEX_DIR_NAME = '.video_index'
+INDEX_VERSION = 1
+
+
+def is_video_file(path):
+    """是否为支持的视频文件"""
+    return path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def frame_paths(video_path, frame_count):
+    """视频所有帧的路径（按帧顺序）"""
+    digits = max(MIN_FRAME_DIGITS, len(str(max(0, frame_count - 1))))
+    return [f"{video_path}{FRAME_SEPARATOR}{number:0{digits}d}" for number in range(frame_count)]
+
+
+def parse_frame_path(path):
+    """拆分帧路径，返回 (视频路径, 帧号)；不是视频帧时返回 None"""
+    video_path, separator, number = path.rpartition(FRAME_SEPARATOR)
+    if not separator or not number.isdigit() or not is_video_file(video_path):
+        return None
+    return video_path, int(number)
+
+
+def source_file(path):
+    """图片或视频帧实际所在的文件"""
+    parsed = parse_frame_path(path)
+    return parsed[0] if parsed is not None else path
+
+
+class VideoIndex:
+    """视频的帧索引：按显示顺序排列的时间戳，以及关键帧的帧号"""
+
+    def __init__(self, pts, keyframes):
+        self.pts = pts              # 帧号 -> 显示时间戳（递增）
+        self.keyframes = keyframes  # 关键帧的帧号（递增）
+
+    @property
+    def frame_count(self):
+        return len(self.pts)
+
+    def keyframe_before(self, frame_number):
+        """不晚于指定帧的最近关键帧"""
+        i = bisect.bisect_right(self.keyframes, frame_number) - 1
+        return self.keyframes[i] if i >= 0 else 0
+
+    def frame_number(self, pts):
+        """显示时间戳对应的帧号，不在索引中时返回 None"""
+        i = bisect.bisect_left(self.pts, pts)
+        return i if i < len(self.pts) and self.pts[i] == pts else None
+
+
+def build_video_index(video_path):
+    """解复用整个视频（不解码）建立帧索引"""
+    import av
+
+    packets = []
+    try:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            for packet in container.demux(stream):
+                pts = packet.pts if packet.pts is not None else packet.dts
+                if pts is None or packet.size == 0:
+                    continue
+                packets.append((pts, bool(packet.is_keyframe)))
+    except (av.error.FFmpegError, IndexError) as e:
+        raise OSError(f"无法读取视频 {video_path}: {e}")
+    # 解码顺序与显示顺序可能不同（B帧），按时间戳排序得到帧号
+    packets.sort()
+    pts = [p for p, _ in packets]
+    keyframes = [number for number, (_, key) in enumerate(packets) if key] or [0]
+    return VideoIndex(pts, keyframes)
+
+
+@functools.lru_cache(maxsize=64)
+def video_frame_size(video_path):
+    """视频帧的尺寸 (宽, 高)，只读取流信息，不解码"""
+    import av
+
+    try:
+        with av.open(video_path) as container:
+            context = container.streams.video[0].codec_context
+            return context.width, context.height
+    except (av.error.FFmpegError, IndexError) as e:
+        raise OSError(f"无法读取视频 {video_path}: {e}")
+
+
+def get_index_file_path(video_path):
+    """视频帧索引的缓存文件路径"""
+    folder, name = os.path.split(video_path)
+    return os.path.join(folder, INDEX_DIR_NAME, name + '.json')
+
+
+def load_video_index(video_path):
+    """读取缓存的帧索引，视频已变化或没有缓存时返回 None"""
+    try:
+        stat = os.stat(video_path)
+        with open(get_index_file_path(video_path), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (saved.get('version') != INDEX_VERSION or saved.get('size') != stat.st_size
+            or saved.get('mtime') != stat.st_mtime_ns):
+        return None
+    return VideoIndex(saved['pts'], saved['keyframes'])
+
+
+def save_video_index(video_path, index):
+    """原子地保存帧索引"""
+    index_path = get_index_file_path(video_path)
+    temp_path = index_path + '.tmp'
+    try:
+        stat = os.stat(video_path)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION, 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                'pts': index.pts, 'keyframes': index.keyframes
+            }, f)
+        os.replace(temp_path, index_path)
+    except OSError as e:
+        print(f"保存视频索引失败: {e}")
+
+
+def load_or_build_video_index(video_path):
+    """优先使用缓存的帧索引，否则解复用建立并保存"""
+    index = load_video_index(video_path)
+    if index is None:
+        index = build_video_index(video_path)
+        save_video_index(video_path, index)
+    return index
+
+
+class FrameDecoder:
+    """一个视频的解码器（非线程安全，由 VideoSource 每次分配给一个线程使用）"""
+
+    def __init__(self, video_path, index):
+        import av
+        self.container = av.open(video_path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'
+        self.index = index
+        self.frames = None   # 上次跳转后的解码迭代器
+        self.position = -1   # 最近解码出的帧号
+
+    def can_continue(self, frame_number):
+        """接着上次的位置向后解码是否不比跳转到关键帧更慢"""
+        return (self.frames is not None and self.position < frame_number
+                and self.index.keyframe_before(frame_number) <= self.position)
+
+    def decode(self, frame_number, passed=None):
+        """解码指定帧，返回 av.VideoFrame（找不到时返回 None）
+
+        passed(帧号, 帧) 接收到达目标帧之前顺带解码出的帧。
+        """
+        if not self.can_continue(frame_number):
+            keyframe = self.index.keyframe_before(frame_number)
+            self.container.seek(self.index.pts[keyframe], stream=self.stream,
+                                backward=True, any_frame=False)
+            self.frames = self.container.decode(self.stream)
+            self.position = keyframe - 1
+        for frame in self.frames:
+            number = self.index.frame_number(frame.pts) if frame.pts is not None else self.position + 1
+            if number is None:
+                continue
+            self.position = number
+            if number == frame_number:
+                return frame
+            if passed is not None:
+                passed(number, frame)
+            if number > frame_number:
+                break
+        self.frames = None
+        return None
+
+    def close(self):
+        self.frames = None
+        self.container.close()
+
+
+class VideoSource:
+    """一个视频的共享读取入口（线程安全）
+
+    持有帧索引、少量解码器和最近解码帧的缓存。每次读取挑选一个空闲的
+    解码器：优先能接着向后解码的那个，因此顺序浏览和缩略图等随机访问
+    各用各的解码器，互不打断。
+    """
+
+    MAX_DECODERS = 3
+    CACHE_FRAMES = 24
+
+    def __init__(self, video_path, index):
+        self.video_path = video_path
+        self.index = index
+        self.condition = threading.Condition()
+        self.idle = []          # 空闲的解码器，最近归还的在末尾
+        self.decoder_count = 0
+        self.cache = OrderedDict()  # 帧号 -> av.VideoFrame，按最近使用排序
+        self.closed = False
+
+    def read(self, frame_number):
+        """返回指定帧（av.VideoFrame），无法解码时返回 None"""
+        import av
+
+        if not 0 <= frame_number < self.index.frame_count:
+            return None
+        with self.condition:
+            frame = self.cache.get(frame_number)
+            if frame is not None:
+                self.cache.move_to_end(frame_number)
+                return frame
+            decoder = self._checkout(frame_number)
+
+        try:
+            if decoder is None:
+                decoder = FrameDecoder(self.video_path, self.index)
+            frame = decoder.decode(frame_number, self._remember)
+        except av.error.FFmpegError as e:
+            print(f"视频解码失败 {self.video_path}#{frame_number}: {e}")
+            self._discard(decoder)
+            return None
+        self._checkin(decoder)
+        if frame is not None:
+            self._remember(frame_number, frame)
+        return frame
+
+    def close(self):
+        """关闭空闲的解码器；正在使用的解码器在归还时关闭，等待解码器的读取抛出 OSError"""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.decoder_count -= len(idle)
+            self.cache.clear()
+            self.condition.notify_all()
+        for decoder in idle:
+            decoder.close()
+
+    def _checkout(self, frame_number):
+        """取出一个解码器（调用方需持有锁）；返回 None 表示由调用方新建
+
+        视频已关闭时抛出 OSError。
+        """
+        while True:
+            if self.closed:
+                raise OSError(f"视频已关闭: {self.video_path}")
+            candidates = [d for d in self.idle if d.can_continue(frame_number)]
+            if candidates:
+                decoder = max(candidates, key=lambda d: d.position)
+                self.idle.remove(decoder)
+                return decoder
+            if self.decoder_count < self.MAX_DECODERS:
+                self.decoder_count += 1
+                return None
+            if self.idle:
+                # 复用最久未用的解码器
+                return self.idle.pop(0)
+            self.condition.wait()
+
+    def _checkin(self, decoder):
+        with self.condition:
+            if not self.closed:
+                self.idle.append(decoder)
+                self.condition.notify()
+                return
+            self.decoder_count -= 1
+            self.condition.notify_all()
+        decoder.close()
+
+    def _discard(self, decoder):
+        with self.condition:
+            self.decoder_count -= 1
+            self.condition.notify()
+        if decoder is not None:
+            decoder.close()
+
+    def _remember(self, frame_number, frame):
+        with self.condition:
+            self.cache[frame_number] = frame
+            self.cache.move_to_end(frame_number)
+            while len(self.cache) > self.CACHE_FRAMES:
+                self.cache.popitem(last=False)
+
+
+# 进程内共享的视频读取入口：视频路径 -> Future（结果为 VideoSource）。
+# 建立帧索引要解复用整个视频，在锁外进行；同一视频的其它调用方等待同一个 Future
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def open_video(video_path):
+    """获取视频的共享读取入口（首次访问时加载或建立帧索引）"""
+    with _sources_lock:
+        future = _sources.get(video_path)
+        owner = future is None
+        if owner:
+            future = _sources[video_path] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        source = VideoSource(video_path, load_or_build_video_index(video_path))
+    except BaseException as e:
+        # 失败不缓存，下次访问时重试
+        with _sources_lock:
+            if _sources.get(video_path) is future:
+                del _sources[video_path]
+        future.set_exception(e)
+        raise
+    future.set_result(source)
+    with _sources_lock:
+        registered = _sources.get(video_path) is future
+    if not registered:
+        # 建立索引期间数据集已切换（close_videos），之后的读取直接失败
+        source.close()
+    return source
+
+
+def close_videos():
+    """关闭所有已打开的视频（切换数据集时调用）"""
+    with _sources_lock:
+        futures = list(_sources.values())
+        _sources.clear()
+    for future in futures:
+        # 仍在建立索引的视频由建立者在完成后关闭
+        if future.done() and future.exception() is None:
+            future.result().close()
+
+
+def read_frame(path, format='rgb24', reduction=1):
+    """把视频帧读取为 numpy 数组（'rgb24'、'bgr24' 或 'gray'），reduction 为缩小倍数
+
+    不是视频帧或无法读取时返回 None。
+    """
+    import numpy as np
+
+    parsed = parse_frame_path(path)
+    if parsed is None:
+        return None
+    video_path, frame_number = parsed
+    try:
+        frame = open_video(video_path).read(frame_number)
+    except (ImportError, OSError):
+        return None
+    if frame is None:
+        return None
+    if reduction > 1:
+        frame = frame.reformat(width=max(1, frame.width // reduction),
+                               height=max(1, frame.height // reduction))
+    return np.ascontiguousarray(frame.to_ndarray(format=format))
@@ -0,0 +1,256 @@
+import threading
+
+import numpy as np
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QImageReader
+
+from detectors import Detector, load_class_names
+from image_prefetcher import decode_frame
+from video_frames import parse_frame_path, read_frame
+
+
+LETTERBOX_FILL = 114  # 缩放后四周填充的灰度值（与YOLO训练时一致）
+
+
+def letterbox_params(width, height, input_size):
+    """保持宽高比缩放到 input_size 见方，返回 (缩放比例, 新宽, 新高, 左侧填充, 顶部填充)"""
+    scale = min(input_size / width, input_size / height)
+    new_width = max(1, round(width * scale))
+    new_height = max(1, round(height * scale))
+    return scale, new_width, new_height, (input_size - new_width) // 2, (input_size - new_height) // 2
+
+
+def non_max_suppression(boxes, scores, iou_threshold):
+    """贪心非极大值抑制，boxes 为 (N, 4) 的 x1, y1, x2, y2，返回保留的下标"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter_w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        inter_h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+
+class YoloDetector(Detector):
+    """YOLO 系列导出模型的公共后处理
+
+    支持 YOLOv5 风格 (N, 5+类别数，含目标置信度) 和 YOLOv8 风格
+    (4+类别数, N) 的输出。两者只凭列数无法区分，version 指定 'v5' 或
+    'v8'；不指定时必须提供类别名称，由列数与类别数推断，对不上时报错。
+    低于置信度阈值的候选在做 NMS 之前就被丢弃，NMS 按类别分别进行
+    （给不同类别的框加上偏移后一次完成）。
+    """
+
+    VERSIONS = ('v5', 'v8')
+
+    def __init__(self, class_names=None, input_size=640, conf_threshold=0.25,
+                 iou_threshold=0.45, batch_size=1, version=None):
+        if isinstance(class_names, str):
+            class_names = load_class_names(class_names)
+        if version is not None and version not in self.VERSIONS:
+            raise ValueError(f"未知的 YOLO 输出格式: {version}")
+        if version is None and not class_names:
+            raise ValueError("无法区分 YOLOv5 / YOLOv8 的输出：请提供类别名称文件或指定 version")
+        self.class_names = class_names
+        self.version = version
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.batch_size = batch_size
+
+    def layout(self, columns):
+        """由每个候选的列数确定输出格式，返回 (格式, 类别数)；与类别数不符时报错"""
+        if self.class_names:
+            class_count = len(self.class_names)
+            expected = {'v5': 5 + class_count, 'v8': 4 + class_count}
+            versions = [self.version] if self.version else self.VERSIONS
+            for version in versions:
+                if columns == expected[version]:
+                    return version, class_count
+            raise ValueError(f"模型输出每个候选有 {columns} 列，与 {class_count} 个类别不符")
+        return self.version, columns - (5 if self.version == 'v5' else 4)
+
+    def detect(self, inputs):
+        outputs = self.infer([tensor for tensor, _ in inputs])
+        return [self.decode(output, meta) for output, (_, meta) in zip(outputs, inputs)]
+
+    def infer(self, tensors):
+        """对一批预处理后的输入推理，返回每张图片的原始输出"""
+        raise NotImplementedError
+
+    def decode(self, output, meta):
+        """把单张图片的原始输出转换为原图坐标的检测框"""
+        scale, pad_x, pad_y, width, height = meta
+        predictions = np.asarray(output, dtype=np.float32)
+        if predictions.ndim == 3:
+            predictions = predictions[0]
+        # YOLOv8 的输出为 (4+类别数, N)
+        if predictions.shape[0] < predictions.shape[1]:
+            predictions = predictions.T
+
+        version, class_count = self.layout(predictions.shape[1])
+        if version == 'v5':
+            scores = predictions[:, 5:5 + class_count] * predictions[:, 4:5]
+        else:
+            scores = predictions[:, 4:4 + class_count]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+
+        candidates = confidences >= self.conf_threshold
+        if not candidates.any():
+            return []
+        predictions = predictions[candidates]
+        class_ids = class_ids[candidates]
+        confidences = confidences[candidates]
+
+        boxes = np.empty((len(predictions), 4), dtype=np.float32)
+        boxes[:, 0] = predictions[:, 0] - predictions[:, 2] / 2
+        boxes[:, 1] = predictions[:, 1] - predictions[:, 3] / 2
+        boxes[:, 2] = predictions[:, 0] + predictions[:, 2] / 2
+        boxes[:, 3] = predictions[:, 1] + predictions[:, 3] / 2
+        offsets = class_ids[:, None].astype(np.float32) * (self.input_size + 1)
+        keep = non_max_suppression(boxes + offsets, confidences, self.iou_threshold)
+
+        # 去掉填充并缩放回原图坐标
+        boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - pad_x) / scale, 0, width)
+        boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - pad_y) / scale, 0, height)
+        detections = []
+        for i in keep:
+            x1, y1, x2, y2 = (float(v) for v in boxes[i])
+            if x2 <= x1 or y2 <= y1:
+                continue
+            class_id = int(class_ids[i])
+            detections.append({
+                'category': self.class_names[class_id] if self.class_names else str(class_id),
+                'x': x1,
+                'y': y1,
+                'width': x2 - x1,
+                'height': y2 - y1,
+                'score': float(confidences[i])
+            })
+        return detections
+
+
+class OnnxDetector(YoloDetector):
+    """使用 ONNX Runtime 在CPU上推理的检测器
+
+    图片用 QImageReader 解码并直接缩小到输入尺寸（视频帧解码整帧后缩小）；推理会话可被多个
+    线程同时使用（ONNX Runtime 在推理期间释放GIL）。
+    """
+
+    def __init__(self, model, class_names=None, input_size=640, conf_threshold=0.25,
+                 iou_threshold=0.45, batch_size=1, threads=None, version=None):
+        import onnxruntime
+        super().__init__(class_names, input_size, conf_threshold, iou_threshold, batch_size, version)
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            model, options, providers=['CPUExecutionProvider']
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # 固定形状的模型以模型的批大小和输入尺寸为准
+        batch_dim, _, height_dim = model_input.shape[:3]
+        if isinstance(batch_dim, int):
+            self.batch_size = batch_dim
+        if isinstance(height_dim, int):
+            self.input_size = height_dim
+        # 输出形状固定时立即核对输出格式，类别文件与模型不符时尽早报错
+        output_shape = self.session.get_outputs()[0].shape
+        if len(output_shape) == 3 and all(isinstance(dim, int) for dim in output_shape[1:]):
+            self.layout(min(output_shape[1:]))
+
+    def prepare(self, image_path):
+        if parse_frame_path(image_path) is not None:
+            image = decode_frame(image_path)
+            if image.isNull():
+                return None
+            width, height = image.width(), image.height()
+            scale, new_width, new_height, pad_x, pad_y = letterbox_params(width, height, self.input_size)
+        else:
+            reader = QImageReader(image_path)
+            size = reader.size()
+            if not size.isValid():
+                return None
+            width, height = size.width(), size.height()
+            scale, new_width, new_height, pad_x, pad_y = letterbox_params(width, height, self.input_size)
+            # 解码时直接缩小（JPEG 可在DCT阶段缩放）
+            reader.setScaledSize(size.scaled(new_width, new_height, Qt.IgnoreAspectRatio))
+            image = reader.read()
+            if image.isNull():
+                return None
+        image = image.convertToFormat(QImage.Format_RGB888)
+        if image.width() != new_width or image.height() != new_height:
+            image = image.scaled(new_width, new_height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+        bits = image.constBits()
+        bits.setsize(image.byteCount())
+        pixels = np.frombuffer(bits, np.uint8).reshape(new_height, image.bytesPerLine())
+        pixels = pixels[:, :new_width * 3].reshape(new_height, new_width, 3)
+        canvas = np.full((self.input_size, self.input_size, 3), LETTERBOX_FILL, dtype=np.uint8)
+        canvas[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = pixels
+        tensor = canvas.transpose(2, 0, 1).astype(np.float32) / 255.0
+        return tensor, (scale, pad_x, pad_y, width, height)
+
+    def infer(self, tensors):
+        return self.session.run(None, {self.input_name: np.stack(tensors)})[0]
+
+
+class OpenCVDetector(YoloDetector):
+    """使用 OpenCV DNN 模块推理的检测器（支持 ONNX、Darknet 等格式）
+
+    cv2.dnn.Net 不能被多个线程同时使用，每个工作线程各自加载一份网络。
+    """
+
+    def __init__(self, model, class_names=None, input_size=640, conf_threshold=0.25,
+                 iou_threshold=0.45, batch_size=1, version=None):
+        import cv2
+        super().__init__(class_names, input_size, conf_threshold, iou_threshold, batch_size, version)
+        self.cv2 = cv2
+        self.model = model
+        self.local = threading.local()
+        # 在当前线程加载一次，模型文件有误时尽早报错
+        self.net()
+
+    def net(self):
+        """当前线程的网络实例"""
+        net = getattr(self.local, 'net', None)
+        if net is None:
+            net = self.cv2.dnn.readNet(self.model)
+            self.local.net = net
+        return net
+
+    def prepare(self, image_path):
+        cv2 = self.cv2
+        if parse_frame_path(image_path) is not None:
+            image = read_frame(image_path, 'bgr24')
+        else:
+            # 不按 EXIF 方向旋转：标注框使用与界面显示一致的未旋转像素坐标
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+        scale, new_width, new_height, pad_x, pad_y = letterbox_params(width, height, self.input_size)
+        resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+        canvas = cv2.copyMakeBorder(
+            resized, pad_y, self.input_size - new_height - pad_y,
+            pad_x, self.input_size - new_width - pad_x,
+            cv2.BORDER_CONSTANT, value=(LETTERBOX_FILL,) * 3
+        )
+        return canvas, (scale, pad_x, pad_y, width, height)
+
+    def infer(self, images):
+        blob = self.cv2.dnn.blobFromImages(
+            images, 1 / 255.0, (self.input_size, self.input_size), swapRB=True, crop=False
+        )
+        net = self.net()
+        net.setInput(blob)
+        return net.forward()
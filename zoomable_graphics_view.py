@@ -1,46 +1,152 @@
 # zoomable_graphics_view.py
-from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPainter
+import os
+import time
+
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsPixmapItem
+from PyQt5.QtCore import Qt, QTimer, QPointF, QRect, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QFont
 
 class ZoomableGraphicsView(QGraphicsView):
+    """可缩放的图片视图
+
+    视口更新模式可配置（默认只重绘变化的区域），图片图形项使用设备坐标
+    缓存，平移或缩放过程中暂时关闭平滑缩放，停止后再恢复。可选在左上角
+    显示帧率和每帧绘制耗时，用于验证渲染优化的效果。
+    """
+
+    # 视口更新模式（可通过环境变量 AUTOLABEL_VIEWPORT_UPDATE 选择）
+    UPDATE_MODES = {
+        'full': QGraphicsView.FullViewportUpdate,
+        'bounding': QGraphicsView.BoundingRectViewportUpdate,
+        'smart': QGraphicsView.SmartViewportUpdate,
+        'minimal': QGraphicsView.MinimalViewportUpdate,
+    }
+    DEFAULT_UPDATE_MODE = 'smart'
+
+    SETTLE_INTERVAL = 150  # 平移或缩放停止多久（毫秒）后恢复平滑缩放
+
+    # 参数：最近一秒的帧率、平均每帧绘制耗时（毫秒）
+    render_stats = pyqtSignal(float, float)
+    # 参数：缩放后的比例（屏幕像素/场景单位）
+    zoom_changed = pyqtSignal(float)
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        
+
         # 创建场景
         self.scene = QGraphicsScene()
         self.setScene(self.scene)
-        
+
         # 设置渲染属性
         self.setRenderHint(QPainter.Antialiasing)
         self.setRenderHint(QPainter.SmoothPixmapTransform)
-        
+
         # 设置拖拽模式
         self.setDragMode(QGraphicsView.ScrollHandDrag)
-        
+
         # 缩放系数
         self.zoom_factor = 1.15
-        
-        # 适应窗口大小
-        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+
+        # 视口只重绘变化的区域（辅助线、悬停高亮等不再触发整个视口重绘）
+        self.set_update_mode(os.environ.get('AUTOLABEL_VIEWPORT_UPDATE', self.DEFAULT_UPDATE_MODE))
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
 
+        # 平移或缩放过程中关闭平滑缩放，停止后恢复
+        self.image_item = None
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(self.SETTLE_INTERVAL)
+        self.settle_timer.timeout.connect(self.on_motion_settled)
+
+        # 帧率和绘制耗时统计（设置 AUTOLABEL_RENDER_STATS=1 时显示在视图左上角）
+        self.show_render_stats = os.environ.get('AUTOLABEL_RENDER_STATS') == '1'
+        self.frame_count = 0
+        self.paint_time = 0.0
+        self.stats_started = time.perf_counter()
+        self.stats_text = ''
+
+    def set_update_mode(self, mode):
+        """设置视口更新模式：full、bounding、smart 或 minimal"""
+        self.setViewportUpdateMode(self.UPDATE_MODES.get(mode, self.UPDATE_MODES[self.DEFAULT_UPDATE_MODE]))
+
+    def set_image_item(self, item):
+        """登记当前图片的图形项；普通图片按设备坐标缓存，悬停和辅助线的重绘不再重新缩放整张图片"""
+        self.image_item = item
+        if isinstance(item, QGraphicsPixmapItem):
+            item.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+    def begin_motion(self):
+        """开始平移或缩放：暂时关闭平滑缩放"""
+        if self.renderHints() & QPainter.SmoothPixmapTransform:
+            self.setRenderHint(QPainter.SmoothPixmapTransform, False)
+        self.settle_timer.start()
+
+    def on_motion_settled(self):
+        """平移或缩放停止：恢复平滑缩放并以高质量重绘图片"""
+        self.setRenderHint(QPainter.SmoothPixmapTransform, True)
+        if self.image_item is not None and self.image_item.scene() is not None:
+            # 重新生成设备坐标缓存
+            self.image_item.update()
+        self.viewport().update()
+
     def wheelEvent(self, event):
         if event.modifiers() & Qt.ControlModifier:
+            self.begin_motion()
             old_pos = self.mapToScene(event.pos())
-            
+
             if event.angleDelta().y() > 0:
                 scale_factor = self.zoom_factor
             else:
                 scale_factor = 1 / self.zoom_factor
-            
+
             self.scale(scale_factor, scale_factor)
-            
+
             new_pos = self.mapToScene(event.pos())
             delta = new_pos - old_pos
             self.translate(delta.x(), delta.y())
-            
+            self.zoom_changed.emit(self.transform().m11())
+
             event.accept()
         else:
-            super().wheelEvent(event)
\ No newline at end of file
+            super().wheelEvent(event)
+
+    def scrollContentsBy(self, dx, dy):
+        """平移（拖动或滚动条）时同样暂时关闭平滑缩放"""
+        self.begin_motion()
+        super().scrollContentsBy(dx, dy)
+
+    def paintEvent(self, event):
+        """统计每帧的绘制耗时"""
+        started = time.perf_counter()
+        super().paintEvent(event)
+        self.paint_time += time.perf_counter() - started
+        self.frame_count += 1
+
+        elapsed = started - self.stats_started
+        if elapsed >= 1.0:
+            fps = self.frame_count / elapsed
+            paint_ms = self.paint_time * 1000 / self.frame_count
+            self.stats_text = f"{fps:.1f} FPS  {paint_ms:.1f} ms/帧"
+            self.render_stats.emit(fps, paint_ms)
+            if self.show_render_stats:
+                # 只刷新统计信息所在的区域
+                self.viewport().update(QRect(0, 0, 170, 20))
+            self.frame_count = 0
+            self.paint_time = 0.0
+            self.stats_started = time.perf_counter()
+
+    def drawForeground(self, painter, rect):
+        """在视图左上角显示帧率和绘制耗时"""
+        super().drawForeground(painter, rect)
+        if not self.show_render_stats or not self.stats_text:
+            return
+        painter.save()
+        painter.resetTransform()
+        font = QFont()
+        font.setPointSize(9)
+        painter.setFont(font)
+        painter.setPen(QColor(0, 255, 0))
+        painter.fillRect(0, 0, 170, 20, QColor(0, 0, 0, 160))
+        painter.drawText(QPointF(6, 14), self.stats_text)
+        painter.restore()